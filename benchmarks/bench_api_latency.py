@@ -0,0 +1,136 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import subprocess
+import tempfile
+import time
+
+from load_test import (
+    ENDPOINT_PATHS,
+    compare,
+    load_in_process,
+    load_localhost,
+    make_request_bodies,
+    save_stand_in_artifacts,
+    serve_on_localhost,
+    summarize,
+)
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+# In-process, the app's lifespan takes over the root logger and raises its level to LOG_LEVEL
+logger.setLevel(logging.INFO)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_localhost(args: argparse.Namespace, env: dict[str, str], bodies: dict[str, list[bytes]]) -> list[dict]:
+    runs = []
+    with serve_on_localhost(args.workers, env) as port:
+        for endpoint in args.endpoints:
+            path = ENDPOINT_PATHS[endpoint]
+            load_localhost(port, path, bodies[endpoint], 1, args.warmup)
+            for concurrency in args.concurrency:
+                latencies, errors = load_localhost(
+                    port, path, bodies[endpoint], concurrency, args.seconds, args.client_processes
+                )
+                runs.append(record(endpoint, concurrency, latencies, errors))
+    return runs
+
+
+async def run_in_process(args: argparse.Namespace, bodies: dict[str, list[bytes]]) -> list[dict]:
+    # Imported once the environment points the app at the stand-in artifacts
+    from make_api.app.main import app, lifespan
+
+    runs = []
+    async with lifespan(app):
+        for endpoint in args.endpoints:
+            path = ENDPOINT_PATHS[endpoint]
+            await load_in_process(app, path, bodies[endpoint], 1, args.warmup)
+            for concurrency in args.concurrency:
+                latencies, errors = await load_in_process(app, path, bodies[endpoint], concurrency, args.seconds)
+                runs.append(record(endpoint, concurrency, latencies, errors))
+    return runs
+
+
+def record(endpoint: str, concurrency: int, latencies, errors: int) -> dict:
+    items_per_request = args.batch_size if endpoint == "batch" else 1
+    run = {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        **summarize(latencies, errors, args.seconds, items_per_request),
+    }
+    logger.info(
+        f"{endpoint} x{concurrency}: {run['requests_per_second']:.0f} requests/s, "
+        f"p50 {run['latency_ms']['p50']:.2f}ms, p99 {run['latency_ms']['p99']:.2f}ms, {errors} errors"
+    )
+    return run
+
+
+parser = argparse.ArgumentParser(description="Throughput and latency percentiles of the API with a stand-in model")
+parser.add_argument("--mode", action="store", default="localhost", choices=["localhost", "in-process"])
+parser.add_argument(
+    "--endpoints", action="store", nargs="*", default=list(ENDPOINT_PATHS), choices=list(ENDPOINT_PATHS)
+)
+parser.add_argument("--concurrency", action="store", nargs="*", default=[1, 8, 32], type=int)
+parser.add_argument("--seconds", action="store", default=5.0, type=float, help="Duration of each run")
+parser.add_argument("--warmup", action="store", default=1.0, type=float, help="Unrecorded load before each endpoint")
+parser.add_argument("--workers", action="store", default=1, type=int, help="gunicorn workers, localhost mode")
+parser.add_argument("--client-processes", action="store", default=None, type=int, help="Defaults to the CPU count")
+parser.add_argument("--batch-size", action="store", default=100, type=int)
+parser.add_argument("--cache-size", action="store", default=0, type=int, help="Prediction cache size, 0 disables it")
+parser.add_argument("--output", action="store", default=None, help="Path of the JSON artifact")
+parser.add_argument("--compare", action="store", default=None, help="Earlier JSON artifact to compare against")
+args = parser.parse_args()
+
+n_cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+args.client_processes = args.client_processes or n_cpus
+bodies = {endpoint: make_request_bodies(endpoint, batch_size=args.batch_size) for endpoint in args.endpoints}
+
+with tempfile.TemporaryDirectory() as tmp_dir:
+    env = {
+        **save_stand_in_artifacts(tmp_dir),
+        "PREDICTION_CACHE_SIZE": str(args.cache_size),
+        # Sampled success records would otherwise be written to stdout, along with the JSON artifact
+        "LOG_LEVEL": "WARNING",
+    }
+    started = time.time()
+    if args.mode == "localhost":
+        runs = run_localhost(args, env, bodies)
+    else:
+        os.environ.update(env, MODEL_REFRESH_INTERVAL_SECONDS="0")
+        runs = asyncio.run(run_in_process(args, bodies))
+
+artifact = {
+    "commit": git_commit(),
+    "created_at": started,
+    "mode": args.mode,
+    "workers": args.workers if args.mode == "localhost" else None,
+    "cpus": n_cpus,
+    "python": platform.python_version(),
+    "seconds": args.seconds,
+    "batch_size": args.batch_size,
+    "cache_size": args.cache_size,
+    "runs": runs,
+}
+if args.compare:
+    with open(args.compare) as f:
+        baseline = json.load(f)
+    if (baseline["mode"], baseline["workers"], baseline["cpus"]) != (args.mode, artifact["workers"], n_cpus):
+        logger.warning("The baseline ran with another mode, worker count or CPU count: ratios are not comparable")
+    artifact["comparison"] = {"baseline_commit": baseline["commit"], "runs": compare(runs, baseline["runs"])}
+if args.output:
+    with open(args.output, "w") as f:
+        json.dump(artifact, f, indent=2)
+    logger.info(f"Results written to {args.output}")
+print(json.dumps(artifact, indent=2))
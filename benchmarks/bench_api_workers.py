@@ -0,0 +1,37 @@
+import argparse
+import json
+import logging
+import os
+import tempfile
+
+from load_test import load_localhost, make_request_bodies, save_stand_in_artifacts, serve_on_localhost
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--workers", action="store", nargs="*", default=None, type=int)
+parser.add_argument("--clients", action="store", default=None, type=int, help="Defaults to 4 per worker")
+parser.add_argument("--seconds", action="store", default=10.0, type=float)
+args = parser.parse_args()
+
+n_cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+worker_counts = args.workers or sorted({1, max(n_cpus // 2, 1), n_cpus})
+bodies = make_request_bodies("predict")
+
+results = {"cpus": n_cpus, "seconds": args.seconds, "requests_per_second": {}}
+with tempfile.TemporaryDirectory() as tmp_dir:
+    # Measure the model path, not the prediction cache
+    env = {**save_stand_in_artifacts(tmp_dir), "PREDICTION_CACHE_SIZE": "0", "LOG_LEVEL": "WARNING"}
+    for workers in worker_counts:
+        clients = args.clients or 4 * workers
+        with serve_on_localhost(workers, env) as port:
+            latencies, _ = load_localhost(port, "/predict", bodies, clients, args.seconds, processes=clients)
+        rps = len(latencies) / args.seconds
+        results["requests_per_second"][workers] = rps
+        logger.info(f"{workers} workers, {clients} clients: {rps:.0f} requests/s")
+
+baseline = results["requests_per_second"][worker_counts[0]]
+results["speedup"] = {workers: rps / baseline for workers, rps in results["requests_per_second"].items()}
+print(json.dumps(results, indent=2))
@@ -0,0 +1,59 @@
+import argparse
+import logging
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.linear_model import LinearRegression
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+from make_api.app.compiled_model import CompiledLinearModel
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+NUM_FEATURES = ["passenger_count", "trip_type", "congestion_surcharge", "mean_distance", "mean_duration", "rush_hour"]
+
+
+def percentiles_us(timings: list[float]) -> str:
+    p50, p99 = np.percentile(np.array(timings) * 1e6, [50, 99])
+    return f"p50 {p50:.1f}us, p99 {p99:.1f}us"
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--requests", action="store", default=2_000, type=int)
+args = parser.parse_args()
+
+rng = np.random.default_rng(0)
+train_set = pd.DataFrame({name: rng.uniform(0, 10, 10_000) for name in NUM_FEATURES})
+train_set["vendor_id"] = rng.choice(["1", "2"], 10_000)
+preprocessor = ColumnTransformer(
+    transformers=[
+        ("num", StandardScaler(), NUM_FEATURES),
+        ("cat", OneHotEncoder(handle_unknown="ignore"), ["vendor_id"]),
+    ]
+)
+pipe = Pipeline(steps=[("preprocessor", preprocessor), ("model", LinearRegression())])
+pipe.fit(train_set, train_set["mean_distance"] * 2.5 + 3)
+
+compiled = CompiledLinearModel.from_pipeline(pipe)
+compiled.check_parity(pipe)
+
+records = [SimpleNamespace(**row) for row in train_set.head(args.requests).to_dict(orient="records")]
+
+pipeline_timings = []
+for record in records:
+    start = time.perf_counter()
+    pipe.predict(pd.DataFrame([vars(record)]))
+    pipeline_timings.append(time.perf_counter() - start)
+logger.info(f"Pipeline single prediction: {percentiles_us(pipeline_timings)}")
+
+compiled_timings = []
+for record in records:
+    start = time.perf_counter()
+    compiled.predict_record(record)
+    compiled_timings.append(time.perf_counter() - start)
+logger.info(f"Compiled single prediction: {percentiles_us(compiled_timings)}")
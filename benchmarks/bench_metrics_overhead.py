@@ -0,0 +1,101 @@
+import argparse
+import asyncio
+import json
+import logging
+import time
+import timeit
+
+import httpx
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.linear_model import LinearRegression
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+from make_api.app.main import app, ml_models, prediction_cache
+from make_api.app.metrics import REQUEST_DURATION, STAGE_DURATION, RequestTimer, registry
+from make_api.app.serving_model import ServingModel
+
+logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+# The app configures INFO logging; keep the client's per-request records out of the measurement
+logging.getLogger().setLevel(logging.WARNING)
+
+NUM_FEATURES = ["passenger_count", "trip_type", "congestion_surcharge", "mean_distance", "mean_duration", "rush_hour"]
+
+
+async def time_requests(client: httpx.AsyncClient, bodies: list[dict]) -> float:
+    """Mean seconds per /predict request, sent one after the other"""
+    start = time.perf_counter()
+    for body in bodies:
+        response = await client.post("/predict", json=body)
+        response.raise_for_status()
+    return (time.perf_counter() - start) / len(bodies)
+
+
+def record_request():
+    """The bookkeeping TimedRoute and the endpoint do for one /predict request"""
+    timer = RequestTimer("/bench")
+    for stage in ("parse", "feature_assembly", "model_predict", "serialization"):
+        timer.mark(stage)
+    for stage, seconds in timer.stages.items():
+        STAGE_DURATION.observe(seconds, "/bench", stage)
+    REQUEST_DURATION.observe(timer.last - timer.start, "POST", "/bench", "200")
+
+
+async def main(args: argparse.Namespace, bodies: list[dict]) -> dict:
+    timings = {"enabled": [], "disabled": []}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        await time_requests(client, bodies[:200])
+        # Alternate the rounds so drift on the machine affects both settings alike
+        for _ in range(args.rounds):
+            for setting in timings:
+                registry.enabled = setting == "enabled"
+                timings[setting].append(await time_requests(client, bodies))
+    registry.enabled = True
+    return timings
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--requests", action="store", default=2_000, type=int, help="Requests per round")
+parser.add_argument("--rounds", action="store", default=10, type=int)
+args = parser.parse_args()
+
+rng = np.random.default_rng(0)
+train_set = pd.DataFrame({name: rng.uniform(0, 10, 10_000) for name in NUM_FEATURES})
+train_set["vendor_id"] = rng.choice(["1", "2"], 10_000)
+preprocessor = ColumnTransformer(
+    transformers=[
+        ("num", StandardScaler(), NUM_FEATURES),
+        ("cat", OneHotEncoder(handle_unknown="ignore"), ["vendor_id"]),
+    ]
+)
+pipe = Pipeline(steps=[("preprocessor", preprocessor), ("model", LinearRegression())])
+pipe.fit(train_set, train_set["mean_distance"] * 2.5 + 3)
+ml_models["latest_model"] = ServingModel.from_pipeline(pipe, "1", source="benchmark")
+# Measure the model path, not the prediction cache
+prediction_cache.max_size = 0
+
+bodies = [
+    {**row, "passenger_count": 1, "trip_type": 1, "rush_hour": 0}
+    for row in train_set.head(args.requests).to_dict(orient="records")
+]
+timings = asyncio.run(main(args, bodies))
+
+enabled_us = float(np.median(timings["enabled"])) * 1e6
+disabled_us = float(np.median(timings["disabled"])) * 1e6
+results = {
+    "requests_per_round": args.requests,
+    "rounds": args.rounds,
+    "us_per_request_with_metrics": enabled_us,
+    "us_per_request_without_metrics": disabled_us,
+    "overhead_us": enabled_us - disabled_us,
+    "overhead_percent": (enabled_us - disabled_us) / disabled_us * 100,
+    # Less noisy than the difference of two end-to-end timings
+    "bookkeeping_us_per_request": timeit.timeit(record_request, number=100_000) * 10,
+}
+logger.info(f"Metrics add {results['overhead_us']:.1f}us per request ({results['overhead_percent']:.1f}%)")
+print(json.dumps(results, indent=2))
@@ -0,0 +1,51 @@
+import argparse
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+from synthetic_data import make_green_taxi_frame
+
+from utils import outlier_imputer
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+
+def column_by_column_outlier_imputer(df: pd.DataFrame, column_list: list[str], iqr_factor: int) -> pd.DataFrame:
+    """outlier_imputer as it was before clipping the columns in place"""
+    for col in column_list:
+        df.loc[df[col] < 0, col] = 0
+
+        q1 = df[col].quantile(0.25)
+        q3 = df[col].quantile(0.75)
+        iqr = q3 - q1
+        upper_threshold = q3 + (iqr_factor * iqr)
+
+        df.loc[df[col] > upper_threshold, col] = upper_threshold
+
+    return df
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--rows", action="store", default=5_000_000, type=int)
+args = parser.parse_args()
+
+df = make_green_taxi_frame(args.rows)
+df["duration"] = (df["lpep_dropoff_datetime"] - df["lpep_pickup_datetime"]).dt.total_seconds() // 60
+df.loc[df.sample(frac=0.01, random_state=0).index, "fare_amount"] = np.nan
+columns = ["fare_amount", "duration", "trip_distance"]
+logger.info(f"Generated {len(df)} synthetic rows")
+
+start = time.perf_counter()
+in_place = outlier_imputer(df.copy(), columns, 6)
+in_place_seconds = time.perf_counter() - start
+logger.info(f"In-place path: {in_place_seconds:.3f}s")
+
+start = time.perf_counter()
+column_by_column = column_by_column_outlier_imputer(df.copy(), columns, 6)
+column_by_column_seconds = time.perf_counter() - start
+logger.info(f"Column-by-column path: {column_by_column_seconds:.3f}s")
+
+pd.testing.assert_frame_equal(column_by_column[columns], in_place[columns])
+logger.info(f"Outputs identical, speedup x{column_by_column_seconds / in_place_seconds:.1f}")
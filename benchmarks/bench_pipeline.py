@@ -0,0 +1,230 @@
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable
+from unittest import mock
+
+import mlflow
+import pandas as pd
+import pyarrow as pa
+from sklearn.linear_model import LinearRegression
+from synthetic_data import SIZES, make_green_taxi_raw_frame
+
+from make_data.data_loader import ParquetDataSaver
+from make_data.data_processor import IQR_FACTOR, DataProcessor
+from make_model.model_trainer import ModelTrainer
+from project_config import ProjectConfig, Tags
+from utils import apply_dtype_plan, outlier_imputer
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG_PATH = os.path.join(BENCHMARKS_DIR, "..", "project-config.yaml")
+BASELINE_DIR = os.path.join(BENCHMARKS_DIR, "baselines")
+# Timed and reported, but left out of the regression check: their time is mostly the MLflow file store
+# writing to disk, which varies from run to run far more than the pipeline itself
+UNGATED_STAGES = {"train"}
+
+
+def cleaned_frame(raw: pd.DataFrame) -> pd.DataFrame:
+    """Raw trips with the duration column outlier_imputer runs on, as after DataProcessor.clean_trips"""
+    data_processor = DataProcessor(raw.copy(), config)
+    data_processor.clean_trips()
+    return data_processor.df
+
+
+def processed_splits(df: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Train and test sets as scripts/2_process_data.py saves them"""
+    data_processor = DataProcessor(df, config, dtype_plan=config.green_taxi_dtype_plan["processed"])
+    data_processor.process_data()
+    return data_processor.split_data(test_size=0.2, random_state=42)
+
+
+def make_trainer(train_set: pd.DataFrame, test_set: pd.DataFrame) -> ModelTrainer:
+    trainer = ModelTrainer(train_set=train_set, test_set=test_set, config=config, tags=tags)
+    trainer.feature_engineering()
+    return trainer
+
+
+def train(train_set: pd.DataFrame, test_set: pd.DataFrame):
+    make_trainer(train_set, test_set).train()
+
+
+def train_without_mlflow(train_set: pd.DataFrame, test_set: pd.DataFrame):
+    """ModelTrainer.train with the MLflow run, logging and model serialization patched out"""
+    with mock.patch("make_model.model_trainer.mlflow"):
+        train(train_set, test_set)
+
+
+def end_to_end(raw: pd.DataFrame):
+    """Validate the raw trips, read them back with the compact dtypes, process, split and train without MLflow"""
+    data_checker = ParquetDataSaver(raw)
+    data_checker.validate_schema(config.green_taxi_raw_schema)
+    df = apply_dtype_plan(data_checker.data, config.green_taxi_dtype_plan["raw"])
+    train_without_mlflow(*processed_splits(df))
+
+
+def make_stages(raw: pd.DataFrame) -> dict[str, tuple[Callable[[], Any], Callable[[Any], Any]]]:
+    """
+    Per stage, a setup building its input, which is not measured, and the measured call.
+    Setups run before every repeat because the stages modify their input.
+    """
+    cleaned = cleaned_frame(raw)
+    train_set, test_set = processed_splits(raw.copy())
+    return {
+        "validate_schema_pandas": (
+            lambda: ParquetDataSaver(raw.copy()),
+            lambda saver: saver.validate_schema(config.green_taxi_raw_schema),
+        ),
+        "validate_schema_arrow": (
+            lambda: ParquetDataSaver(pa.Table.from_pandas(raw, preserve_index=False)),
+            lambda saver: saver.validate_schema(config.green_taxi_raw_schema),
+        ),
+        "outlier_imputer": (
+            lambda: cleaned.copy(),
+            lambda df: outlier_imputer(df, ["fare_amount", "duration"], IQR_FACTOR),
+        ),
+        "process_data": (
+            lambda: DataProcessor(raw.copy(), config, dtype_plan=config.green_taxi_dtype_plan["processed"]),
+            lambda data_processor: data_processor.process_data(),
+        ),
+        # ModelTrainer.train split into the fitted preprocessing, the model fit, both without MLflow,
+        # and with the MLflow run it logs to, which dominates at small sizes and is not gated
+        "train_preprocessing": (
+            lambda: make_trainer(train_set.copy(), test_set.copy()),
+            lambda trainer: trainer._design_matrices(config.num_features),
+        ),
+        "train_fit": (
+            lambda: make_trainer(train_set.copy(), test_set.copy())._design_matrices(config.num_features)[0],
+            lambda design_matrices: LinearRegression().fit(design_matrices.X_train, design_matrices.y_train),
+        ),
+        "train_without_mlflow": (
+            lambda: (train_set.copy(), test_set.copy()),
+            lambda splits: train_without_mlflow(*splits),
+        ),
+        "train": (lambda: (train_set.copy(), test_set.copy()), lambda splits: train(*splits)),
+        "end_to_end": (lambda: raw.copy(), end_to_end),
+    }
+
+
+def measure(setup: Callable[[], Any], run: Callable[[Any], Any], repeats: int) -> dict:
+    """
+    Wall time of each repeat, then the peak memory allocated by one more traced run. Timed runs are not traced,
+    since tracing slows down allocations. tracemalloc sees Python and numpy allocations but not Arrow's,
+    whose peak is tracked by a proxy pool and added, so the total is an upper bound.
+    """
+    timings = []
+    for _ in range(repeats):
+        stage_input = setup()
+        gc.collect()
+        start = time.perf_counter()
+        run(stage_input)
+        timings.append(time.perf_counter() - start)
+        del stage_input
+
+    stage_input = setup()
+    gc.collect()
+    default_pool = pa.default_memory_pool()
+    arrow_pool = pa.proxy_memory_pool(default_pool)
+    pa.set_memory_pool(arrow_pool)
+    tracemalloc.start()
+    try:
+        run(stage_input)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        pa.set_memory_pool(default_pool)
+    return {
+        "min_seconds": min(timings),
+        "median_seconds": statistics.median(timings),
+        "peak_memory_mib": (peak + arrow_pool.max_memory()) / 1024**2,
+    }
+
+
+def flag_regressions(stages: dict, baseline: dict, time_tolerance: float, memory_tolerance: float) -> list[str]:
+    """
+    Stages slower or using more memory than their baseline beyond the tolerances, except UNGATED_STAGES.
+    The fastest repeat is compared, as the least affected by other load on the machine.
+    """
+    regressions = []
+    for name, result in stages.items():
+        before = baseline["stages"].get(name)
+        if before is None or name in UNGATED_STAGES:
+            continue
+        time_ratio = result["min_seconds"] / before["min_seconds"]
+        memory_ratio = result["peak_memory_mib"] / max(before["peak_memory_mib"], 1e-9)
+        result["time_ratio"] = time_ratio
+        result["memory_ratio"] = memory_ratio
+        if time_ratio > time_tolerance:
+            regressions.append(f"{name} took x{time_ratio:.2f} the baseline time")
+        if memory_ratio > memory_tolerance:
+            regressions.append(f"{name} used x{memory_ratio:.2f} the baseline peak memory")
+    return regressions
+
+
+parser = argparse.ArgumentParser(description="Time and memory-profile the data and training pipeline stages")
+parser.add_argument("--sizes", action="store", nargs="*", default=["100k"], choices=list(SIZES))
+parser.add_argument("--stages", action="store", nargs="*", default=None, help="Defaults to every stage")
+parser.add_argument("--repeats", action="store", default=3, type=int)
+parser.add_argument("--time-tolerance", action="store", default=1.3, type=float, help="Allowed slowdown ratio")
+parser.add_argument("--memory-tolerance", action="store", default=1.2, type=float, help="Allowed peak memory ratio")
+parser.add_argument("--update-baseline", action="store_true", help="Overwrite the baselines with these results")
+parser.add_argument("--baseline-dir", action="store", default=BASELINE_DIR)
+args = parser.parse_args()
+
+config = ProjectConfig.from_yaml(CONFIG_PATH)
+tags = Tags(git_sha="benchmark", branch="benchmark")
+environment = {
+    "cpus": len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count(),
+    "python": platform.python_version(),
+    "pandas": pd.__version__,
+}
+
+all_regressions = []
+with tempfile.TemporaryDirectory() as tmp_dir:
+    # Runs are logged to a throwaway local store, so no MLflow server is needed
+    mlflow.set_tracking_uri(f"file://{tmp_dir}/mlruns")
+    for size in args.sizes:
+        raw = make_green_taxi_raw_frame(SIZES[size])
+        logger.info(f"Generated {len(raw)} synthetic raw trips")
+        stages = make_stages(raw)
+        results = {}
+        for name in args.stages or stages:
+            setup, run = stages[name]
+            results[name] = measure(setup, run, args.repeats)
+            logger.info(
+                f"[{size}] {name}: {results[name]['min_seconds']:.3f}s, peak {results[name]['peak_memory_mib']:.0f} MiB"
+            )
+        del raw, stages
+
+        baseline_path = os.path.join(args.baseline_dir, f"pipeline_{size}.json")
+        report = {"rows": SIZES[size], "repeats": args.repeats, "environment": environment, "stages": results}
+        if args.update_baseline:
+            os.makedirs(args.baseline_dir, exist_ok=True)
+            with open(baseline_path, "w") as f:
+                json.dump(report, f, indent=2)
+                f.write("\n")
+            logger.info(f"Baseline written to {baseline_path}")
+        elif os.path.exists(baseline_path):
+            with open(baseline_path) as f:
+                baseline = json.load(f)
+            if baseline["environment"] != environment:
+                logger.warning(f"Baseline recorded on {baseline['environment']}, comparing anyway")
+            regressions = flag_regressions(results, baseline, args.time_tolerance, args.memory_tolerance)
+            all_regressions.extend(f"[{size}] {regression}" for regression in regressions)
+        else:
+            logger.warning(f"No baseline at {baseline_path}, run with --update-baseline to record one")
+        print(json.dumps(report, indent=2))
+
+for regression in all_regressions:
+    logger.error(f"[Regression] {regression}")
+sys.exit(1 if all_regressions else 0)
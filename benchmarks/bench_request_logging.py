@@ -0,0 +1,84 @@
+import argparse
+import logging
+import os
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.linear_model import LinearRegression
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+from make_api.app.compiled_model import CompiledLinearModel
+from make_api.app.request_logging import sampled, start_queue_logging, stop_queue_logging
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+NUM_FEATURES = ["passenger_count", "trip_type", "congestion_surcharge", "mean_distance", "mean_duration", "rush_hour"]
+
+
+def mean_us(timings: list[float]) -> str:
+    return f"{np.mean(timings) * 1e6:.1f}us per request"
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--requests", action="store", default=5_000, type=int)
+parser.add_argument("--sample-rate", action="store", default=0.01, type=float)
+args = parser.parse_args()
+
+rng = np.random.default_rng(0)
+train_set = pd.DataFrame({name: rng.uniform(0, 10, 10_000) for name in NUM_FEATURES})
+train_set["vendor_id"] = rng.choice(["1", "2"], 10_000)
+preprocessor = ColumnTransformer(
+    transformers=[
+        ("num", StandardScaler(), NUM_FEATURES),
+        ("cat", OneHotEncoder(handle_unknown="ignore"), ["vendor_id"]),
+    ]
+)
+pipe = Pipeline(steps=[("preprocessor", preprocessor), ("model", LinearRegression())])
+pipe.fit(train_set, train_set["mean_distance"] * 2.5 + 3)
+compiled = CompiledLinearModel.from_pipeline(pipe)
+
+rows = train_set.head(args.requests).to_dict(orient="records")
+records = [SimpleNamespace(**row) for row in rows]
+
+inference_timings = []
+for record in records:
+    start = time.perf_counter()
+    compiled.predict_record(record)
+    inference_timings.append(time.perf_counter() - start)
+logger.info(f"Compiled inference: {mean_us(inference_timings)}")
+
+# Every request logged through the logger the handlers write to, as the API did before
+request_logger = logging.getLogger("make_api.app.main")
+root = logging.getLogger()
+previous_handlers = root.handlers[:]
+with open(os.devnull, "w") as devnull:
+    handler = logging.StreamHandler(devnull)
+    handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+    root.handlers = [handler]
+    dataframe_timings = []
+    for row in rows:
+        start = time.perf_counter()
+        request_logger.info(f"[Prediction Input] Received input: {pd.DataFrame([row])}")
+        request_logger.info(f"[Prediction Output] Prediction: {1.0}")
+        dataframe_timings.append(time.perf_counter() - start)
+
+    listener = start_queue_logging("INFO", stream=devnull)
+    queue_timings = []
+    for row in rows:
+        start = time.perf_counter()
+        if sampled(args.sample_rate):
+            request_logger.info(
+                "[Prediction Output] Prediction successful",
+                extra={"fields": {"model_version": "1", "latency_ms": 0.1, "inputs": [row], "prediction": 1.0}},
+            )
+        queue_timings.append(time.perf_counter() - start)
+    stop_queue_logging(listener)
+root.handlers = previous_handlers
+
+logger.info(f"Synchronous DataFrame logging: {mean_us(dataframe_timings)}")
+logger.info(f"Sampled queue logging at rate {args.sample_rate}: {mean_us(queue_timings)}")
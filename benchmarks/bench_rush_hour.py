@@ -0,0 +1,53 @@
+import argparse
+import logging
+import time
+
+import pandas as pd
+from synthetic_data import make_green_taxi_frame
+
+from utils import rush_hourizer, vectorized_rush_hourizer
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+
+def row_wise_rush_hour(df: pd.DataFrame) -> pd.Series:
+    """Calendar and rush hour features as DataProcessor.process_data computed them before vectorization"""
+    df["day"] = df["lpep_pickup_datetime"].dt.day_name().str.lower()
+    df["month"] = df["lpep_pickup_datetime"].dt.strftime("%b").str.lower()
+    df["rush_hour"] = df["lpep_pickup_datetime"].dt.hour
+    df.loc[df["day"].isin(["saturday", "sunday"]), "rush_hour"] = 0
+
+    df["rush_hour"] = df["rush_hour"].astype(int)
+    mask = (df["day"] != "saturday") & (df["day"] != "sunday")
+    df.loc[mask, "rush_hour"] = df.loc[mask].apply(rush_hourizer, axis=1)
+    return df["rush_hour"]
+
+
+def vectorized_rush_hour(df: pd.DataFrame) -> pd.Series:
+    """Calendar and rush hour features as DataProcessor.process_data computes them now"""
+    pickup_datetime = df["lpep_pickup_datetime"]
+    is_weekday = pickup_datetime.dt.dayofweek < 5
+    df["rush_hour"] = vectorized_rush_hourizer(pickup_datetime.dt.hour).where(is_weekday, 0)
+    return df["rush_hour"]
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--rows", action="store", default=3_000_000, type=int)
+args = parser.parse_args()
+
+df = make_green_taxi_frame(args.rows)
+logger.info(f"Generated {len(df)} synthetic rows")
+
+start = time.perf_counter()
+vectorized = vectorized_rush_hour(df.copy())
+vectorized_seconds = time.perf_counter() - start
+logger.info(f"Vectorized path: {vectorized_seconds:.3f}s")
+
+start = time.perf_counter()
+row_wise = row_wise_rush_hour(df.copy())
+row_wise_seconds = time.perf_counter() - start
+logger.info(f"Row-wise path: {row_wise_seconds:.3f}s")
+
+pd.testing.assert_series_equal(row_wise, vectorized)
+logger.info(f"Outputs identical, speedup x{row_wise_seconds / vectorized_seconds:.1f}")
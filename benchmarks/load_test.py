@@ -0,0 +1,333 @@
+import asyncio
+import contextlib
+import http.client
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+from typing import Iterator, Optional
+
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.linear_model import LinearRegression
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+from make_data.data_processor import save_route_stats_table
+from make_model.model_bundle import build_model_bundle, save_model_bundle
+
+NUM_FEATURES = ["passenger_count", "trip_type", "congestion_surcharge", "mean_distance", "mean_duration", "rush_hour"]
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "make_api")
+ENDPOINT_PATHS = {"predict": "/predict", "batch": "/predict/batch", "route": "/predict/route"}
+N_ZONES = 266
+
+
+def fit_stand_in_pipeline(n_rows: int = 10_000, seed: int = 0) -> Pipeline:
+    """
+    Fit a pipeline shaped like the ones ModelTrainer registers, so the API can be benchmarked without MLflow.
+
+    Args:
+        n_rows (int, optional): Number of training rows. Defaults to 10_000.
+        seed (int, optional): Random seed. Defaults to 0.
+    """
+    rng = np.random.default_rng(seed)
+    train_set = pd.DataFrame({name: rng.uniform(0, 10, n_rows) for name in NUM_FEATURES})
+    train_set["vendor_id"] = rng.choice(["1", "2"], n_rows)
+    preprocessor = ColumnTransformer(
+        transformers=[
+            ("num", StandardScaler(), NUM_FEATURES),
+            ("cat", OneHotEncoder(handle_unknown="ignore"), ["vendor_id"]),
+        ]
+    )
+    pipe = Pipeline(steps=[("preprocessor", preprocessor), ("model", LinearRegression())])
+    pipe.fit(train_set, train_set["mean_distance"] * 2.5 + 3)
+    return pipe
+
+
+def save_stand_in_artifacts(directory: str, seed: int = 0) -> dict[str, str]:
+    """
+    Export a stand-in model bundle and route statistics table, as the API loads them in production.
+
+    Args:
+        directory (str): Directory the files are written to
+        seed (int, optional): Random seed. Defaults to 0.
+
+    Returns:
+        dict[str, str]: Environment variables pointing the API at the files
+    """
+    bundle_path = os.path.join(directory, "model_bundle.json")
+    save_model_bundle(
+        build_model_bundle(fit_stand_in_pipeline(seed=seed), "taxi_fare_model", 1, "benchmark"), bundle_path
+    )
+
+    route_stats_path = os.path.join(directory, "route_stats.npz")
+    rng = np.random.default_rng(seed)
+    save_route_stats_table(route_stats_path, rng.uniform(0.5, 20, (N_ZONES, N_ZONES, 2)).astype(np.float32))
+    return {"MODEL_BUNDLE_PATH": bundle_path, "ROUTE_STATS_PATH": route_stats_path}
+
+
+def make_request_bodies(endpoint: str, n_bodies: int = 1_000, batch_size: int = 100, seed: int = 0) -> list[bytes]:
+    """
+    Serialized request bodies with distinct trips, so every request is scored unless the cache is enabled.
+
+    Args:
+        endpoint (str): One of ENDPOINT_PATHS
+        n_bodies (int, optional): Number of bodies, cycled through by the clients. Defaults to 1_000.
+        batch_size (int, optional): Trips per /predict/batch body. Defaults to 100.
+        seed (int, optional): Random seed. Defaults to 0.
+    """
+    rng = np.random.default_rng(seed)
+
+    def trip() -> dict:
+        body = {
+            "passenger_count": int(rng.choice([1, 2, 3, 5], p=[0.8, 0.1, 0.05, 0.05])),
+            "trip_type": int(rng.choice([1, 2], p=[0.97, 0.03])),
+            "congestion_surcharge": float(rng.choice([0.0, 2.75], p=[0.8, 0.2])),
+            "rush_hour": int(rng.integers(0, 2)),
+            "vendor_id": str(rng.integers(1, 3)),
+        }
+        if endpoint == "route":
+            body.update(PULocationID=int(rng.integers(1, N_ZONES)), DOLocationID=int(rng.integers(1, N_ZONES)))
+        else:
+            body.update(mean_distance=float(rng.gamma(1.5, 1.8)), mean_duration=float(rng.gamma(2.0, 7.5)))
+        return body
+
+    if endpoint == "batch":
+        return [json.dumps([trip() for _ in range(batch_size)]).encode() for _ in range(n_bodies)]
+    return [json.dumps(trip()).encode() for _ in range(n_bodies)]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_healthy(port: int, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            connection.request("GET", "/health")
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"The API did not become healthy on port {port}")
+
+
+@contextlib.contextmanager
+def serve_on_localhost(workers: int, env: dict[str, str]) -> Iterator[int]:
+    """
+    Run the API under gunicorn, as in the container, and yield its port once it is healthy.
+
+    Args:
+        workers (int): Number of gunicorn workers
+        env (dict[str, str]): Environment variables of the server, e.g. from save_stand_in_artifacts
+    """
+    port = free_port()
+    server_env = {
+        **os.environ,
+        "WEB_CONCURRENCY": str(workers),
+        "GUNICORN_BIND": f"127.0.0.1:{port}",
+        "MODEL_REFRESH_INTERVAL_SECONDS": "0",
+        **env,
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--log-level", "warning"],
+        cwd=API_DIR,
+        env=server_env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_healthy(port)
+        yield port
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def is_error(status_code: int, body: bytes) -> bool:
+    """Whether a response failed, including the 200 responses carrying a failed prediction, e.g. without a model"""
+    return status_code != 200 or b'"status":"failure"' in body
+
+
+async def _post(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, request: bytes) -> bool:
+    """Send a prepared HTTP/1.1 request on a keep-alive connection and read the response, returning if it failed"""
+    writer.write(request)
+    status_line = await reader.readline()
+    content_length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.partition(b":")
+        if name.strip().lower() == b"content-length":
+            content_length = int(value)
+    body = await reader.readexactly(content_length)
+    return is_error(int(status_line.split(b" ", 2)[1]), body)
+
+
+async def _drive_localhost(port: int, path: str, bodies: list[bytes], concurrency: int, seconds: float, offset: int):
+    """
+    Closed-loop load: concurrency connections, each posting its next body as soon as the previous response is read.
+    A minimal client keeps the load generator's own cost per request low, since it usually shares the machine.
+    """
+    requests = [
+        f"POST {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode()
+        + body
+        for body in bodies
+    ]
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + seconds
+
+    async def connection_loop(index: int):
+        nonlocal errors
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        i = offset + index
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            failed = await _post(reader, writer, requests[i % len(requests)])
+            latencies.append(time.perf_counter() - start)
+            errors += failed
+            i += concurrency
+        writer.close()
+
+    await asyncio.gather(*(connection_loop(index) for index in range(concurrency)))
+    return latencies, errors
+
+
+def _client_process(port, path, bodies, concurrency, seconds, offset, results: multiprocessing.Queue):
+    latencies, errors = asyncio.run(_drive_localhost(port, path, bodies, concurrency, seconds, offset))
+    results.put((np.asarray(latencies, dtype=np.float64), errors))
+
+
+def load_localhost(
+    port: int, path: str, bodies: list[bytes], concurrency: int, seconds: float, processes: int = 1
+) -> tuple[np.ndarray, int]:
+    """
+    Drive the API on localhost with concurrency connections spread over client processes.
+
+    Args:
+        port (int): Port of the API
+        path (str): Path posted to, e.g. "/predict"
+        bodies (list[bytes]): Request bodies, cycled through
+        concurrency (int): Number of requests in flight
+        seconds (float): Duration of the load
+        processes (int, optional): Client processes, to keep the client from being the bottleneck. Defaults to 1.
+
+    Returns:
+        tuple[np.ndarray, int]: Latency of every request in seconds, and the number of failed ones
+    """
+    processes = max(1, min(processes, concurrency))
+    shares = [concurrency // processes + (i < concurrency % processes) for i in range(processes)]
+    results = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(
+            target=_client_process, args=(port, path, bodies, share, seconds, sum(shares[:i]), results)
+        )
+        for i, share in enumerate(shares)
+    ]
+    for worker in workers:
+        worker.start()
+    outcomes = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    return np.concatenate([latencies for latencies, _ in outcomes]), sum(errors for _, errors in outcomes)
+
+
+async def load_in_process(
+    app, path: str, bodies: list[bytes], concurrency: int, seconds: float
+) -> tuple[np.ndarray, int]:
+    """
+    Drive an ASGI app in this process, without sockets: measures the app's own overhead per request.
+    Requests only interleave where the app awaits, so latencies do not include queueing as on a server.
+
+    Args:
+        app: ASGI app, with its lifespan already entered
+        path (str): Path posted to, e.g. "/predict"
+        bodies (list[bytes]): Request bodies, cycled through
+        concurrency (int): Number of requests in flight
+        seconds (float): Duration of the load
+
+    Returns:
+        tuple[np.ndarray, int]: Latency of every request in seconds, and the number of failed ones
+    """
+    import httpx
+
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + seconds
+    headers = {"Content-Type": "application/json"}
+
+    async def task_loop(client: httpx.AsyncClient, index: int):
+        nonlocal errors
+        i = index
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = await client.post(path, content=bodies[i % len(bodies)], headers=headers)
+            latencies.append(time.perf_counter() - start)
+            errors += is_error(response.status_code, response.content)
+            i += concurrency
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark") as client:
+        await asyncio.gather(*(task_loop(client, index) for index in range(concurrency)))
+    return np.asarray(latencies, dtype=np.float64), errors
+
+
+def summarize(latencies: np.ndarray, errors: int, seconds: float, items_per_request: int = 1) -> dict:
+    """
+    Throughput and latency percentiles of a load run, in a stable layout to compare between commits.
+
+    Args:
+        latencies (np.ndarray): Latency of every request in seconds
+        errors (int): Number of failed requests
+        seconds (float): Duration of the load
+        items_per_request (int, optional): Trips per request, e.g. the batch size. Defaults to 1.
+    """
+    p50, p95, p99 = np.percentile(latencies * 1000, [50, 95, 99]) if len(latencies) else (np.nan,) * 3
+    return {
+        "requests": int(len(latencies)),
+        "errors": int(errors),
+        "requests_per_second": len(latencies) / seconds,
+        "items_per_second": len(latencies) * items_per_request / seconds,
+        "latency_ms": {
+            "p50": float(p50),
+            "p95": float(p95),
+            "p99": float(p99),
+            "mean": float(latencies.mean() * 1000) if len(latencies) else float("nan"),
+            "max": float(latencies.max() * 1000) if len(latencies) else float("nan"),
+        },
+    }
+
+
+def compare(results: list[dict], baseline: list[dict]) -> list[dict]:
+    """
+    Ratio of each run's throughput and p99 latency to the baseline run with the same endpoint and concurrency.
+
+    Args:
+        results (list[dict]): Runs of the current commit
+        baseline (list[dict]): Runs of an earlier artifact
+    """
+    previous = {(run["endpoint"], run["concurrency"]): run for run in baseline}
+    comparison = []
+    for run in results:
+        before: Optional[dict] = previous.get((run["endpoint"], run["concurrency"]))
+        if before is None:
+            continue
+        comparison.append(
+            {
+                "endpoint": run["endpoint"],
+                "concurrency": run["concurrency"],
+                "requests_per_second_ratio": run["requests_per_second"] / before["requests_per_second"],
+                "p99_ratio": run["latency_ms"]["p99"] / before["latency_ms"]["p99"],
+            }
+        )
+    return comparison
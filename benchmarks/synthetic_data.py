@@ -0,0 +1,176 @@
+import numpy as np
+import pandas as pd
+
+
+def make_green_taxi_frame(n_rows: int, seed: int = 42) -> pd.DataFrame:
+    """
+    Generate a synthetic frame shaped like the raw green taxi trip data.
+
+    Args:
+        n_rows (int): Number of trips to generate
+        seed (int, optional): Random seed. Defaults to 42.
+
+    Returns:
+        pd.DataFrame: Synthetic trips
+    """
+    rng = np.random.default_rng(seed)
+
+    start = np.datetime64("2024-01-01T00:00:00")
+    pickup_offsets = rng.integers(0, 366 * 24 * 3600, size=n_rows).astype("timedelta64[s]")
+    trip_seconds = rng.gamma(shape=2.0, scale=450.0, size=n_rows).astype(np.int64).astype("timedelta64[s]")
+    pickup = start + pickup_offsets
+    dropoff = pickup + trip_seconds
+
+    trip_distance = rng.gamma(shape=1.5, scale=1.8, size=n_rows).round(2)
+
+    return pd.DataFrame(
+        {
+            "VendorID": rng.choice([1, 2], size=n_rows, p=[0.15, 0.85]),
+            "lpep_pickup_datetime": pd.to_datetime(pickup),
+            "lpep_dropoff_datetime": pd.to_datetime(dropoff),
+            "PULocationID": rng.integers(1, 266, size=n_rows),
+            "DOLocationID": rng.integers(1, 266, size=n_rows),
+            "passenger_count": rng.choice([1.0, 2.0, 3.0, 5.0], size=n_rows, p=[0.8, 0.1, 0.05, 0.05]),
+            "trip_distance": trip_distance,
+            "fare_amount": (3.0 + 2.5 * trip_distance + rng.normal(0, 2.0, size=n_rows)).round(2),
+            "trip_type": rng.choice([1.0, 2.0], size=n_rows, p=[0.97, 0.03]),
+            "congestion_surcharge": rng.choice([0.0, 2.75], size=n_rows, p=[0.8, 0.2]),
+        }
+    )
+
+
+# Row counts the pipeline benchmarks are run and baselined at
+SIZES = {"100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+N_TAXI_ZONES = 265
+# Share of trips by pickup hour, low overnight and peaking in the evening rush
+HOURLY_SHARE = np.array(
+    [2, 1.4, 1, 0.8, 0.8, 1.2, 2.5, 4, 5, 5, 5, 5.2, 5.5, 5.6, 5.8, 6, 6.4, 6.8, 6.5, 5.5, 4.5, 3.8, 3.2, 2.6]
+)
+
+
+def make_green_taxi_raw_frame(n_rows: int, seed: int = 42, month: str = "2024-03") -> pd.DataFrame:
+    """
+    Generate one month of synthetic trips with every column of green_taxi_raw_schema, in the dtypes a TLC
+    parquet file is read with. Distributions follow the real data closely enough to exercise the pipeline:
+    a few popular pickup zones and many quiet ones, a daily pickup pattern, metered fares growing with
+    distance and duration, negotiated flat fares, refunds with negative amounts, a few outliers,
+    and about 5% of trips missing their RatecodeID, passenger_count, payment_type, trip_type
+    and congestion_surcharge together. ehail_fee is always missing, as in the TLC files.
+
+    Args:
+        n_rows (int): Number of trips to generate
+        seed (int, optional): Random seed. Defaults to 42.
+        month (str, optional): Month of the pickups, as YYYY-MM. Defaults to "2024-03".
+
+    Returns:
+        pd.DataFrame: Synthetic raw trips
+    """
+    rng = np.random.default_rng(seed)
+
+    # Zipf-like zone popularity over a fixed ranking of the zones, the same for every seed
+    zone_ranking = np.random.default_rng(0).permutation(np.arange(1, N_TAXI_ZONES + 1))
+    zone_share = 1.0 / np.arange(1, N_TAXI_ZONES + 1) ** 1.1
+    zone_share /= zone_share.sum()
+    pickup_zone = rng.choice(zone_ranking, size=n_rows, p=zone_share)
+    dropoff_zone = np.where(rng.random(n_rows) < 0.15, pickup_zone, rng.choice(zone_ranking, size=n_rows, p=zone_share))
+
+    month_start = np.datetime64(f"{month}-01T00:00:00")
+    n_days = pd.Period(month, freq="M").days_in_month
+    pickup_seconds = (
+        rng.integers(0, n_days, n_rows) * 86_400
+        + rng.choice(24, size=n_rows, p=HOURLY_SHARE / HOURLY_SHARE.sum()) * 3_600
+        + rng.integers(0, 3_600, n_rows)
+    )
+    pickup = month_start + pickup_seconds.astype("timedelta64[s]")
+
+    trip_distance = np.round(rng.lognormal(mean=0.6, sigma=0.8, size=n_rows), 2)
+    trip_distance[rng.random(n_rows) < 0.01] = 0.0
+    outliers = rng.random(n_rows) < 0.0005
+    trip_distance[outliers] = np.round(rng.uniform(100, 5_000, outliers.sum()), 2)
+
+    minutes = 2 + trip_distance.clip(max=60) * rng.gamma(shape=4.0, scale=0.9, size=n_rows)
+    stuck_meters = rng.random(n_rows) < 0.0005
+    minutes[stuck_meters] = rng.uniform(600, 1_500, stuck_meters.sum())
+    trip_seconds = (minutes * 60).astype(np.int64)
+    trip_seconds[rng.random(n_rows) < 0.0002] *= -1
+    dropoff = pickup + trip_seconds.astype("timedelta64[s]")
+
+    rate_code = rng.choice([1.0, 2.0, 3.0, 4.0, 5.0], size=n_rows, p=[0.95, 0.004, 0.002, 0.004, 0.04])
+    negotiated = rate_code == 5.0
+    fare_amount = np.where(
+        negotiated,
+        rng.choice([10.0, 15.0, 20.0, 25.0, 30.0, 40.0, 50.0], size=n_rows),
+        np.round(3.0 + 1.75 * trip_distance + 0.35 * minutes + rng.normal(0, 1.0, n_rows), 1),
+    )
+    refunds = rng.random(n_rows) < 0.002
+    fare_amount[refunds] = -fare_amount[refunds]
+
+    hour = (pickup_seconds // 3_600) % 24
+    extra = np.where((hour >= 16) & (hour < 20), 2.5, np.where((hour >= 20) | (hour < 6), 1.0, 0.0))
+    extra[negotiated] = 0.0
+    mta_tax = np.where(negotiated, 0.0, 0.5)
+    payment_type = rng.choice([1.0, 2.0, 3.0, 4.0], size=n_rows, p=[0.6, 0.38, 0.01, 0.01])
+    tip_amount = np.where(payment_type == 1.0, np.round(fare_amount.clip(min=0) * rng.uniform(0, 0.25, n_rows), 2), 0.0)
+    tolls_amount = np.where(rng.random(n_rows) < 0.02, 6.94, 0.0)
+    improvement_surcharge = np.full(n_rows, 1.0)
+    congestion_surcharge = rng.choice([0.0, 2.75], size=n_rows, p=[0.8, 0.2])
+    for amount in (extra, mta_tax, tip_amount, tolls_amount, improvement_surcharge, congestion_surcharge):
+        amount[refunds] = -amount[refunds]
+    total_amount = np.round(
+        fare_amount + extra + mta_tax + tip_amount + tolls_amount + improvement_surcharge + congestion_surcharge, 2
+    )
+
+    passenger_count = rng.choice(
+        [0.0, 1.0, 2.0, 3.0, 4.0, 5.0, 6.0], size=n_rows, p=[0.01, 0.84, 0.08, 0.03, 0.01, 0.02, 0.01]
+    )
+    trip_type = np.where(negotiated & (rng.random(n_rows) < 0.7), 2.0, 1.0)
+    store_and_fwd_flag = pd.Series(rng.choice(["N", "Y"], size=n_rows, p=[0.997, 0.003]), dtype=object)
+
+    # Street-hail trips recorded without the meter details
+    unmetered = rng.random(n_rows) < 0.05
+    for column in (rate_code, passenger_count, payment_type, trip_type, congestion_surcharge):
+        column[unmetered] = np.nan
+    store_and_fwd_flag[unmetered] = None
+
+    return pd.DataFrame(
+        {
+            "VendorID": rng.choice([1, 2], size=n_rows, p=[0.15, 0.85]).astype(np.int32),
+            "lpep_pickup_datetime": pickup.astype("datetime64[us]"),
+            "lpep_dropoff_datetime": dropoff.astype("datetime64[us]"),
+            "store_and_fwd_flag": store_and_fwd_flag,
+            "RatecodeID": rate_code,
+            "PULocationID": pickup_zone.astype(np.int32),
+            "DOLocationID": dropoff_zone.astype(np.int32),
+            "passenger_count": passenger_count,
+            "trip_distance": trip_distance,
+            "fare_amount": fare_amount,
+            "extra": extra,
+            "mta_tax": mta_tax,
+            "tip_amount": tip_amount,
+            "tolls_amount": tolls_amount,
+            "ehail_fee": np.full(n_rows, np.nan),
+            "improvement_surcharge": improvement_surcharge,
+            "total_amount": total_amount,
+            "payment_type": payment_type,
+            "trip_type": trip_type,
+            "congestion_surcharge": congestion_surcharge,
+        }
+    )
+
+
+if __name__ == "__main__":
+    import argparse
+    import logging
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    parser = argparse.ArgumentParser(description="Write synthetic raw green taxi trips to a parquet file")
+    parser.add_argument("--rows", action="store", default="100k", help=f"One of {list(SIZES)} or a row count")
+    parser.add_argument("--seed", action="store", default=42, type=int)
+    parser.add_argument("--month", action="store", default="2024-03")
+    parser.add_argument("--output", action="store", required=True)
+    args = parser.parse_args()
+
+    n_rows = SIZES[args.rows] if args.rows in SIZES else int(args.rows)
+    make_green_taxi_raw_frame(n_rows, seed=args.seed, month=args.month).to_parquet(args.output, index=False)
+    logging.info(f"Wrote {n_rows} synthetic trips to {args.output}")
@@ -3,8 +3,9 @@ from datetime import datetime, timedelta
 
 import yaml
 
-from make_data.data_loader import NYCTaxiDataFetcher, ParquetDataSaver
+from make_data.data_loader import NYCTaxiDataFetcher
 from make_data.gcs_connector import GCSConnector
+from make_data.ingestion_runner import BatchIngestionRunner
 from project_config import ProjectConfig
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -19,15 +20,14 @@ logger.info(yaml.dump(config, default_flow_style=False))
 data_fetcher = NYCTaxiDataFetcher(taxi_type=config.taxi_type)
 gcs_connector = GCSConnector(bucket_name=config.gcs_raw_data_bucket_name)
 
-data = data_fetcher.fetch(year=year, month=month)
-file_name = f"{config.taxi_type}_tripdata_{year}-{month:02d}.parquet"
-if gcs_connector.check_file_exists(file_name):
-    logger.info(f"File {file_name} already exists in GCS bucket. Skipping")
-else:
-    try:
-        data_checker = ParquetDataSaver(data)
-        data_checker.validate_schema(config.green_taxi_raw_schema)
-        gcs_connector.upload(data, file_name)
-    except Exception as e:
-        logger.error(f"Data might not exist yet for {year}-{month:02d}. Skipping")
-        raise e
+runner = BatchIngestionRunner(
+    data_fetcher=data_fetcher,
+    gcs_connector=gcs_connector,
+    schema=config.green_taxi_raw_schema,
+    max_workers=1,
+)
+statuses = runner.run([(year, month)])
+
+if statuses[data_fetcher.file_name(year, month)] == "failed":
+    logger.error(f"Data might not exist yet for {year}-{month:02d}. Skipping")
+    raise RuntimeError(f"Failed to ingest {year}-{month:02d}")
@@ -1,28 +1,147 @@
+import argparse
 import logging
-from datetime import datetime
+import os
+from datetime import datetime, timedelta
 
 import yaml
 
-from make_data.data_processor import DataProcessor
+from make_data.data_loader import NYCTaxiDataFetcher
+from make_data.data_processor import ROUTE_STATS_VERSION, DataProcessor
 from make_data.gcs_connector import GCSConnector
+from make_data.incremental_processor import IncrementalDataProcessor, IncrementalState
+from make_data.streaming_processor import StreamingDataProcessor
 from project_config import ProjectConfig
+from utils import memory_report
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
+three_months_ago = datetime.now() - timedelta(days=90)
+
+parser = argparse.ArgumentParser()
+mode = parser.add_mutually_exclusive_group()
+mode.add_argument(
+    "--streaming",
+    action="store_true",
+    help="Process the raw data one month at a time instead of loading all of it into memory",
+)
+mode.add_argument(
+    "--incremental",
+    action="store_true",
+    help="Process only --month on top of the saved state of the previous months, adding its rows to the dataset",
+)
+parser.add_argument(
+    "--month",
+    default=f"{three_months_ago.year}-{three_months_ago.month:02d}",
+    help="Month processed by --incremental, as YYYY-MM. Defaults to the month loaded by 1_load_monthly_data.py",
+)
+args = parser.parse_args()
+
+
+def raw_months() -> list[str]:
+    """Months of the raw files a full rebuild reads"""
+    return [
+        NYCTaxiDataFetcher.file_month(file_name)
+        for file_name in raw_gcs_bucket_connector.list_parquet_files(taxi_type="green")
+    ]
+
+
+def save_incremental_state(state: IncrementalState):
+    """Save the incremental state to the processed bucket, where the next --incremental run picks it up"""
+    state.save(config.incremental_state_file_name)
+    processed_gcs_bucket_connector.upload_file(config.incremental_state_file_name, config.incremental_state_file_name)
+    os.remove(config.incremental_state_file_name)
+
 
 config = ProjectConfig.from_yaml("project-config.yaml")
 logger.info(yaml.dump(config, default_flow_style=False))
 
-raw_gcs_bucket_connector = GCSConnector(bucket_name=config.gcs_raw_data_bucket_name)
+raw_gcs_bucket_connector = GCSConnector(
+    bucket_name=config.gcs_raw_data_bucket_name,
+    cache_dir=os.getenv("GCS_CACHE_DIR", os.path.expanduser("~/.cache/mlops-101/gcs")),
+)
+processed_gcs_bucket_connector = GCSConnector(bucket_name=config.gcs_processed_taxi_data_bucket_name)
 
-df = raw_gcs_bucket_connector.read_many_from_gcs(taxi_type="green")
-data_processor = DataProcessor(df=df, config=config)
-data_processor.process_data()
-train_set, test_set = data_processor.split_data(test_size=0.2, random_state=42)
+# A full rebuild writes a new generation of the dataset, which readers only see once both splits are written
+# and it is published in one write. A failed rebuild leaves the previous generation in place
+rebuild_generation = f"rebuild-{datetime.now():%Y%m%dT%H%M%S}"
 
-processed_gcs_bucket_connector = GCSConnector(bucket_name=config.gcs_processed_taxi_data_bucket_name)
-train_file_name = config.train_file_name_destination + f"{datetime.now()}.parquet".replace(" ", "_")
-processed_gcs_bucket_connector.upload(train_set, train_file_name)
-test_file_name = config.test_file_name_destination + f"{datetime.now()}.parquet".replace(" ", "_")
-processed_gcs_bucket_connector.upload(test_set, test_file_name)
+raw_dtype_plan = config.green_taxi_dtype_plan["raw"]
+processed_dtype_plan = config.green_taxi_dtype_plan["processed"]
+
+if args.incremental:
+    year, month = (int(part) for part in args.month.split("-"))
+    state_file_name = config.incremental_state_file_name
+    if processed_gcs_bucket_connector.check_file_exists(state_file_name):
+        processed_gcs_bucket_connector.download_file(state_file_name, state_file_name)
+        state = IncrementalState.load(state_file_name)
+    else:
+        logger.info("No incremental state found. Starting from an empty state")
+        state = None
+
+    raw_file_name = NYCTaxiDataFetcher(taxi_type=config.taxi_type).file_name(year, month)
+    df = raw_gcs_bucket_connector.read_one_from_gcs(raw_file_name, dtypes=raw_dtype_plan)
+    memory_report(df, "raw")
+    data_processor = IncrementalDataProcessor(config=config, state=state, dtype_plan=processed_dtype_plan)
+
+    train_set, test_set = data_processor.process_month(df, args.month, test_size=0.2, random_state=42)
+    # Files are named after the raw month, so rerunning a month that failed overwrites its own files only
+    for split, split_set in (("train", train_set), ("test", test_set)):
+        processed_gcs_bucket_connector.upload_dataset(
+            split_set, config.processed_dataset_name, split, basename_template=f"{args.month}-{{i}}.parquet"
+        )
+
+    # Saved last, so a failed run leaves the state of the previous month untouched
+    save_incremental_state(data_processor.state)
+elif args.streaming:
+    data_processor = StreamingDataProcessor(
+        chunks=lambda: raw_gcs_bucket_connector.iter_many_from_gcs(taxi_type="green", dtypes=raw_dtype_plan),
+        config=config,
+        dtype_plan=processed_dtype_plan,
+    )
+    data_processor.process("train.parquet", "test.parquet", test_size=0.2, random_state=42)
+    for split in ("train", "test"):
+        processed_gcs_bucket_connector.upload_dataset(
+            f"{split}.parquet", config.processed_dataset_name, split, generation=rebuild_generation
+        )
+        os.remove(f"{split}.parquet")
+    processed_gcs_bucket_connector.publish_dataset(config.processed_dataset_name, rebuild_generation)
+
+    # Reseeded from the rebuilt aggregates, so the next --incremental month merges into the rebuilt data
+    save_incremental_state(
+        IncrementalState.from_aggregates(
+            months=raw_months(),
+            value_counts={col: sketch.counts for col, sketch in data_processor.sketches.items()},
+            route_sums=data_processor.route_aggregate.sums,
+            route_counts=data_processor.route_aggregate.counts,
+        )
+    )
+else:
+    df = raw_gcs_bucket_connector.read_many_from_gcs(taxi_type="green", dtypes=raw_dtype_plan)
+    memory_report(df, "raw")
+    data_processor = DataProcessor(df=df, config=config, dtype_plan=processed_dtype_plan)
+    data_processor.process_data()
+    train_set, test_set = data_processor.split_data(test_size=0.2, random_state=42)
+
+    for split, split_set in (("train", train_set), ("test", test_set)):
+        processed_gcs_bucket_connector.upload_dataset(
+            split_set, config.processed_dataset_name, split, generation=rebuild_generation
+        )
+    processed_gcs_bucket_connector.publish_dataset(config.processed_dataset_name, rebuild_generation)
+
+    # Reseeded from the rebuilt aggregates, so the next --incremental month merges into the rebuilt data
+    save_incremental_state(
+        IncrementalState.from_aggregates(
+            months=raw_months(),
+            value_counts=data_processor.value_counts,
+            route_sums=data_processor.route_sums,
+            route_counts=data_processor.route_counts,
+        )
+    )
+
+route_stats_file_name = (
+    config.route_stats_file_name_destination + f"_v{ROUTE_STATS_VERSION}_{datetime.now()}.npz".replace(" ", "_")
+)
+data_processor.save_route_stats(route_stats_file_name)
+processed_gcs_bucket_connector.upload_file(route_stats_file_name, route_stats_file_name)
+os.remove(route_stats_file_name)
@@ -5,7 +5,9 @@ import os
 import mlflow
 
 from make_data.gcs_connector import GCSConnector
+from make_model.feature_cache import FeatureCache
 from make_model.model_trainer import ModelTrainer
+from make_model.sufficient_statistics import SufficientStatistics
 from project_config import ProjectConfig, Tags
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -28,6 +30,36 @@ parser.add_argument(
     type=str,
     required=True,
 )
+parser.add_argument(
+    "--months",
+    action="store",
+    nargs="*",
+    default=None,
+    type=str,
+    help="Train and evaluate on these months only, as YYYY-MM. Defaults to every month in the processed dataset",
+)
+parser.add_argument(
+    "--streaming",
+    action="store_true",
+    help="Fit from sufficient statistics accumulated batch by batch, without loading the train set into memory",
+)
+parser.add_argument(
+    "--sweep",
+    action="store_true",
+    help="Evaluate Ridge/Lasso/gradient boosting and feature subset candidates in parallel and register the best",
+)
+parser.add_argument(
+    "--n_jobs",
+    action="store",
+    default=-1,
+    type=int,
+    help="Number of worker processes of --sweep, -1 for one per CPU",
+)
+parser.add_argument(
+    "--warm_start",
+    action="store_true",
+    help="With --streaming, merge the statistics of --months into the saved statistics of the previous run",
+)
 args = parser.parse_args()
 
 config = ProjectConfig.from_yaml("project-config.yaml")
@@ -36,13 +68,73 @@ tags_dict = {"git_sha": args.git_sha, "branch": args.git_branch}
 tags = Tags(**tags_dict)
 
 gcs = GCSConnector(bucket_name=config.gcs_processed_taxi_data_bucket_name)
-train_set = gcs.read_one_from_gcs(config.train_file_name)
-test_set = gcs.read_one_from_gcs(config.test_file_name)
+columns = config.num_features + config.cat_features + config.target
+
+
+def split_filters(split: str) -> list[list[tuple]]:
+    """Filters selecting a split, restricted to --months if given"""
+    if not args.months:
+        return [[("split", "=", split)]]
+    year_months = [(int(year), int(month)) for year, month in (month.split("-") for month in args.months)]
+    return [[("split", "=", split), ("year", "=", year), ("month", "=", month)] for year, month in year_months]
+
+
+if args.warm_start and not (args.streaming and args.months):
+    parser.error("--warm_start needs --streaming and the new --months")
+if args.sweep and args.streaming:
+    parser.error("--sweep needs the train set in memory and cannot be combined with --streaming")
+
+# A warm-started model is fitted on every month so far, so it is evaluated on the full test split
+test_filters = [[("split", "=", "test")]] if args.warm_start else split_filters("test")
+test_set = gcs.read_dataset(config.processed_dataset_name, columns=columns, filters=test_filters)
 
-trainer = ModelTrainer(train_set=train_set, test_set=test_set, config=config, tags=tags)
+if args.streaming:
+    statistics = None
+    statistics_file_name = config.training_statistics_file_name
+    if args.warm_start and gcs.check_file_exists(statistics_file_name):
+        gcs.download_file(statistics_file_name, statistics_file_name)
+        statistics = SufficientStatistics.load(statistics_file_name)
+    elif args.warm_start:
+        logger.warning("No saved training statistics found. Fitting on --months only")
 
-trainer.feature_engineering()
+    trainer = ModelTrainer(train_set=None, test_set=test_set, config=config, tags=tags)
+    trainer.feature_engineering()
+    # The partition keys are read too, so the statistics record the months actually fitted on
+    train_chunks = gcs.iter_dataset(
+        config.processed_dataset_name, columns=columns + ["year", "month"], filters=split_filters("train")
+    )
+    statistics = trainer.train_streaming(train_chunks, statistics=statistics, months=args.months)
 
-trainer.train()
+    statistics.save(statistics_file_name)
+    gcs.upload_file(statistics_file_name, statistics_file_name)
+    os.remove(statistics_file_name)
+else:
+    train_set = gcs.read_dataset(config.processed_dataset_name, columns=columns, filters=split_filters("train"))
+    # Repeated runs on unchanged train/test files reuse the fitted preprocessing and design matrices
+    data_identity = ":".join(
+        gcs.dataset_fingerprint(config.processed_dataset_name, filters=split_filters(split))
+        for split in ("train", "test")
+    )
+    feature_cache = FeatureCache(os.getenv("FEATURE_CACHE_DIR", os.path.expanduser("~/.cache/mlops-101/features")))
+    trainer = ModelTrainer(
+        train_set=train_set,
+        test_set=test_set,
+        config=config,
+        tags=tags,
+        feature_cache=feature_cache,
+        data_identity=data_identity,
+    )
+    trainer.feature_engineering()
+    if args.sweep:
+        trainer.sweep(n_jobs=args.n_jobs)
+    else:
+        trainer.train()
 
-trainer.register_model()
+# The API loads this bundle without mlflow. Models that cannot be bundled remove the previous bundle,
+# so the API falls back to the registry instead of serving an older version
+bundle_file_name = trainer.register_model(bundle_file_name=config.model_bundle_file_name)
+if bundle_file_name is not None:
+    gcs.upload_file(bundle_file_name, config.model_bundle_file_name)
+    os.remove(bundle_file_name)
+else:
+    gcs.delete_file(config.model_bundle_file_name)
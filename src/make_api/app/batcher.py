@@ -0,0 +1,154 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+def _fail(batch: list[tuple[Any, asyncio.Future]], error: BaseException):
+    """Set error on every future of batch that is not resolved yet"""
+    for _, future in batch:
+        if not future.done():
+            future.set_exception(error)
+
+
+class MicroBatcher:
+    def __init__(
+        self,
+        predict_fn: Callable[[list[Any]], Sequence[float]],
+        max_batch_size: int = 64,
+        max_wait_ms: float = 2.0,
+    ):
+        """
+        Collect concurrent single predictions into batches scored by one vectorized call in a worker thread,
+        so the blocking model call never runs on the event loop.
+
+        Args:
+            predict_fn (Callable[[list[Any]], Sequence[float]]): Scores a list of inputs, one prediction per input
+            max_batch_size (int, optional): Maximum number of inputs per batch. Defaults to 64.
+            max_wait_ms (float, optional): Maximum time the first input of a batch waits for more. Defaults to 2.0.
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._batches = 0
+        self._items = 0
+        self._max_batch_size_seen = 0
+        self._last_batch_seconds = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        """Start collecting batches on the running event loop"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="micro-batcher")
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Micro-batcher started (max_batch_size={self.max_batch_size}, max_wait_ms={self.max_wait_ms})")
+
+    async def stop(self):
+        """Stop collecting batches, failing any inputs still queued"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        queued = []
+        while not self._queue.empty():
+            queued.append(self._queue.get_nowait())
+        _fail(queued, RuntimeError("Micro-batcher stopped"))
+        self._executor.shutdown(wait=True)
+        logger.info("Micro-batcher stopped")
+
+    async def submit(self, item: Any) -> float:
+        """
+        Queue a single input and wait for its prediction.
+
+        Args:
+            item (Any): Input passed to predict_fn as part of a batch
+
+        Returns:
+            float: Prediction for the input
+
+        Raises:
+            RuntimeError: If the batcher is not running
+        """
+        if not self.running:
+            raise RuntimeError("Micro-batcher is not running")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    def metrics(self) -> dict:
+        """Queue depth and batch statistics"""
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "batches": self._batches,
+            "items": self._items,
+            "mean_batch_size": self._items / self._batches if self._batches else 0.0,
+            "max_batch_size_seen": self._max_batch_size_seen,
+            "last_batch_seconds": self._last_batch_seconds,
+        }
+
+    async def _collect(self, batch: list[tuple[Any, asyncio.Future]]):
+        """
+        Wait for a first input, then gather more until the batch is full or max_wait_ms has passed.
+        Inputs are appended to batch as they are taken off the queue, so the caller can fail them if this is cancelled.
+        """
+        loop = asyncio.get_running_loop()
+        batch.append(await self._queue.get())
+        deadline = loop.time() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch: list[tuple[Any, asyncio.Future]] = []
+            try:
+                await self._collect(batch)
+                items = [item for item, _ in batch]
+
+                start = time.perf_counter()
+                try:
+                    predictions = await loop.run_in_executor(self._executor, self.predict_fn, items)
+                finally:
+                    self._last_batch_seconds = time.perf_counter() - start
+                    self._batches += 1
+                    self._items += len(items)
+                    self._max_batch_size_seen = max(self._max_batch_size_seen, len(items))
+
+                if len(predictions) != len(items):
+                    raise ValueError(f"predict_fn returned {len(predictions)} predictions for {len(items)} inputs")
+                for (_, future), prediction in zip(batch, predictions, strict=True):
+                    if not future.done():
+                        future.set_result(float(prediction))
+            except Exception as e:
+                logger.error(f"[Micro-batcher] Batch of {len(batch)} failed: {str(e)}")
+                _fail(batch, e)
+            except BaseException:
+                # Cancelled by stop(): the inputs already taken off the queue would otherwise never be resolved
+                _fail(batch, RuntimeError("Micro-batcher stopped"))
+                raise
@@ -0,0 +1,234 @@
+import json
+import logging
+from typing import TYPE_CHECKING, Any, Sequence
+
+import numpy as np
+
+# pandas and sklearn are only needed to compile from or check against a pipeline, not to load a bundle and predict,
+# so they are imported where they are used and stay out of the API's cold start
+if TYPE_CHECKING:
+    import pandas as pd
+    from sklearn.pipeline import Pipeline
+
+logger = logging.getLogger(__name__)
+
+# Bundle layout versions this module can load, see make_model.model_bundle
+SUPPORTED_BUNDLE_VERSIONS = (1,)
+
+
+def load_model_bundle(path: str) -> dict[str, Any]:
+    """
+    Read a model bundle saved by make_model.model_bundle.save_model_bundle
+
+    Args:
+        path (str): Path to the JSON bundle
+
+    Raises:
+        ValueError: If the bundle has an unsupported layout version
+    """
+    with open(path) as f:
+        bundle = json.load(f)
+    if bundle.get("format_version") not in SUPPORTED_BUNDLE_VERSIONS:
+        raise ValueError(
+            f"Model bundle version {bundle.get('format_version')} is not supported, "
+            f"expected one of {SUPPORTED_BUNDLE_VERSIONS}"
+        )
+    return bundle
+
+
+class CompiledLinearModel:
+    def __init__(
+        self,
+        num_weights: dict[str, float],
+        cat_offsets: dict[str, dict[Any, float]],
+        intercept: float,
+    ):
+        """
+        Linear model with the preprocessing folded into its weights, so a prediction is a handful of float ops.
+
+        Args:
+            num_weights (dict[str, float]): Weight per numerical feature, already divided by the scaler's scale
+            cat_offsets (dict[str, dict[Any, float]]): Per categorical feature, the weight of each known category
+            intercept (float): Intercept, already shifted by the scaler's means
+        """
+        self.num_weights = num_weights
+        self.cat_offsets = cat_offsets
+        self.intercept = intercept
+        self._num_items = tuple(num_weights.items())
+        self._cat_items = tuple(cat_offsets.items())
+        self._num_vector = np.array(list(num_weights.values()), dtype=np.float64)
+
+    @classmethod
+    def from_pipeline(cls, pipe: "Pipeline") -> "CompiledLinearModel":
+        """
+        Compile a fitted StandardScaler + OneHotEncoder + linear model pipeline, as trained by ModelTrainer.
+
+        Args:
+            pipe (Pipeline): Fitted sklearn pipeline
+
+        Raises:
+            ValueError: If the pipeline does not have the supported structure
+        """
+        from sklearn.compose import ColumnTransformer
+        from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+        if len(pipe.steps) != 2 or not isinstance(pipe.steps[0][1], ColumnTransformer):
+            raise ValueError("Expected a (ColumnTransformer, linear model) pipeline")
+        preprocessor, model = pipe.steps[0][1], pipe.steps[1][1]
+        if not hasattr(model, "coef_") or not hasattr(model, "intercept_"):
+            raise ValueError(f"Model {type(model).__name__} is not linear")
+
+        coef = np.asarray(model.coef_, dtype=np.float64).reshape(-1)
+        intercept = float(np.asarray(model.intercept_, dtype=np.float64).reshape(-1)[0])
+
+        num_weights = {}
+        cat_offsets = {}
+        position = 0
+        for name, transformer, columns in preprocessor.transformers_:
+            if transformer == "drop":
+                continue
+            if isinstance(transformer, StandardScaler):
+                mean = transformer.mean_ if transformer.with_mean else np.zeros(len(columns))
+                scale = transformer.scale_ if transformer.with_std else np.ones(len(columns))
+                for column, column_mean, column_scale in zip(columns, mean, scale, strict=True):
+                    weight = coef[position] / column_scale
+                    num_weights[column] = weight
+                    intercept -= weight * column_mean
+                    position += 1
+            elif isinstance(transformer, OneHotEncoder):
+                if transformer.handle_unknown != "ignore" or transformer.drop is not None:
+                    raise ValueError("Only OneHotEncoder(handle_unknown='ignore') without drop is supported")
+                if getattr(transformer, "infrequent_categories_", None) is not None:
+                    raise ValueError("OneHotEncoder with infrequent categories is not supported")
+                for column, categories in zip(columns, transformer.categories_, strict=True):
+                    cat_offsets[column] = {category: float(coef[position + i]) for i, category in enumerate(categories)}
+                    position += len(categories)
+            else:
+                raise ValueError(f"Unsupported transformer {name}: {transformer}")
+
+        if position != len(coef):
+            raise ValueError(f"Compiled {position} weights but the model has {len(coef)} coefficients")
+
+        return cls(num_weights=num_weights, cat_offsets=cat_offsets, intercept=intercept)
+
+    @classmethod
+    def from_bundle(cls, bundle: dict[str, Any]) -> "CompiledLinearModel":
+        """
+        Compile a model bundle, folding its scaler parameters into the coefficients like from_pipeline.
+
+        Args:
+            bundle (dict[str, Any]): Bundle read with load_model_bundle
+
+        Raises:
+            ValueError: If the bundle has an unsupported transformer or does not match its coefficients
+        """
+        coef = bundle["model"]["coef"]
+        intercept = float(bundle["model"]["intercept"])
+
+        num_weights = {}
+        cat_offsets = {}
+        position = 0
+        for transformer in bundle["preprocessing"]:
+            if transformer["kind"] == "standard_scaler":
+                for column, column_mean, column_scale in zip(
+                    transformer["features"], transformer["mean"], transformer["scale"], strict=True
+                ):
+                    weight = coef[position] / column_scale
+                    num_weights[column] = weight
+                    intercept -= weight * column_mean
+                    position += 1
+            elif transformer["kind"] == "one_hot_encoder":
+                for column, categories in zip(transformer["features"], transformer["categories"], strict=True):
+                    cat_offsets[column] = {category: float(coef[position + i]) for i, category in enumerate(categories)}
+                    position += len(categories)
+            else:
+                raise ValueError(f"Unsupported transformer {transformer['kind']}")
+
+        if position != len(coef):
+            raise ValueError(f"Compiled {position} weights but the bundle has {len(coef)} coefficients")
+
+        return cls(num_weights=num_weights, cat_offsets=cat_offsets, intercept=intercept)
+
+    def predict_record(self, record: Any) -> float:
+        """
+        Predict a single input given as an object exposing the features as attributes (e.g. a pydantic model).
+
+        Args:
+            record (Any): Input with one attribute per feature
+
+        Returns:
+            float: Prediction
+        """
+        prediction = self.intercept
+        for name, weight in self._num_items:
+            prediction += weight * getattr(record, name)
+        for name, offsets in self._cat_items:
+            prediction += offsets.get(getattr(record, name), 0.0)
+        return prediction
+
+    def predict_records(self, records: Sequence[Any]) -> np.ndarray:
+        """
+        Predict many inputs given as objects exposing the features as attributes.
+
+        Args:
+            records (Sequence[Any]): Inputs with one attribute per feature
+
+        Returns:
+            np.ndarray: One prediction per input
+        """
+        n_records = len(records)
+        features = np.empty((n_records, len(self._num_items)), dtype=np.float64)
+        for j, (name, _) in enumerate(self._num_items):
+            features[:, j] = np.fromiter((getattr(record, name) for record in records), np.float64, n_records)
+
+        predictions = features @ self._num_vector + self.intercept
+        for name, offsets in self._cat_items:
+            predictions += np.fromiter(
+                (offsets.get(getattr(record, name), 0.0) for record in records), np.float64, n_records
+            )
+        return predictions
+
+    def predict(self, df: "pd.DataFrame") -> np.ndarray:
+        """
+        Predict a DataFrame of inputs, mirroring Pipeline.predict.
+
+        Args:
+            df (pd.DataFrame): Inputs with one column per feature
+
+        Returns:
+            np.ndarray: One prediction per row
+        """
+        predictions = df[list(self.num_weights)].to_numpy(dtype=np.float64) @ self._num_vector + self.intercept
+        for name, offsets in self._cat_items:
+            predictions += df[name].map(offsets).fillna(0.0).to_numpy(dtype=np.float64)
+        return predictions
+
+    def check_parity(self, pipe: "Pipeline", n_probes: int = 64, rtol: float = 1e-7, atol: float = 1e-6):
+        """
+        Compare the compiled predictions against the original pipeline on generated probe inputs.
+
+        Args:
+            pipe (Pipeline): Pipeline the model was compiled from
+            n_probes (int, optional): Number of random probe rows per category. Defaults to 64.
+            rtol (float, optional): Relative tolerance. Defaults to 1e-7.
+            atol (float, optional): Absolute tolerance. Defaults to 1e-6.
+
+        Raises:
+            ValueError: If any probe prediction differs beyond the tolerance
+        """
+        import pandas as pd
+
+        rng = np.random.default_rng(0)
+        categories = {name: list(offsets) + ["__unknown__"] for name, offsets in self.cat_offsets.items()}
+        n_rows = n_probes * max([len(values) for values in categories.values()] + [1])
+
+        probes = pd.DataFrame({name: rng.normal(0, 10, n_rows) for name in self.num_weights})
+        for name, values in categories.items():
+            probes[name] = pd.Series(values * (n_rows // len(values) + 1)).iloc[:n_rows].to_numpy()
+
+        expected = np.asarray(pipe.predict(probes), dtype=np.float64).reshape(-1)
+        compiled = self.predict(probes)
+        if not np.allclose(compiled, expected, rtol=rtol, atol=atol):
+            max_error = np.max(np.abs(compiled - expected))
+            raise ValueError(f"Compiled model deviates from the pipeline by up to {max_error}")
+        logger.info(f"Compiled model matches the pipeline on {n_rows} probes")
@@ -1,33 +1,91 @@
+import asyncio
 import logging
 import os
-from functools import lru_cache
-from typing import Literal
-
-import mlflow
-import pandas as pd
-import uvicorn
-from fastapi import FastAPI
-from pydantic import BaseModel
+import tempfile
+import time
+from collections import Counter
 from contextlib import asynccontextmanager
+from typing import Annotated, Literal, Optional, Sequence
+
+import numpy as np
+from fastapi import FastAPI, Header, HTTPException, Response
+from pydantic import BaseModel, Field
+
+from .batcher import MicroBatcher
+from .metrics import TimedRoute, mark_stage, registry
+from .model_refresher import ModelRefresher
+from .prediction_cache import PredictionCache, canonical_key
+from .request_logging import sampled, start_queue_logging, stop_queue_logging
+from .route_stats import RouteStatsLookup
+from .serving_model import BundleSource, RegistrySource, ServingModel
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
 ml_models = {}
 
+MAX_BATCH_SIZE = 10_000
+# Fraction of successful predictions logged with their inputs; failures are always logged
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))
+# Inputs included in a batch's log record
+MAX_LOGGED_INPUTS = 100
+REGISTERED_MODEL_NAME = "taxi_fare_prediction.taxi_fare_model"
+REGISTERED_MODEL_ALIAS = "latest-model"
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    mlflow.set_tracking_uri(os.getenv("MLFLOW_TRACKING_URI"))
-    
-    model_uri = "models:/taxi_fare_prediction.taxi_fare_model@latest-model"
-    ml_models["latest_model"] = mlflow.sklearn.load_model(model_uri)
-    
-    yield
-    
-    ml_models.clear()
+    # Started in each worker: the listener thread of a preloaded master does not survive the fork
+    log_listener = start_queue_logging(os.getenv("LOG_LEVEL", "INFO"))
+    try:
+        model_refresher = load_serving_state()
+
+        await batcher.start()
+        await model_refresher.start()
+        await registry.start(float(os.getenv("METRICS_FLUSH_INTERVAL_SECONDS", "1")))
+
+        yield
+
+        await registry.stop()
+        await model_refresher.stop()
+        await batcher.stop()
+        ml_models.clear()
+    finally:
+        stop_queue_logging(log_listener)
 
 
 app = FastAPI(lifespan=lifespan)
+# Every route declared below records its latency, and the stages it marks, for /metrics
+app.router.route_class = TimedRoute
+registry.enabled = os.getenv("METRICS_ENABLED", "1") != "0"
+# Set by gunicorn.conf.py, so every worker's metrics are reported whichever worker is scraped
+registry.multiprocess_dir = os.getenv("METRICS_DIR")
+
+
+def load_serving_state() -> ModelRefresher:
+    """
+    Load the model and the route statistics, unless this process already has them.
+    Under gunicorn with preload_app they are loaded once in the master before it forks, so the workers
+    share those pages copy-on-write; each worker then only checks the model is still the latest version.
+    """
+    model_refresher = ml_models.get("model_refresher")
+    if model_refresher is None:
+        model_refresher = create_model_refresher(os.getenv("MODEL_BUNDLE_PATH"))
+        ml_models["model_refresher"] = model_refresher
+    try:
+        model_refresher.refresh()
+    except Exception as e:
+        if model_refresher.current is None:
+            raise
+        logger.error(f"Could not check for a newer model, serving version {model_refresher.current.version}: {str(e)}")
+
+    if "route_stats" not in ml_models:
+        route_stats_path = os.getenv("ROUTE_STATS_PATH")
+        if route_stats_path and os.path.exists(route_stats_path):
+            ml_models["route_stats"] = RouteStatsLookup(route_stats_path)
+        else:
+            logger.warning(f"Route statistics not found at {route_stats_path}. /predict/route is disabled")
+    return model_refresher
 
 
 class PredictionInput(BaseModel):
@@ -40,6 +98,16 @@ class PredictionInput(BaseModel):
     vendor_id: str
 
 
+class RoutePredictionInput(BaseModel):
+    passenger_count: int
+    trip_type: int
+    congestion_surcharge: float
+    PULocationID: int
+    DOLocationID: int
+    rush_hour: int
+    vendor_id: str
+
+
 class OutputItem(BaseModel):
     prediction_input: PredictionInput
     prediction: float
@@ -47,38 +115,372 @@ class OutputItem(BaseModel):
     message: str
 
 
+class PinRequest(BaseModel):
+    version: str
+
+
+# A typical trip, scored by every new model version before it is served
+VALIDATION_PROBE = PredictionInput(
+    passenger_count=1,
+    trip_type=1,
+    congestion_surcharge=2.75,
+    mean_distance=3.0,
+    mean_duration=15.0,
+    rush_hour=0,
+    vendor_id="2",
+)
+
+
+def create_model_refresher(bundle_path: Optional[str]) -> ModelRefresher:
+    """
+    Refresher serving the bundle exported by ModelTrainer.register_model, loaded without sklearn or mlflow,
+    and falling back to the MLflow registry whenever there is no bundle. Pins are stored in MODEL_PIN_PATH,
+    which defaults to a file next to the bundle, or in the temporary directory without one, so every worker
+    of the server shares them.
+
+    Args:
+        bundle_path (str, optional): Path to the JSON model bundle
+    """
+    fields = list(PredictionInput.model_fields)
+    pin_dir = os.path.dirname(bundle_path) if bundle_path else tempfile.gettempdir()
+    pin_path = os.getenv("MODEL_PIN_PATH", os.path.join(pin_dir, "model_pin.json"))
+    sources = [RegistrySource(REGISTERED_MODEL_NAME, REGISTERED_MODEL_ALIAS)]
+    if bundle_path:
+        sources.insert(0, BundleSource(bundle_path, fields))
+    return ModelRefresher(
+        ml_models,
+        sources,
+        probe=VALIDATION_PROBE,
+        fields=fields,
+        interval_seconds=float(os.getenv("MODEL_REFRESH_INTERVAL_SECONDS", "60")),
+        pin_path=pin_path,
+    )
+
+
+prediction_cache = PredictionCache(
+    max_size=int(os.getenv("PREDICTION_CACHE_SIZE", "10000")),
+    ttl_seconds=float(os.getenv("PREDICTION_CACHE_TTL_SECONDS", "3600")),
+)
+
+
+def get_model() -> ServingModel:
+    model = ml_models.get("latest_model")
+    if model is None:
+        raise RuntimeError("No model is loaded")
+    return model
+
+
+def predict_records(records: list[PredictionInput]) -> np.ndarray:
+    """Score many inputs with one call to the served model"""
+    return get_model().predict_records(records, PredictionInput.model_fields)
+
+
+def predict_records_cached(records: list[PredictionInput]) -> np.ndarray:
+    """Score many inputs, serving repeated ones from the prediction cache and the rest with one model call"""
+    model = get_model()
+    if not prediction_cache.enabled:
+        mark_stage("feature_assembly")
+        predictions = model.predict_records(records, PredictionInput.model_fields)
+        mark_stage("model_predict")
+        return predictions
+
+    keys = [canonical_key(record, PredictionInput.model_fields) for record in records]
+    predictions = np.empty(len(records), dtype=np.float64)
+    missing = []
+    for i, key in enumerate(keys):
+        prediction = prediction_cache.get(model.version, key)
+        if prediction is None:
+            missing.append(i)
+        else:
+            predictions[i] = prediction
+    mark_stage("feature_assembly")
+    if missing:
+        predictions[missing] = model.predict_records([records[i] for i in missing], PredictionInput.model_fields)
+        mark_stage("model_predict")
+        for i in missing:
+            prediction_cache.put(model.version, keys[i], float(predictions[i]))
+    return predictions
+
+
+PREDICTIONS = registry.counter("predictions_total", "Predictions returned, by OutputItem status", ("status",))
+MODEL_INFO = registry.gauge(
+    "model_info", "Served model version, set to 1 for the version and source in use", ("version", "source")
+)
+
+
+def set_model_info():
+    """Set model_info to the served model, before the metrics are rendered or written for the other workers"""
+    model = ml_models.get("latest_model")
+    MODEL_INFO.clear()
+    if model is not None:
+        MODEL_INFO.set(1, model.version, model.source)
+
+
+registry.add_collector(set_model_info)
+
+
+def count_predictions(outputs: Sequence[OutputItem]):
+    """Count the returned predictions by status, with one update per status"""
+    for status, count in Counter(output.status for output in outputs).items():
+        PREDICTIONS.inc(status, amount=count)
+
+
+batcher = MicroBatcher(
+    predict_records,
+    max_batch_size=int(os.getenv("MICRO_BATCH_MAX_SIZE", "64")),
+    max_wait_ms=float(os.getenv("MICRO_BATCH_MAX_WAIT_MS", "2")),
+)
+
+
 @app.get("/health")
 async def check_health():
     return {"status": "healthy"}
 
 
+def build_output(data: PredictionInput, prediction: float) -> OutputItem:
+    """Wrap a raw model prediction into an OutputItem, flagging non-positive fares"""
+    if prediction <= 0:
+        return OutputItem(
+            prediction_input=data,
+            prediction=0.0,
+            status="warning",
+            message="Prediction failed: Negative prediction. Check your inputs.",
+        )
+    return OutputItem(prediction_input=data, prediction=prediction, status="success", message="Prediction successful")
+
+
+@app.get("/metrics")
+async def get_metrics() -> Response:
+    """Request latencies, prediction stage latencies, predictions by status and the served model, for Prometheus"""
+    # Rendering reads and may rewrite the snapshots of every worker, so it runs off the event loop
+    return Response(await asyncio.to_thread(registry.render), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/stats")
+async def get_stats():
+    return {"micro_batcher": batcher.metrics(), "prediction_cache": prediction_cache.metrics()}
+
+
+def check_admin_token(token: Optional[str]):
+    """Reject admin calls without the ADMIN_TOKEN, when one is configured"""
+    admin_token = os.getenv("ADMIN_TOKEN")
+    if admin_token and token != admin_token:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+def get_model_refresher() -> ModelRefresher:
+    model_refresher = ml_models.get("model_refresher")
+    if model_refresher is None:
+        raise HTTPException(status_code=503, detail="The model refresher is not running")
+    return model_refresher
+
+
+@app.get("/admin/model")
+async def get_model_status(x_admin_token: Annotated[Optional[str], Header()] = None):
+    """Model version served by the worker that answered, and the version pinned for every worker"""
+    check_admin_token(x_admin_token)
+    return get_model_refresher().status()
+
+
+@app.post("/admin/model/pin")
+async def pin_model(request: PinRequest, x_admin_token: Annotated[Optional[str], Header()] = None):
+    """Serve a given model version until it is unpinned; loading and validation happen off the event loop"""
+    check_admin_token(x_admin_token)
+    model_refresher = get_model_refresher()
+    try:
+        await asyncio.to_thread(model_refresher.pin, request.version)
+    except Exception as e:
+        logger.error(f"[Admin] Could not pin version {request.version}: {str(e)}")
+        raise HTTPException(status_code=409, detail=f"Could not pin version {request.version}: {str(e)}") from e
+    return model_refresher.status()
+
+
+@app.post("/admin/model/unpin")
+async def unpin_model(x_admin_token: Annotated[Optional[str], Header()] = None):
+    """Follow the latest model version again"""
+    check_admin_token(x_admin_token)
+    model_refresher = get_model_refresher()
+    try:
+        await asyncio.to_thread(model_refresher.unpin)
+    except Exception as e:
+        logger.error(f"[Admin] Could not load the latest version: {str(e)}")
+        raise HTTPException(status_code=409, detail=f"Could not load the latest version: {str(e)}") from e
+    return model_refresher.status()
+
+
+def log_prediction(
+    level: int, message: str, start: float, model_version: Optional[str], inputs: Sequence[BaseModel], **fields
+):
+    """Log a structured prediction record with the model version, the latency since start and the inputs"""
+    logger.log(
+        level,
+        message,
+        extra={
+            "fields": {
+                "model_version": model_version,
+                "latency_ms": (time.perf_counter() - start) * 1000,
+                "inputs": [item.model_dump() for item in inputs[:MAX_LOGGED_INPUTS]],
+                **fields,
+            }
+        },
+    )
+
+
 @app.post("/predict")
 async def predict_one(data: PredictionInput) -> OutputItem:
+    mark_stage("parse")
+    return await score_one(data)
+
+
+async def score_one(data: PredictionInput) -> OutputItem:
+    """Score a validated input, from the prediction cache when possible, logging and counting the outcome"""
+    start = time.perf_counter()
+    model_version = None
     try:
-        df_input = pd.DataFrame([data.dict()])  # pd df might be overkill
-        logger.info(f"[Prediction Input] Received input: {df_input}")
-        prediction = ml_models['latest_model'].predict(df_input)
-
-        if prediction[0] <= 0:
-            logger.error("[Prediction Output] Prediction failed: Negative prediction")
-            return OutputItem(
-                prediction_input=data,
-                prediction=0.0,
-                status="warning",
-                message="Prediction failed: Negative prediction. Check your inputs.",
+        model = get_model()
+        model_version = model.version
+        key = canonical_key(data, PredictionInput.model_fields) if prediction_cache.enabled else None
+        prediction = prediction_cache.get(model.version, key) if key is not None else None
+        cache_hit = prediction is not None
+        mark_stage("feature_assembly")
+        if prediction is None:
+            if model.compiled_model is not None:
+                # A handful of float ops: cheaper inline than handing off to the micro-batcher's thread
+                prediction = model.compiled_model.predict_record(data)
+            elif batcher.running:
+                prediction = await batcher.submit(data)
+            else:
+                prediction = float(predict_records([data])[0])
+            mark_stage("model_predict")
+            # The micro-batcher scores with whichever model is served by then, which a reload may have replaced
+            if key is not None and ml_models.get("latest_model") is model:
+                prediction_cache.put(model.version, key, prediction)
+
+        output = build_output(data, prediction)
+        count_predictions([output])
+        if output.status == "warning":
+            log_prediction(
+                logging.ERROR,
+                "[Prediction Output] Prediction failed: Negative prediction",
+                start,
+                model_version,
+                [data],
+                prediction=prediction,
             )
-        else:
-            logger.info(f"[Prediction Output] Prediction: {prediction[0]}")
-            return OutputItem(
-                prediction_input=data, prediction=prediction[0], status="success", message="Prediction successful"
+        elif sampled(LOG_SAMPLE_RATE):
+            log_prediction(
+                logging.INFO,
+                "[Prediction Output] Prediction successful",
+                start,
+                model_version,
+                [data],
+                prediction=prediction,
+                cache_hit=cache_hit,
             )
+        return output
 
     except Exception as e:
-        logger.error(f"[Prediction Output] Prediction failed: {str(e)}")
-        return OutputItem(
+        log_prediction(logging.ERROR, f"[Prediction Output] Prediction failed: {str(e)}", start, model_version, [data])
+        output = OutputItem(
             prediction_input=data, prediction=-1.0, status="failure", message=f"Prediction failed: {str(e)}"
         )
+        count_predictions([output])
+        return output
+
 
+@app.post("/predict/batch")
+async def predict_batch(
+    data: Annotated[list[PredictionInput], Field(max_length=MAX_BATCH_SIZE)],
+) -> list[OutputItem]:
+    """Predict many trips with a single vectorized model call"""
+    mark_stage("parse")
+    if not data:
+        return []
+    start = time.perf_counter()
+    model = ml_models.get("latest_model")
+    model_version = model.version if model is not None else None
+    try:
+        predictions = await asyncio.to_thread(predict_records_cached, data)
+
+        outputs = [build_output(item, float(prediction)) for item, prediction in zip(data, predictions, strict=True)]
+        count_predictions(outputs)
+        warnings = [output.prediction_input for output in outputs if output.status == "warning"]
+        if warnings:
+            log_prediction(
+                logging.ERROR,
+                f"[Prediction Output] {len(warnings)}/{len(outputs)} predictions failed: Negative prediction",
+                start,
+                model_version,
+                warnings,
+                batch_size=len(outputs),
+            )
+        elif sampled(LOG_SAMPLE_RATE):
+            log_prediction(
+                logging.INFO,
+                f"[Prediction Output] Predicted batch of {len(outputs)}",
+                start,
+                model_version,
+                data,
+                batch_size=len(outputs),
+            )
+        return outputs
+
+    except Exception as e:
+        log_prediction(
+            logging.ERROR,
+            f"[Prediction Output] Batch prediction failed: {str(e)}",
+            start,
+            model_version,
+            data,
+            batch_size=len(data),
+        )
+        outputs = [
+            OutputItem(prediction_input=item, prediction=-1.0, status="failure", message=f"Prediction failed: {str(e)}")
+            for item in data
+        ]
+        count_predictions(outputs)
+        return outputs
+
+
+@app.post("/predict/route")
+async def predict_route(data: RoutePredictionInput) -> OutputItem:
+    """Predict from raw pickup/dropoff zone ids, resolving the route means server-side"""
+    mark_stage("parse")
+    route_stats = ml_models.get("route_stats")
+    route_means = route_stats.lookup(data.PULocationID, data.DOLocationID) if route_stats is not None else None
+    mean_distance, mean_duration = route_means if route_means is not None else (0.0, 0.0)
+
+    prediction_input = PredictionInput(
+        passenger_count=data.passenger_count,
+        trip_type=data.trip_type,
+        congestion_surcharge=data.congestion_surcharge,
+        mean_distance=mean_distance,
+        mean_duration=mean_duration,
+        rush_hour=data.rush_hour,
+        vendor_id=data.vendor_id,
+    )
+
+    if route_means is None:
+        message = (
+            "Route statistics are not loaded"
+            if route_stats is None
+            else f"Unknown route {data.PULocationID} -> {data.DOLocationID}"
+        )
+        model = ml_models.get("latest_model")
+        log_prediction(
+            logging.ERROR,
+            f"[Prediction Output] Prediction failed: {message}",
+            time.perf_counter(),
+            model.version if model is not None else None,
+            [data],
+        )
+        output = OutputItem(
+            prediction_input=prediction_input,
+            prediction=-1.0,
+            status="failure",
+            message=f"Prediction failed: {message}",
+        )
+        count_predictions([output])
+        return output
 
-if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    return await score_one(prediction_input)
@@ -0,0 +1,473 @@
+import asyncio
+import bisect
+import contextvars
+import copy
+import fcntl
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional, Sequence
+
+from fastapi import Request, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRoute
+from starlette.exceptions import HTTPException
+
+logger = logging.getLogger(__name__)
+
+# Seconds, from the microseconds of a compiled prediction to the seconds of a large batch
+LATENCY_BUCKETS = (
+    0.00001,
+    0.000025,
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped, strict=True)) + "}"
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: dict[tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _check_labels(self, labels: tuple[str, ...]):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {labels}")
+
+    def snapshot(self) -> dict[tuple[str, ...], object]:
+        """Copy of the value of every label combination"""
+        with self._lock:
+            return copy.deepcopy(self._values)
+
+    @staticmethod
+    def merge(values: dict[tuple[str, ...], object], labels: tuple[str, ...], value):
+        """Add the value of a label combination in another process to values"""
+        values[labels] = values.get(labels, 0.0) + value
+
+    def render(self, values: Optional[dict[tuple[str, ...], object]] = None) -> list[str]:
+        """
+        Lines of the metric in the Prometheus text exposition format
+
+        Args:
+            values (dict, optional): Values merged across processes. Defaults to the values of this process.
+        """
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        if values is None:
+            values = self.snapshot()
+        for labels, value in sorted(values.items()):
+            lines.extend(self._render_sample(labels, value))
+        return lines
+
+    def _render_sample(self, labels: tuple[str, ...], value) -> list[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {value}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        """
+        Add to the counter of the given label values
+
+        Args:
+            labels (str): One value per label name
+            amount (float, optional): Non-negative increment. Defaults to 1.0.
+        """
+        self._check_labels(labels)
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, *labels: str):
+        """
+        Set the gauge of the given label values
+
+        Args:
+            value (float): New value
+            labels (str): One value per label name
+        """
+        self._check_labels(labels)
+        with self._lock:
+            self._values[labels] = value
+
+    def clear(self):
+        """Drop every label combination, e.g. before setting the one that currently holds"""
+        with self._lock:
+            self._values.clear()
+
+    @staticmethod
+    def merge(values: dict[tuple[str, ...], object], labels: tuple[str, ...], value):
+        """Keep the highest value of a label combination across processes"""
+        values[labels] = max(values.get(labels, value), value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str):
+        """
+        Count an observation in its bucket
+
+        Args:
+            value (float): Observed value, e.g. a duration in seconds
+            labels (str): One value per label name
+        """
+        self._check_labels(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # Per bucket counts (the last one above every bound) and the sum of the observations
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    @staticmethod
+    def merge(values: dict[tuple[str, ...], object], labels: tuple[str, ...], value):
+        """Add the bucket counts and the sum of a label combination in another process to values"""
+        counts, total = value
+        state = values.get(labels)
+        if state is None:
+            values[labels] = [list(counts), total]
+            return
+        state[0] = [count + other for count, other in zip(state[0], counts, strict=True)]
+        state[1] += total
+
+    def count(self, *labels: str) -> int:
+        state = self._values.get(labels)
+        return sum(state[0]) if state is not None else 0
+
+    def _render_sample(self, labels: tuple[str, ...], value) -> list[str]:
+        counts, total = value
+        names = self.labelnames + ("le",)
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts, strict=True):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f"{self.name}_bucket{_format_labels(names, labels + (le,))} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total}")
+        lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _read_json(path: str) -> Optional[dict]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_json(path: str, data: dict):
+    # Written to a temporary file and renamed, so readers never see a partial file
+    temporary_path = f"{path}.part"
+    with open(temporary_path, "w") as f:
+        json.dump(data, f)
+    os.replace(temporary_path, path)
+
+
+class MetricsRegistry:
+    # Counters and histograms of the processes that exited, merged by the scrapes that found their files
+    ARCHIVE_FILE_NAME = "archive.json"
+
+    def __init__(self, enabled: bool = True, multiprocess_dir: Optional[str] = None):
+        """
+        In-process metrics rendered in the Prometheus text format, without a client library.
+        Updates take a lock and a few dict operations, cheap enough to leave on in production.
+
+        Each process has its own registry. With a multiprocess_dir shared by the gunicorn workers, every worker
+        writes a snapshot of its metrics there every flush interval and before rendering, and /metrics renders
+        the sum of the counters and histograms of all workers, and the highest gauge of the live ones,
+        whichever worker answers. A scrape only reads snapshots, each at least as recent as in the previous
+        scrape, so counters never go backwards. The counts of exited workers are folded into an archive file,
+        so recycled workers neither lose their counts nor leave a growing number of files.
+
+        Args:
+            enabled (bool, optional): Whether TimedRoute records requests. Defaults to True.
+            multiprocess_dir (str, optional): Directory shared by the processes serving the app, empty when the
+                server starts. Defaults to reporting the metrics of this process only.
+        """
+        self.enabled = enabled
+        self.multiprocess_dir = multiprocess_dir
+        self._metrics: list[_Metric] = []
+        self._collectors: list[Callable[[], None]] = []
+        self._file_pid: Optional[int] = None
+        self._file_name: Optional[str] = None
+        self._snapshot_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if any(existing.name == metric.name for existing in self._metrics):
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], None]):
+        """Call collector before every render and snapshot, e.g. to set a gauge from the state of the process"""
+        self._collectors.append(collector)
+
+    def _collect(self):
+        for collector in self._collectors:
+            collector()
+
+    def write_snapshot(self):
+        """
+        Write the metrics of this process to its file in multiprocess_dir. Periodic and scrape snapshots run in
+        worker threads, so they are serialized: they share a temporary file, and a later snapshot must not be
+        replaced by an earlier one.
+        """
+        if self.multiprocess_dir is None:
+            return
+        with self._snapshot_lock:
+            self._collect()
+            pid = os.getpid()
+            if self._file_pid != pid:
+                # A forked worker writes its own file, never reusing the name of a previous process with the same pid
+                self._file_pid = pid
+                self._file_name = f"metrics_{pid}_{uuid.uuid4().hex}.json"
+            snapshot = {
+                metric.name: [[list(labels), value] for labels, value in metric.snapshot().items()]
+                for metric in self._metrics
+            }
+            _write_json(os.path.join(self.multiprocess_dir, self._file_name), {"pid": pid, "metrics": snapshot})
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        with open(os.path.join(self.multiprocess_dir, ".lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _merge_into(self, values: dict[str, dict], metrics: dict[str, list], gauges: bool):
+        for metric in self._metrics:
+            if metric.kind == "gauge" and not gauges:
+                continue
+            for labels, value in metrics.get(metric.name, []):
+                metric.merge(values[metric.name], tuple(labels), value)
+
+    def _merged_values(self) -> dict[str, dict]:
+        """
+        Metrics of every process that wrote to multiprocess_dir. The files of exited processes are folded into
+        the archive, which lists them until they are deleted, so a scrape interrupted in between counts them once.
+        """
+        archive_path = os.path.join(self.multiprocess_dir, self.ARCHIVE_FILE_NAME)
+        with self._locked():
+            archive = _read_json(archive_path) or {"merged": [], "metrics": {}}
+            values = {metric.name: {} for metric in self._metrics}
+            self._merge_into(values, archive["metrics"], gauges=False)
+
+            exited = []
+            for path in sorted(glob.glob(os.path.join(self.multiprocess_dir, "metrics_*.json"))):
+                if os.path.basename(path) in archive["merged"]:
+                    continue
+                data = _read_json(path)
+                if data is None:
+                    continue
+                alive = _pid_alive(data["pid"])
+                self._merge_into(values, data["metrics"], gauges=alive)
+                if not alive:
+                    exited.append((path, data))
+
+            if exited:
+                archived = {metric.name: {} for metric in self._metrics}
+                self._merge_into(archived, archive["metrics"], gauges=False)
+                for _, data in exited:
+                    self._merge_into(archived, data["metrics"], gauges=False)
+                merged = [
+                    name for name in archive["merged"] if os.path.exists(os.path.join(self.multiprocess_dir, name))
+                ]
+                merged += [os.path.basename(path) for path, _ in exited]
+                metrics = {
+                    name: [[list(labels), value] for labels, value in metric_values.items()]
+                    for name, metric_values in archived.items()
+                }
+                _write_json(archive_path, {"merged": merged, "metrics": metrics})
+                for path, _ in exited:
+                    os.remove(path)
+        return values
+
+    def render(self) -> str:
+        """
+        Every registered metric in the Prometheus text exposition format, summed across processes if shared.
+        Blocking when shared, as it writes, locks and reads files: call it from a worker thread.
+        """
+        if self.multiprocess_dir is None:
+            self._collect()
+            return "\n".join(line for metric in self._metrics for line in metric.render()) + "\n"
+
+        self.write_snapshot()
+        values = self._merged_values()
+        return "\n".join(line for metric in self._metrics for line in metric.render(values[metric.name])) + "\n"
+
+    async def start(self, interval_seconds: float = 1.0):
+        """Write the snapshot of this process every interval_seconds, on the running event loop"""
+        if self.multiprocess_dir is None or (self._task is not None and not self._task.done()):
+            return
+        self._task = asyncio.create_task(self._run(interval_seconds))
+
+    async def stop(self):
+        """Stop the periodic snapshots and write a last one"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self.write_snapshot()
+
+    async def _run(self, interval_seconds: float):
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await asyncio.to_thread(self.write_snapshot)
+            except Exception as e:
+                logger.error(f"[Metrics] Could not write the metrics snapshot: {str(e)}")
+
+
+registry = MetricsRegistry()
+REQUEST_DURATION = registry.histogram(
+    "http_request_duration_seconds", "Time spent handling a request", ("method", "route", "code")
+)
+STAGE_DURATION = registry.histogram(
+    "prediction_stage_duration_seconds",
+    "Time spent in each stage of a prediction request: parse, feature_assembly, model_predict, serialization",
+    ("route", "stage"),
+)
+
+
+class RequestTimer:
+    __slots__ = ("route", "start", "last", "stages")
+
+    def __init__(self, route: str):
+        """Durations of the stages of one request, each measured from the end of the previous one"""
+        self.route = route
+        self.start = self.last = time.perf_counter()
+        self.stages: dict[str, float] = {}
+
+    def mark(self, stage: str):
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + now - self.last
+        self.last = now
+
+
+_request_timer: contextvars.ContextVar[Optional[RequestTimer]] = contextvars.ContextVar("request_timer", default=None)
+
+
+def mark_stage(stage: str):
+    """
+    End a stage of the current request: the time since the previous mark, or since the request started,
+    is added to stage. It does nothing outside a request served by a TimedRoute, e.g. in the micro-batcher.
+    Worker threads started with asyncio.to_thread inherit the request's timer.
+
+    Args:
+        stage (str): Name of the stage that just ended, e.g. "model_predict"
+    """
+    timer = _request_timer.get()
+    if timer is not None:
+        timer.mark(stage)
+
+
+class TimedRoute(APIRoute):
+    """
+    Route recording the latency and status code of every request, and the stages its endpoint marks.
+    Request parsing and validation happen before the endpoint runs, so the endpoint's first mark_stage("parse")
+    measures them; whatever follows the endpoint's last mark, rendering the response included,
+    is recorded as serialization.
+    """
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        route = self.path_format
+
+        async def timed_handler(request: Request) -> Response:
+            if not registry.enabled:
+                return await handler(request)
+            timer = RequestTimer(route)
+            token = _request_timer.set(timer)
+            code = 500
+            try:
+                response = await handler(request)
+                code = response.status_code
+                return response
+            except HTTPException as e:
+                code = e.status_code
+                raise
+            except RequestValidationError:
+                code = 422
+                raise
+            finally:
+                _request_timer.reset(token)
+                if timer.stages:
+                    timer.mark("serialization")
+                    for stage, seconds in timer.stages.items():
+                        STAGE_DURATION.observe(seconds, route, stage)
+                REQUEST_DURATION.observe(time.perf_counter() - timer.start, request.method, route, str(code))
+
+        return timed_handler
@@ -0,0 +1,239 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Optional, Sequence, Union
+
+from .serving_model import BundleSource, RegistrySource, ServingModel
+
+logger = logging.getLogger(__name__)
+
+ModelSource = Union[BundleSource, RegistrySource]
+
+
+class ModelRefresher:
+    def __init__(
+        self,
+        store: dict,
+        sources: Sequence[ModelSource],
+        probe: Any,
+        fields: Sequence[str],
+        interval_seconds: float = 60.0,
+        key: str = "latest_model",
+        pin_path: Optional[str] = None,
+    ):
+        """
+        Keep store[key] on the latest model version, polling the first available source in the background.
+        A new version is loaded and validated in a worker thread, off the request path, and then swapped in
+        with a single assignment: requests that already took the previous ServingModel finish with it,
+        later ones get the new one, and none ever sees a partially loaded model.
+        If loading or validating fails, the current model keeps serving and the error is reported in status.
+
+        A version can be pinned, which stops following the sources until it is unpinned. With a pin_path, the pin
+        is stored in that file and read on every refresh, so every process sharing the file, e.g. the gunicorn
+        workers of a pod and the workers that replace recycled ones, serves the pinned version within one poll.
+
+        Args:
+            store (dict): Mapping the served ServingModel is stored in
+            sources (Sequence[ModelSource]): Sources in order of preference, e.g. a bundle then the registry
+            probe (Any): Input every new model must score to a finite prediction before it is served
+            fields (Sequence[str]): Names of the features
+            interval_seconds (float, optional): Time between polls, 0 to never poll. Defaults to 60.0.
+            key (str, optional): Key of the served model in store. Defaults to "latest_model".
+            pin_path (str, optional): File storing the pinned version, shared by the processes serving the model.
+                Defaults to keeping the pin in this process only.
+        """
+        self.store = store
+        self.sources = list(sources)
+        self.probe = probe
+        self.fields = list(fields)
+        self.interval_seconds = interval_seconds
+        self.key = key
+        self.pin_path = pin_path
+        self.pinned_version: Optional[str] = None
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._followed_source: Optional[str] = None
+        self._reloads = 0
+        self._failures = 0
+        self._last_checked: Optional[float] = None
+        self._last_error: Optional[str] = None
+
+    @property
+    def current(self) -> Optional[ServingModel]:
+        return self.store.get(self.key)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def _available_sources(self) -> list[ModelSource]:
+        return [source for source in self.sources if source.available()]
+
+    def _install(self, model: ServingModel):
+        model.validate(self.probe, self.fields)
+        previous = self.current
+        self.store[self.key] = model
+        self._reloads += 1
+        previous_version = previous.version if previous is not None else None
+        logger.info(f"Serving model version {model.version} from the {model.source}, previously {previous_version}")
+
+    def _read_pin(self) -> Optional[str]:
+        """
+        Pinned version stored in the pin file, or the pin of this process without one.
+        An unreadable pin file keeps the last pin read, so polling and the admin endpoints keep working.
+        """
+        if self.pin_path is None:
+            return self.pinned_version
+        try:
+            with open(self.pin_path) as f:
+                return str(json.load(f)["version"])
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError, TypeError) as e:
+            logger.error(f"Pin file {self.pin_path} is invalid, keeping pinned version {self.pinned_version}: {str(e)}")
+            return self.pinned_version
+
+    def _write_pin(self, version: Optional[str]):
+        self.pinned_version = version
+        if self.pin_path is None:
+            return
+        if version is None:
+            try:
+                os.remove(self.pin_path)
+            except FileNotFoundError:
+                pass
+            return
+        # Written to a temporary file and renamed, so other processes never read a partial pin
+        temporary_path = f"{self.pin_path}.{os.getpid()}.part"
+        with open(temporary_path, "w") as f:
+            json.dump({"version": version}, f)
+        os.replace(temporary_path, self.pin_path)
+
+    def _load_version(self, version: str) -> ServingModel:
+        errors = []
+        for source in self._available_sources():
+            try:
+                return source.load_version(version)
+            except Exception as e:
+                errors.append(f"{source.name}: {str(e)}")
+        raise ValueError(f"Version {version} could not be loaded ({'; '.join(errors)})")
+
+    def _serve_pinned(self, version: str) -> bool:
+        current = self.current
+        if current is not None and current.version == version:
+            return False
+        self._install(self._load_version(version))
+        return True
+
+    def refresh(self) -> bool:
+        """
+        Load the pinned version if another process pinned one, or else the latest version of the first available
+        source, if it differs from the served one. Blocking: call it from a worker thread once the app is running.
+
+        Returns:
+            bool: Whether a new version was swapped in
+
+        Raises:
+            ValueError: If no source is available, or none has the pinned version
+        """
+        with self._lock:
+            self._last_checked = time.time()
+            self.pinned_version = self._read_pin()
+            if self.pinned_version is not None:
+                return self._serve_pinned(self.pinned_version)
+            available_sources = self._available_sources()
+            if not available_sources:
+                raise ValueError(f"No model source is available among {[source.name for source in self.sources]}")
+            source = available_sources[0]
+            if source.name != self._followed_source:
+                logger.warning(f"Following the {source.name} for new model versions")
+                self._followed_source = source.name
+
+            current = self.current
+            if current is not None and current.source == source.name and current.version == source.latest_version():
+                return False
+            self._install(source.load_latest())
+            return True
+
+    def pin(self, version: str) -> ServingModel:
+        """
+        Serve a given version, from the first source that has it, and stop following the sources.
+        The pin is stored once the version is served, so other processes only pick up versions that loaded.
+        Blocking: call it from a worker thread.
+
+        Args:
+            version (str): Version to serve
+
+        Raises:
+            ValueError: If no source has the version, or it fails validation
+        """
+        with self._lock:
+            self._serve_pinned(version)
+            self._write_pin(version)
+            logger.info(f"Pinned model version {version}")
+            return self.current
+
+    def unpin(self) -> bool:
+        """
+        Follow the sources again, switching to their latest version. Blocking: call it from a worker thread.
+
+        Returns:
+            bool: Whether a new version was swapped in
+        """
+        with self._lock:
+            self._write_pin(None)
+        logger.info("Unpinned the model version")
+        return self.refresh()
+
+    def status(self) -> dict:
+        """
+        Version served by this process, the pinned version shared by all processes, and reload statistics.
+        Another process picks up a new pin at its next refresh, up to interval_seconds later.
+        """
+        current = self.current
+        return {
+            "version": current.version if current is not None else None,
+            "source": current.source if current is not None else None,
+            "followed_source": self._followed_source,
+            "pinned_version": self._read_pin(),
+            "pid": os.getpid(),
+            "reloads": self._reloads,
+            "failures": self._failures,
+            "last_checked": self._last_checked,
+            "last_error": self._last_error,
+        }
+
+    async def start(self):
+        """Start polling the sources on the running event loop"""
+        if self.running or self.interval_seconds <= 0:
+            return
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Model refresher started, polling every {self.interval_seconds}s")
+
+    async def stop(self):
+        """Stop polling the sources"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        logger.info("Model refresher stopped")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await asyncio.to_thread(self.refresh)
+                self._last_error = None
+            except Exception as e:
+                self._failures += 1
+                self._last_error = str(e)
+                current = self.current
+                current_version = current.version if current is not None else None
+                logger.error(f"[Model refresher] Keeping version {current_version}: {str(e)}")
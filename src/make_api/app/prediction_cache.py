@@ -0,0 +1,129 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+def canonical_key(record: Any, fields: Sequence[str]) -> tuple:
+    """
+    Key of a validated input: its feature values in field order, with numbers as floats so that
+    e.g. 2 and 2.0 or 0.0 and -0.0 share an entry, since the model sees them as the same value.
+
+    Args:
+        record (Any): Input with one attribute per feature
+        fields (Sequence[str]): Names of the features
+    """
+    values = []
+    for field in fields:
+        value = getattr(record, field)
+        values.append(float(value) + 0.0 if isinstance(value, (int, float)) else value)
+    return tuple(values)
+
+
+class PredictionCache:
+    def __init__(
+        self, max_size: int = 10_000, ttl_seconds: float = 3600.0, clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        LRU cache of predictions with a time to live, for the same inputs quoted over and over.
+        Entries belong to one model version: looking up another version empties the cache,
+        so a hot-reloaded model never serves predictions of the previous one.
+
+        Args:
+            max_size (int, optional): Maximum number of entries, 0 to disable caching. Defaults to 10_000.
+            ttl_seconds (float, optional): Time an entry is served after it was stored. Defaults to 3600.0.
+            clock (Callable[[], float], optional): Monotonic clock in seconds. Defaults to time.monotonic.
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._entries: OrderedDict[Hashable, tuple[float, float]] = OrderedDict()
+        self._version: Optional[str] = None
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def _use_version(self, version: str):
+        if version != self._version:
+            if self._entries:
+                self._invalidations += 1
+                logger.info(f"Prediction cache invalidated for model version {version}")
+            self._entries.clear()
+            self._version = version
+
+    def get(self, version: str, key: Hashable) -> Optional[float]:
+        """
+        Cached prediction of an input by a model version, or None on a miss
+
+        Args:
+            version (str): Version of the model
+            key (Hashable): Key of the input, see canonical_key
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            self._use_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            prediction, expires_at = entry
+            if self.clock() >= expires_at:
+                del self._entries[key]
+                self._expirations += 1
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return prediction
+
+    def put(self, version: str, key: Hashable, prediction: float):
+        """
+        Store the prediction of an input by a model version, evicting the least recently used entries
+
+        Args:
+            version (str): Version of the model
+            key (Hashable): Key of the input, see canonical_key
+            prediction (float): Prediction of the model
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._use_version(version)
+            self._entries[key] = (prediction, self.clock() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self):
+        """Remove every entry and reset the statistics"""
+        with self._lock:
+            self._entries.clear()
+            self._version = None
+            self._hits = self._misses = self._evictions = self._expirations = self._invalidations = 0
+
+    def metrics(self) -> dict:
+        """Hit rate, size and eviction statistics"""
+        lookups = self._hits + self._misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "version": self._version,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": self._hits / lookups if lookups else 0.0,
+            "evictions": self._evictions,
+            "expirations": self._expirations,
+            "invalidations": self._invalidations,
+        }
@@ -0,0 +1,68 @@
+import json
+import logging
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import IO, Optional
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per record, in the shape Cloud Logging parses as a structured entry:
+    time, severity and message, plus the fields passed as extra={"fields": {...}}
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "severity": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def start_queue_logging(level: str = "INFO", stream: Optional[IO[str]] = None) -> QueueListener:
+    """
+    Replace the root handlers with a queue, drained by a background thread that formats the records as JSON
+    and writes them out, so request handlers only pay for putting a record on the queue.
+    Call it in each serving process: the thread does not survive a fork.
+
+    Args:
+        level (str, optional): Level of the root logger. Defaults to "INFO".
+        stream (IO[str], optional): Stream the records are written to. Defaults to sys.stdout.
+
+    Returns:
+        QueueListener: Started listener, to pass to stop_queue_logging
+    """
+    log_queue = queue.SimpleQueue()
+    handler = logging.StreamHandler(stream if stream is not None else sys.stdout)
+    handler.setFormatter(JsonFormatter())
+    listener = QueueListener(log_queue, handler)
+
+    root = logging.getLogger()
+    root.handlers = [QueueHandler(log_queue)]
+    root.setLevel(level)
+    listener.start()
+    return listener
+
+
+def stop_queue_logging(listener: QueueListener):
+    """Write out the queued records and log synchronously with the same JSON handler from now on"""
+    listener.stop()
+    logging.getLogger().handlers = list(listener.handlers)
+
+
+def sampled(rate: float) -> bool:
+    """
+    Whether to log a success-path record, kept with probability rate
+
+    Args:
+        rate (float): Fraction of records to keep, between 0 and 1
+    """
+    return rate >= 1 or (rate > 0 and random.random() < rate)
@@ -0,0 +1,88 @@
+import logging
+import struct
+import zipfile
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Route statistics layout versions this module can load, see make_data.data_processor.ROUTE_STATS_VERSION
+SUPPORTED_ROUTE_STATS_VERSIONS = (1,)
+# Size of the fixed part of a zip local file header, followed by the file name and extra field
+ZIP_LOCAL_HEADER_SIZE = 30
+
+
+def memory_map_npz_member(path: str, name: str) -> np.memmap:
+    """
+    Memory-map an array stored uncompressed in a .npz archive, as np.savez writes it, without reading it
+
+    Args:
+        path (str): Path to the .npz archive
+        name (str): Name of the array in the archive
+
+    Raises:
+        ValueError: If the array is compressed, which cannot be memory-mapped
+    """
+    with zipfile.ZipFile(path) as archive:
+        info = archive.getinfo(f"{name}.npy")
+    if info.compress_type != zipfile.ZIP_STORED:
+        raise ValueError(f"{name} is compressed in {path} and cannot be memory-mapped, save it with np.savez")
+    with open(path, "rb") as f:
+        f.seek(info.header_offset)
+        name_length, extra_length = struct.unpack("<HH", f.read(ZIP_LOCAL_HEADER_SIZE)[26:30])
+        f.seek(info.header_offset + ZIP_LOCAL_HEADER_SIZE + name_length + extra_length)
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        offset = f.tell()
+    return np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape, order="F" if fortran_order else "C")
+
+
+class RouteStatsLookup:
+    def __init__(self, path: str):
+        """
+        Lookup of per-route mean distance and mean duration, as saved by DataProcessor.save_route_stats.
+        The table is memory-mapped from the uncompressed archive, so the processes serving the API share
+        the pages of the file instead of each holding a copy.
+
+        Args:
+            path (str): Path to the .npz route statistics archive
+
+        Raises:
+            ValueError: If the archive has an unsupported layout version, a compressed table or an unexpected shape
+        """
+        archive = np.load(path, allow_pickle=False)
+        if not isinstance(archive, np.lib.npyio.NpzFile):
+            raise ValueError(f"{path} is an unversioned route statistics table, re-run scripts/2_process_data.py")
+        with archive:
+            version = int(archive["version"]) if "version" in archive.files else None
+            if version not in SUPPORTED_ROUTE_STATS_VERSIONS:
+                raise ValueError(
+                    f"Route statistics version {version} is not supported, expected one of {SUPPORTED_ROUTE_STATS_VERSIONS}"
+                )
+        self.table = memory_map_npz_member(path, "table")
+        if self.table.ndim != 3 or self.table.shape[0] != self.table.shape[1] or self.table.shape[2] != 2:
+            raise ValueError(f"Unexpected route statistics shape {self.table.shape}")
+        self.n_zones = self.table.shape[0]
+        logger.info(f"Loaded route statistics for {self.n_zones} zones from {path}")
+
+    def lookup(self, pickup_location_id: int, dropoff_location_id: int) -> Optional[tuple[float, float]]:
+        """
+        Resolve the mean distance and mean duration of a route.
+
+        Args:
+            pickup_location_id (int): Pickup taxi zone id
+            dropoff_location_id (int): Dropoff taxi zone id
+
+        Returns:
+            Optional[tuple[float, float]]: (mean_distance, mean_duration), or None for unknown routes
+        """
+        if not (0 <= pickup_location_id < self.n_zones and 0 <= dropoff_location_id < self.n_zones):
+            return None
+        mean_distance, mean_duration = self.table[pickup_location_id, dropoff_location_id]
+        if np.isnan(mean_distance) or np.isnan(mean_duration):
+            return None
+        return float(mean_distance), float(mean_duration)
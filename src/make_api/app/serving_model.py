@@ -0,0 +1,170 @@
+import logging
+import os
+from typing import Any, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from .compiled_model import CompiledLinearModel, load_model_bundle
+
+logger = logging.getLogger(__name__)
+
+
+class ServingModel(NamedTuple):
+    """
+    A loaded model version with everything needed to serve it. It is stored and replaced as a single object,
+    so a request that took a reference to it keeps a consistent model even if a new version is swapped in.
+    """
+
+    version: str
+    source: str
+    compiled_model: Optional[CompiledLinearModel]
+    pipeline: Optional[Any] = None
+
+    @classmethod
+    def from_pipeline(cls, pipeline: Any, version: str, source: str, compile: bool = True) -> "ServingModel":
+        """
+        Wrap a fitted sklearn pipeline, compiled into a CompiledLinearModel when possible
+
+        Args:
+            pipeline (Any): Fitted sklearn pipeline
+            version (str): Version of the model
+            source (str): Where the model was loaded from, e.g. "registry"
+            compile (bool, optional): Whether to try compiling the pipeline. Defaults to True.
+        """
+        compiled_model = None
+        if compile:
+            try:
+                compiled_model = CompiledLinearModel.from_pipeline(pipeline)
+                compiled_model.check_parity(pipeline)
+                logger.info(f"Serving version {version} from the compiled model")
+            except Exception as e:
+                logger.warning(f"Could not compile version {version}, serving predictions from the pipeline: {str(e)}")
+        return cls(version=str(version), source=source, compiled_model=compiled_model, pipeline=pipeline)
+
+    def predict_records(self, records: Sequence[Any], fields: Sequence[str]) -> np.ndarray:
+        """
+        Score many inputs with one call to the compiled model, or to the pipeline if it could not be compiled
+
+        Args:
+            records (Sequence[Any]): Inputs with one attribute per feature
+            fields (Sequence[str]): Names of the features
+        """
+        if self.compiled_model is not None:
+            return self.compiled_model.predict_records(records)
+        import pandas as pd  # Only the uncompiled pipeline needs a DataFrame
+
+        df_input = pd.DataFrame({field: [getattr(item, field) for item in records] for field in fields})
+        return np.asarray(self.pipeline.predict(df_input), dtype=np.float64).ravel()
+
+    def validate(self, probe: Any, fields: Sequence[str]):
+        """
+        Check the model scores a probe input to a finite prediction, before it is served
+
+        Args:
+            probe (Any): Input with one attribute per feature
+            fields (Sequence[str]): Names of the features
+
+        Raises:
+            ValueError: If the prediction is not a finite number
+        """
+        prediction = self.predict_records([probe], fields)
+        if prediction.shape != (1,) or not np.isfinite(prediction[0]):
+            raise ValueError(f"Version {self.version} predicted {prediction} for the validation probe")
+
+
+class BundleSource:
+    def __init__(self, path: str, fields: Sequence[str]):
+        """
+        Models exported as bundles by ModelTrainer.register_model, loaded without sklearn or mlflow.
+        The file at path is replaced whenever a new version is exported, e.g. by syncing a volume.
+
+        Args:
+            path (str): Path to the JSON model bundle
+            fields (Sequence[str]): Names of the features the API sends to the model
+        """
+        self.path = path
+        self.fields = list(fields)
+        self.name = "bundle"
+
+    def available(self) -> bool:
+        """Whether the bundle file exists"""
+        return os.path.exists(self.path)
+
+    def latest_version(self) -> str:
+        """Version of the bundled model"""
+        return load_model_bundle(self.path)["model_version"]
+
+    def load_latest(self) -> ServingModel:
+        """
+        Load the bundle
+
+        Raises:
+            ValueError: If the bundle does not describe the API's features
+        """
+        bundle = load_model_bundle(self.path)
+        bundle_inputs = {item["name"] for item in bundle["signature"]["inputs"]}
+        if bundle_inputs != set(self.fields):
+            raise ValueError(f"Model bundle inputs {sorted(bundle_inputs)} do not match the prediction input")
+        return ServingModel(
+            version=bundle["model_version"], source=self.name, compiled_model=CompiledLinearModel.from_bundle(bundle)
+        )
+
+    def load_version(self, version: str) -> ServingModel:
+        """
+        Load the bundle if it holds the given version
+
+        Args:
+            version (str): Version of the model
+
+        Raises:
+            ValueError: If the bundle holds another version
+        """
+        model = self.load_latest()
+        if model.version != version:
+            raise ValueError(f"The bundle holds version {model.version}, not {version}")
+        return model
+
+
+class RegistrySource:
+    def __init__(self, model_name: str, alias: str):
+        """
+        Models registered in the MLflow registry. mlflow is only imported when this source is used,
+        so serving from a bundle never pays for it.
+
+        Args:
+            model_name (str): Name of the registered model
+            alias (str): Alias followed for the latest version
+        """
+        self.model_name = model_name
+        self.alias = alias
+        self.name = "registry"
+
+    def _client(self):
+        import mlflow
+
+        mlflow.set_tracking_uri(os.getenv("MLFLOW_TRACKING_URI"))
+        return mlflow
+
+    def available(self) -> bool:
+        """The registry is always assumed reachable; failures surface when it is queried"""
+        return True
+
+    def latest_version(self) -> str:
+        """Version the alias points to"""
+        mlflow = self._client()
+        return str(mlflow.MlflowClient().get_model_version_by_alias(self.model_name, self.alias).version)
+
+    def load_latest(self) -> ServingModel:
+        # Load the resolved version rather than the alias, which may move in between
+        return self.load_version(self.latest_version())
+
+    def load_version(self, version: str) -> ServingModel:
+        """
+        Load a version of the registered model and compile it
+
+        Args:
+            version (str): Version of the registered model
+        """
+        mlflow = self._client()
+        pipeline = mlflow.sklearn.load_model(f"models:/{self.model_name}/{version}")
+        return ServingModel.from_pipeline(pipeline, version, source=self.name)
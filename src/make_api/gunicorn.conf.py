@@ -0,0 +1,65 @@
+"""
+Production serving configuration: `gunicorn -c gunicorn.conf.py` from the directory holding the app package.
+
+The app is imported and the model loaded once in the master (preload_app), then the master forks
+one uvicorn worker per core. The workers share the loaded model copy-on-write and the memory-mapped
+route statistics instead of each loading their own copy. Workers are recycled after max_requests requests,
+with jitter so they do not all restart at once, and finish their in-flight requests before exiting.
+"""
+
+import gc
+import glob
+import importlib
+import logging
+import os
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+
+def _cpu_count() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+try:
+    import uvicorn_worker  # noqa: F401
+
+    worker_class = "uvicorn_worker.UvicornWorker"
+except ImportError:
+    # Older uvicorn releases ship the worker themselves
+    worker_class = "uvicorn.workers.UvicornWorker"
+
+wsgi_app = os.getenv("GUNICORN_APP", "app.main:app")
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", str(_cpu_count())))
+preload_app = True
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "10000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", str(max_requests // 10)))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+# Every worker writes its metrics snapshots there, so /metrics reports all the workers whichever one is scraped.
+# Set before the app is preloaded, which reads it
+if not os.getenv("METRICS_DIR"):
+    os.environ["METRICS_DIR"] = tempfile.mkdtemp(prefix="gunicorn-metrics-")
+
+
+def on_starting(server):
+    """Start the metrics from zero, without the snapshots of a previous server"""
+    for pattern in ("metrics_*.json*", "archive.json*"):
+        for path in glob.glob(os.path.join(os.environ["METRICS_DIR"], pattern)):
+            os.remove(path)
+
+
+def when_ready(server):
+    """Load the model in the master, once, before the workers are forked"""
+    module = importlib.import_module(wsgi_app.split(":")[0])
+    module.load_serving_state()
+    # Move everything loaded so far out of the garbage collector's generations, so collections in the workers
+    # do not write to those objects and copy the shared pages
+    gc.freeze()
+    logger.info(f"Model loaded in the master, forking {workers} workers")
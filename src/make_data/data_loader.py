@@ -1,10 +1,18 @@
 import logging
 import os
+import re
+import time
 from abc import ABC, abstractmethod
 from io import BytesIO
+from typing import Optional, Union
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import requests
+from requests.adapters import HTTPAdapter
+
+from make_data.schema_validator import ArrowSchemaValidator
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
@@ -24,22 +32,118 @@ class DataSaver(ABC):
         pass
 
 
+def make_session(pool_size: int = 10) -> requests.Session:
+    """
+    Create a requests Session whose connection pool can serve pool_size concurrent downloads.
+
+    Args:
+        pool_size (int, optional): Number of pooled connections per host. Defaults to 10.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
 class NYCTaxiDataFetcher:
     BASE_URL = "https://d37ci6vzurychx.cloudfront.net/trip-data/"
-
-    def __init__(self, taxi_type: str = "green"):
+    RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+    def __init__(
+        self,
+        taxi_type: str = "green",
+        session: Optional[requests.Session] = None,
+        base_url: Optional[str] = None,
+    ):
         """
         Create a class for fetching NYC Taxi data.
 
         Args:
             taxi_type (str, optional): Type of taxi data (e.g., "green", "yellow"). Defaults to "green".
+            session (requests.Session, optional): Session reused across downloads. Defaults to a new pooled session.
+            base_url (str, optional): URL the monthly files are served from. Defaults to BASE_URL.
         """
         self.taxi_type = taxi_type
+        self.session = session if session is not None else make_session()
+        self.base_url = base_url if base_url is not None else self.BASE_URL
+
+    def file_name(self, year: int, month: int) -> str:
+        """Name of the monthly file for a given year and month."""
+        return f"{self.taxi_type}_tripdata_{year}-{month:02d}.parquet"
+
+    @staticmethod
+    def file_month(file_name: str) -> str:
+        """
+        Month of a monthly file, e.g. "2024-11" for green_tripdata_2024-11.parquet
+
+        Raises:
+            ValueError: If the file name has no YYYY-MM month
+        """
+        match = re.search(r"(\d{4}-\d{2})\.parquet$", file_name)
+        if match is None:
+            raise ValueError(f"No YYYY-MM month in the file name {file_name}")
+        return match.group(1)
 
     def _construct_url(self, year: int, month: int) -> str:
         """Constructs the URL dynamically for a given year and month."""
-        file_name = f"{self.taxi_type}_tripdata_{year}-{month:02d}.parquet"
-        return self.BASE_URL + file_name
+        return self.base_url + self.file_name(year, month)
+
+    def download(
+        self,
+        year: int,
+        month: int,
+        destination: str,
+        chunk_size: int = 1024 * 1024,
+        max_retries: int = 3,
+        backoff_seconds: float = 1.0,
+    ) -> str:
+        """
+        Stream the monthly Parquet file to disk in chunks, retrying transient failures with exponential backoff.
+
+        Args:
+            year (int): Year for which to fetch the data (e.g., 2020)
+            month (int): Month for which to fetch the data (e.g., 1 for January)
+            destination (str): Local path to write the file to
+            chunk_size (int, optional): Bytes written per chunk. Defaults to 1 MiB.
+            max_retries (int, optional): Retries after the first attempt. Defaults to 3.
+            backoff_seconds (float, optional): Wait before the first retry, doubled on each retry. Defaults to 1.0.
+
+        Returns:
+            str: The destination path
+
+        Raises:
+            requests.exceptions.RequestException: If the download still fails after all retries
+        """
+        url = self._construct_url(year, month)
+        partial_destination = destination + ".part"
+
+        try:
+            for attempt in range(max_retries + 1):
+                try:
+                    with self.session.get(url, stream=True, timeout=60) as response:
+                        response.raise_for_status()
+                        with open(partial_destination, "wb") as f:
+                            for chunk in response.iter_content(chunk_size=chunk_size):
+                                f.write(chunk)
+                    os.replace(partial_destination, destination)
+                    logger.info(f"Downloaded {url} to {destination}")
+                    return destination
+
+                except requests.exceptions.RequestException as e:
+                    status_code = e.response.status_code if e.response is not None else None
+                    retryable = status_code is None or status_code in self.RETRY_STATUS_CODES
+                    if not retryable or attempt == max_retries:
+                        logger.error(f"Request failed: {e}")
+                        raise
+                    wait = backoff_seconds * 2**attempt
+                    logger.warning(f"Request failed ({e}), retrying in {wait:.1f}s")
+                    time.sleep(wait)
+        except BaseException:
+            # Any failure, e.g. a full disk raising OSError, must not leave a partial file behind
+            if os.path.exists(partial_destination):
+                os.remove(partial_destination)
+            raise
 
     def fetch(self, year: int, month: int) -> pd.DataFrame:
         """
@@ -56,7 +160,7 @@ class NYCTaxiDataFetcher:
         url = self._construct_url(year, month)
 
         try:
-            response = requests.get(url)
+            response = self.session.get(url)
             response.raise_for_status()
             return pd.read_parquet(BytesIO(response.content))
 
@@ -70,30 +174,32 @@ class NYCTaxiDataFetcher:
 
 
 class ParquetDataSaver(DataSaver):
-    def __init__(self, data: pd.DataFrame):
+    def __init__(self, data: Union[pd.DataFrame, pa.Table]):
         """
         Create a class to save data to parquet file.
 
         Args:
-            data (pd.DataFrame): Dataframe to save
+            data (Union[pd.DataFrame, pa.Table]): Dataframe, or Arrow table as read from parquet, to save
         """
         self.data = data
 
     def save(self, file_name: str):
         """
-        Save pandas data to parquet file.
-        Currently only accepts pandas dataframes.
+        Save pandas or Arrow data to parquet file.
 
         Args:
-            data (pd.DataFrame): Dataframe to save
             file_name (str): Name of the file
         """
-        self.data.to_parquet(file_name, index=False)
+        if isinstance(self.data, pa.Table):
+            pq.write_table(self.data, file_name)
+        else:
+            self.data.to_parquet(file_name, index=False)
         logging.info(f"Data saved to {file_name}")
 
     def validate_schema(self, schema: list[dict]):
         """
         Validate and attempt to convert the schema of the data.
+        Arrow tables are cast in one pass by ArrowSchemaValidator, without converting them to pandas.
 
         Args:
             schema (list): List of column definitions from the schema
@@ -101,6 +207,10 @@ class ParquetDataSaver(DataSaver):
         Raises:
             ValueError: If schema validation or conversion fails
         """
+        if isinstance(self.data, pa.Table):
+            self.data = ArrowSchemaValidator(schema).validate(self.data)
+            return
+
         schema_dict = {col["name"]: col["type"] for col in schema}
 
         expected_columns = set(schema_dict.keys())
@@ -1,29 +1,96 @@
 import logging
 from typing import Optional, Union
 
+import numpy as np
 import pandas as pd
 from sklearn.model_selection import train_test_split
 
 from project_config import ProjectConfig
-from utils import outlier_imputer, rush_hourizer
+from utils import apply_dtype_plan, memory_report, outlier_imputer, vectorized_rush_hourizer
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
+# TLC taxi zone ids run from 1 to 265, so a packed route key PU * N_TAXI_ZONES + DO is unique per route
+N_TAXI_ZONES = 266
+# Bump when the layout of the saved route statistics table changes
+ROUTE_STATS_VERSION = 1
+# x in Q3 + x * IQR, the upper threshold used to impute fare and duration outliers
+IQR_FACTOR = 6
+# Columns whose quartiles drive outlier imputation
+IMPUTED_COLUMNS = ["fare_amount", "duration"]
+# Pickup year and month, kept alongside the features to partition the processed dataset
+PARTITION_COLUMNS = ["year", "month"]
+
+
+def save_route_stats_table(file_name: str, table: np.ndarray):
+    """
+    Save a route statistics table as an uncompressed .npz archive holding the table and ROUTE_STATS_VERSION,
+    so the API can reject a table whose layout it does not know.
+
+    Args:
+        file_name (str): Name of the file, written as is even without the .npz extension
+        table (np.ndarray): (N_TAXI_ZONES, N_TAXI_ZONES, 2) mean distance and duration per route
+    """
+    with open(file_name, "wb") as f:
+        np.savez(f, version=np.int64(ROUTE_STATS_VERSION), table=table)
+    logger.info(f"Route statistics (v{ROUTE_STATS_VERSION}) saved to {file_name}")
+
+
+def route_keys(df: pd.DataFrame) -> np.ndarray:
+    """
+    Pack each row's pickup and dropoff location ids into a single integer route key PU * N_TAXI_ZONES + DO.
+
+    Args:
+        df (pd.DataFrame): Trips with PULocationID and DOLocationID columns
+
+    Raises:
+        ValueError: If a location id falls outside the taxi zone range
+    """
+    pickup = df["PULocationID"].to_numpy().astype(np.int64)
+    dropoff = df["DOLocationID"].to_numpy().astype(np.int64)
+    if len(df) and (min(pickup.min(), dropoff.min()) < 0 or max(pickup.max(), dropoff.max()) >= N_TAXI_ZONES):
+        raise ValueError(f"Location ids must be within [0, {N_TAXI_ZONES})")
+    return pickup * N_TAXI_ZONES + dropoff
+
 
 class DataProcessor:
-    def __init__(self, df: pd.DataFrame, config: ProjectConfig):
+    def __init__(self, df: pd.DataFrame, config: ProjectConfig, dtype_plan: Optional[dict[str, str]] = None):
         """
         Class to process taxi data for model training
 
         Args:
             config (ProjectConfig): ProjectConfig object
+            dtype_plan (dict[str, str], optional): Dtypes of the processed columns, e.g.
+                config.green_taxi_dtype_plan["processed"]. Defaults to keeping the computed dtypes.
         """
         self.df = df
         self.config = config
+        self.dtype_plan = dtype_plan
+        self.route_stats = None
+        # Aggregates behind the quartiles and route means, to seed the incremental state after a full rebuild
+        self.value_counts: Optional[dict[str, pd.Series]] = None
+        self.route_sums: Optional[np.ndarray] = None
+        self.route_counts: Optional[np.ndarray] = None
 
     def process_data(self):
         """Process raw data"""
+        self.clean_trips()
+        memory_report(self.df, "cleaned")
+
+        self.value_counts = {col: self.df[col].value_counts(dropna=True) for col in IMPUTED_COLUMNS}
+        self.df = outlier_imputer(self.df, IMPUTED_COLUMNS, IQR_FACTOR)
+
+        self._add_route_means()
+        self.add_rush_hour()
+        self.select_features()
+        memory_report(self.df, "processed")
+
+    def clean_trips(self):
+        """
+        Drop duplicate trips, add the trip duration in minutes and the pickup year and month,
+        and zero out negative fares and durations
+        """
         self.df.drop_duplicates(inplace=True)
 
         self.df["lpep_pickup_datetime"] = pd.to_datetime(self.df["lpep_pickup_datetime"])
@@ -31,39 +98,82 @@ class DataProcessor:
 
         self.df["duration"] = self.df["lpep_dropoff_datetime"] - self.df["lpep_pickup_datetime"]
         self.df["duration"] = self.df["duration"].dt.total_seconds() // 60
+        self.df["year"] = self.df["lpep_pickup_datetime"].dt.year
+        self.df["month"] = self.df["lpep_pickup_datetime"].dt.month
 
         self.df.loc[self.df["fare_amount"] < 0, "fare_amount"] = 0
         self.df.loc[self.df["duration"] < 0, "duration"] = 0
 
-        self.df = outlier_imputer(self.df, ["fare_amount"], 6)
-        self.df = outlier_imputer(self.df, ["duration"], 6)
+    def add_rush_hour(self):
+        """Flag weekday pickups during the morning and evening rush hours"""
+        pickup_datetime = self.df["lpep_pickup_datetime"]
+        is_weekday = pickup_datetime.dt.dayofweek < 5
+        self.df["rush_hour"] = vectorized_rush_hourizer(pickup_datetime.dt.hour).where(is_weekday, 0)
 
-        self.df["pickup_dropoff"] = self.df["PULocationID"].astype(str) + " " + self.df["DOLocationID"].astype(str)
-        grouped = self.df.groupby("pickup_dropoff").mean(numeric_only=True)[["trip_distance"]]
-        grouped_dict = grouped.to_dict()["trip_distance"]
-        self.df["mean_distance"] = self.df["pickup_dropoff"]
-        self.df["mean_distance"] = self.df["mean_distance"].map(grouped_dict)
+    def select_features(self):
+        """Keep only the model features, target and partition columns, dropping rows with missing values"""
+        self.df.rename(columns={"VendorID": "vendor_id"}, inplace=True)
 
-        grouped = self.df.groupby("pickup_dropoff").mean(numeric_only=True)[["duration"]]
-        grouped_dict = grouped.to_dict()["duration"]
-        self.df["mean_duration"] = self.df["pickup_dropoff"]
-        self.df["mean_duration"] = self.df["mean_duration"].map(grouped_dict)
+        relevant_cols = self.config.num_features + self.config.cat_features + self.config.target + PARTITION_COLUMNS
 
-        self.df["day"] = self.df["lpep_pickup_datetime"].dt.day_name().str.lower()
-        self.df["month"] = self.df["lpep_pickup_datetime"].dt.strftime("%b").str.lower()
-        self.df["rush_hour"] = self.df["lpep_pickup_datetime"].dt.hour
-        self.df.loc[self.df["day"].isin(["saturday", "sunday"]), "rush_hour"] = 0
+        self.df = self.df.loc[:, relevant_cols]
+        self.df.dropna(inplace=True)
+        if self.dtype_plan:
+            self.df = apply_dtype_plan(self.df, self.dtype_plan)
 
-        self.df["rush_hour"] = self.df["rush_hour"].astype(int)
-        mask = (self.df["day"] != "saturday") & (self.df["day"] != "sunday")
-        self.df.loc[mask, "rush_hour"] = self.df.loc[mask].apply(rush_hourizer, axis=1)
+    def _add_route_means(self):
+        """
+        Add mean_distance and mean_duration per pickup/dropoff route.
+        Routes are keyed by a packed integer, their sums and counts aggregated in grouped passes
+        and the means broadcast back to the rows by indexing a dense route lookup table.
 
-        self.df.rename(columns={"VendorID": "vendor_id"}, inplace=True)
+        Raises:
+            ValueError: If a location id falls outside the taxi zone range
+        """
+        route_key = route_keys(self.df)
+        grouped = self.df.groupby(route_key)[["trip_distance", "duration"]]
+        route_sums, route_counts = grouped.sum(), grouped.count()
+
+        self.route_sums = np.zeros((N_TAXI_ZONES * N_TAXI_ZONES, 2))
+        self.route_counts = np.zeros((N_TAXI_ZONES * N_TAXI_ZONES, 2))
+        self.route_sums[route_sums.index.to_numpy()] = route_sums.to_numpy()
+        self.route_counts[route_counts.index.to_numpy()] = route_counts.to_numpy()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            lookup = np.where(self.route_counts > 0, self.route_sums / self.route_counts, np.nan)
+        self.apply_route_means(lookup, route_key)
+
+    def apply_route_means(self, lookup: np.ndarray, route_key: Optional[np.ndarray] = None):
+        """
+        Broadcast per-route means to the rows by indexing a dense route lookup table.
+
+        Args:
+            lookup (np.ndarray): (N_TAXI_ZONES * N_TAXI_ZONES, 2) mean distance and duration per packed route key
+            route_key (np.ndarray, optional): Precomputed route keys of the rows. Defaults to computing them.
+        """
+        if route_key is None:
+            route_key = route_keys(self.df)
+        row_means = lookup[route_key]
 
-        relevant_cols = self.config.num_features + self.config.cat_features + self.config.target
+        self.df["mean_distance"] = row_means[:, 0]
+        self.df["mean_duration"] = row_means[:, 1]
 
-        self.df = self.df.loc[:, relevant_cols]
-        self.df.dropna(inplace=True)
+        self.route_stats = lookup.reshape(N_TAXI_ZONES, N_TAXI_ZONES, 2).astype(np.float32)
+
+    def save_route_stats(self, file_name: str):
+        """
+        Save the route statistics table computed by process_data as a versioned .npz file.
+        The table has shape (N_TAXI_ZONES, N_TAXI_ZONES, 2) and holds the mean distance
+        and mean duration of route PU -> DO at [PU, DO]; unseen routes are NaN.
+
+        Args:
+            file_name (str): Name of the file
+
+        Raises:
+            ValueError: If process_data has not been run yet
+        """
+        if self.route_stats is None:
+            raise ValueError("Route statistics are not available. Run process_data first")
+        save_route_stats_table(file_name, self.route_stats)
 
     def split_data(
         self, test_size: Optional[float] = 0.2, random_state: Optional[int] = 42
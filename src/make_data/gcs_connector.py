@@ -1,24 +1,53 @@
+import hashlib
 import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
-from typing import Optional
+from typing import Iterator, Optional, Union
 
 import pandas as pd
 from google.cloud import storage
 
+from make_data.partitioned_dataset import (
+    Filters,
+    dataset_fingerprint,
+    iter_partitioned_dataset,
+    publish_generation,
+    read_partitioned_dataset,
+    write_partitioned_dataset,
+)
+from utils import apply_dtype_plan, concat_frames
+
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
 
 class GCSConnector:
-    def __init__(self, bucket_name: str):
+    def __init__(
+        self,
+        bucket_name: str,
+        cache_dir: Optional[str] = None,
+        max_workers: int = 8,
+        cache_max_bytes: int = 20 * 1024**3,
+        cache_max_age_seconds: float = 30 * 24 * 3600,
+    ):
         """
         Create a class to upload data to Google Cloud Storage bucket
 
         Args:
             bucket_name (str): Name of the bucket
+            cache_dir (str, optional): Local directory caching downloaded blobs. Defaults to no caching.
+            max_workers (int, optional): Number of blobs downloaded in parallel. Defaults to 8.
+            cache_max_bytes (int, optional): Maximum total size of the cache. Defaults to 20 GiB.
+            cache_max_age_seconds (float, optional): Maximum time since a cached blob was last used. Defaults to 30 days.
         """
         self.client = storage.Client()
         self.bucket_name = bucket_name
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.cache_max_bytes = cache_max_bytes
+        self.cache_max_age_seconds = cache_max_age_seconds
 
     def upload(self, df: pd.DataFrame, file_name: str):
         """
@@ -39,6 +68,45 @@ class GCSConnector:
         df.to_parquet(destination)
         logging.info(f"File {file_name} uploaded to {destination}")
 
+    def upload_file(self, local_path: str, file_name: str):
+        """
+        Upload a local file as-is to Google Cloud Storage bucket
+
+        Args:
+            local_path (str): Path of the local file to upload
+            file_name (str): Name of the file in the bucket
+        """
+        bucket = self.client.bucket(self.bucket_name)
+        blob = bucket.blob(file_name)
+        blob.upload_from_filename(local_path)
+        logging.info(f"File {local_path} uploaded to gs://{self.bucket_name}/{file_name}")
+
+    def download_file(self, file_name: str, local_path: str):
+        """
+        Download a file as-is from Google Cloud Storage bucket
+
+        Args:
+            file_name (str): Name of the file in the bucket
+            local_path (str): Path of the local file to write
+        """
+        bucket = self.client.bucket(self.bucket_name)
+        blob = bucket.blob(file_name)
+        blob.download_to_filename(local_path)
+        logging.info(f"File gs://{self.bucket_name}/{file_name} downloaded to {local_path}")
+
+    def delete_file(self, file_name: str):
+        """
+        Delete a file from Google Cloud Storage bucket, if it exists
+
+        Args:
+            file_name (str): Name of the file in the bucket
+        """
+        bucket = self.client.bucket(self.bucket_name)
+        blob = bucket.blob(file_name)
+        if blob.exists():
+            blob.delete()
+            logging.info(f"File gs://{self.bucket_name}/{file_name} deleted")
+
     def check_file_exists(self, file_name: str):
         """
         Check if the file exists in the bucket
@@ -50,22 +118,224 @@ class GCSConnector:
         blob = bucket.blob(file_name)
         return blob.exists()
 
-    def read_many_from_gcs(self, taxi_type: Optional[str] = "green"):
-        """Read multiple raw data from GCS"""
-        client = storage.Client()
-        bucket = client.bucket(self.bucket_name)
-        blobs = bucket.list_blobs()
-        all_dataframes = []
-        for blob in blobs:
-            if blob.name.endswith(".parquet") and taxi_type in blob.name:
-                content = blob.download_as_bytes()
-                df = pd.read_parquet(BytesIO(content))
-                all_dataframes.append(df)
-        df = pd.concat(all_dataframes, ignore_index=True)
+    def _list_parquet_blobs(self, taxi_type: str) -> list[storage.Blob]:
+        bucket = self.client.bucket(self.bucket_name)
+        return [blob for blob in bucket.list_blobs() if blob.name.endswith(".parquet") and taxi_type in blob.name]
+
+    def list_parquet_files(self, taxi_type: Optional[str] = "green") -> list[str]:
+        """
+        Names of the parquet files of a taxi type in the bucket
+
+        Args:
+            taxi_type (str, optional): Type of taxi data. Defaults to "green".
+        """
+        return [blob.name for blob in self._list_parquet_blobs(taxi_type)]
+
+    def _cache_path(self, blob: storage.Blob) -> str:
+        """Cache location of a blob, keyed by its name, generation and md5 so overwritten blobs are re-downloaded"""
+        key = hashlib.sha256(f"{self.bucket_name}/{blob.name}#{blob.generation}#{blob.md5_hash}".encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.parquet")
+
+    def _fetch_blob(self, blob: storage.Blob) -> Union[str, bytes]:
+        """Download a blob: into the cache, returning its path, or into memory when there is no cache"""
+        if self.cache_dir is None:
+            return blob.download_as_bytes()
+
+        path = self._cache_path(blob)
+        if os.path.exists(path):
+            # The file's modification time records when it was last used, for eviction
+            os.utime(path)
+            logging.info(f"Cache hit for {blob.name}")
+            return path
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        partial_path = f"{path}.{os.getpid()}.part"
+        blob.download_to_filename(partial_path)
+        os.replace(partial_path, path)
+        logging.info(f"Downloaded {blob.name} to cache {path}")
+        return path
+
+    def _fetch_blobs(self, blobs: list[storage.Blob]) -> list[Union[str, bytes]]:
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            contents = list(executor.map(self._fetch_blob, blobs))
+        if self.cache_dir is not None:
+            self.evict_cache(keep=set(contents))
+        return contents
+
+    def evict_cache(self, keep: Optional[set[str]] = None) -> int:
+        """
+        Remove cached blobs unused for more than cache_max_age_seconds, then least recently used ones beyond
+        cache_max_bytes. Older generations of rewritten blobs are never used again, so they age out.
+        Partial downloads left by an interrupted process are removed once they are older than the age limit.
+
+        Args:
+            keep (set[str], optional): Paths that are about to be read and must not be removed. Defaults to none.
+
+        Returns:
+            int: Number of files removed
+        """
+        if self.cache_dir is None or not os.path.isdir(self.cache_dir):
+            return 0
+        keep = keep or set()
+        now = time.time()
+        files = [entry for entry in os.scandir(self.cache_dir) if entry.is_file()]
+        to_remove = [
+            entry.path
+            for entry in files
+            if entry.name.endswith(".part") and now - entry.stat().st_mtime > self.cache_max_age_seconds
+        ]
+        cached = sorted(
+            (entry for entry in files if not entry.name.endswith(".part")),
+            key=lambda entry: entry.stat().st_mtime,
+            reverse=True,
+        )
+
+        kept_bytes = 0
+        for entry in cached:
+            last_used, size = entry.stat().st_mtime, entry.stat().st_size
+            if entry.path not in keep and (
+                now - last_used > self.cache_max_age_seconds or kept_bytes + size > self.cache_max_bytes
+            ):
+                to_remove.append(entry.path)
+            else:
+                kept_bytes += size
+
+        removed = 0
+        for path in to_remove:
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                # Already removed by another process sharing the cache
+                pass
+        if removed:
+            logger.info(f"Evicted {removed} cached blobs, {kept_bytes} bytes kept")
+        return removed
+
+    @staticmethod
+    def _read_parquet(content: Union[str, bytes], dtypes: Optional[dict[str, str]] = None) -> pd.DataFrame:
+        if isinstance(content, str):
+            df = pd.read_parquet(content, memory_map=True)
+        else:
+            df = pd.read_parquet(BytesIO(content))
+        if dtypes:
+            df = apply_dtype_plan(df, dtypes)
         return df
 
-    def read_one_from_gcs(self, file_name: str):
+    def read_many_from_gcs(self, taxi_type: Optional[str] = "green", dtypes: Optional[dict[str, str]] = None):
+        """
+        Read multiple raw data from GCS, downloading the blobs in parallel
+
+        Args:
+            taxi_type (str, optional): Type of taxi data to read. Defaults to "green".
+            dtypes (dict[str, str], optional): Dtype plan applied to each file as it is read. Defaults to None.
+        """
+        contents = self._fetch_blobs(self._list_parquet_blobs(taxi_type))
+        all_dataframes = [self._read_parquet(content, dtypes) for content in contents]
+        df = concat_frames(all_dataframes)
+        return df
+
+    def iter_many_from_gcs(
+        self, taxi_type: Optional[str] = "green", dtypes: Optional[dict[str, str]] = None
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Read multiple raw data files from GCS one at a time, so only one file is held in memory.
+        With a cache, all blobs are first downloaded to it in parallel and then read from disk one at a time.
+
+        Args:
+            taxi_type (str, optional): Type of taxi data to read. Defaults to "green".
+            dtypes (dict[str, str], optional): Dtype plan applied to each file as it is read. Defaults to None.
+        """
+        blobs = self._list_parquet_blobs(taxi_type)
+        if self.cache_dir is not None:
+            for path in self._fetch_blobs(blobs):
+                yield self._read_parquet(path, dtypes)
+            return
+
+        for blob in blobs:
+            df = self._read_parquet(blob.download_as_bytes(), dtypes)
+            logging.info(f"Loaded {blob.name} from GCS")
+            yield df
+
+    def read_one_from_gcs(self, file_name: str, dtypes: Optional[dict[str, str]] = None):
         destination = f"gs://{self.bucket_name}/{file_name}"
         df = pd.read_parquet(destination)
+        if dtypes:
+            df = apply_dtype_plan(df, dtypes)
         logging.info(f"Loaded {file_name} from GCS")
         return df
+
+    def upload_dataset(
+        self,
+        source: Union[pd.DataFrame, str],
+        dataset_name: str,
+        split: str,
+        basename_template: str = "part-{i}.parquet",
+        generation: Optional[str] = None,
+    ):
+        """
+        Write one split of processed data into a year/month/split partitioned parquet dataset in the bucket
+
+        Args:
+            source (Union[pd.DataFrame, str]): Dataframe with year and month columns, or path of a local parquet file
+            dataset_name (str): Name of the dataset in the bucket
+            split (str): Name of the split, e.g. "train" or "test"
+            basename_template (str, optional): Name of the files written in each partition, with {i} as a counter.
+                Files with the same names are overwritten. Defaults to "part-{i}.parquet".
+            generation (str, optional): New generation to write, read only once published with publish_dataset.
+                Defaults to adding to the published generation.
+        """
+        write_partitioned_dataset(
+            source, f"gs://{self.bucket_name}/{dataset_name}", split, basename_template, generation=generation
+        )
+
+    def publish_dataset(self, dataset_name: str, generation: str):
+        """
+        Switch the readers of a partitioned dataset in the bucket to a generation written with upload_dataset,
+        then delete the previous generations
+
+        Args:
+            dataset_name (str): Name of the dataset in the bucket
+            generation (str): Generation to publish
+        """
+        publish_generation(f"gs://{self.bucket_name}/{dataset_name}", generation)
+
+    def read_dataset(
+        self, dataset_name: str, columns: Optional[list[str]] = None, filters: Optional[Filters] = None
+    ) -> pd.DataFrame:
+        """
+        Read only the columns and partitions of a partitioned dataset in the bucket that are needed
+
+        Args:
+            dataset_name (str): Name of the dataset in the bucket
+            columns (list[str], optional): Columns to read. Defaults to all columns.
+            filters (Filters, optional): Row filters, e.g. [("split", "=", "train"), ("month", "in", [10, 11])].
+                Defaults to all rows.
+        """
+        df = read_partitioned_dataset(f"gs://{self.bucket_name}/{dataset_name}", columns, filters)
+        logging.info(f"Loaded {len(df)} rows of {dataset_name} from GCS")
+        return df
+
+    def iter_dataset(
+        self, dataset_name: str, columns: Optional[list[str]] = None, filters: Optional[Filters] = None
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Read a partitioned dataset in the bucket like read_dataset, one batch of rows at a time
+
+        Args:
+            dataset_name (str): Name of the dataset in the bucket
+            columns (list[str], optional): Columns to read. Defaults to all columns.
+            filters (Filters, optional): Row filters, e.g. [("split", "=", "train")]. Defaults to all rows.
+        """
+        return iter_partitioned_dataset(f"gs://{self.bucket_name}/{dataset_name}", columns, filters)
+
+    def dataset_fingerprint(self, dataset_name: str, filters: Optional[Filters] = None) -> str:
+        """
+        Fingerprint of the files of a partitioned dataset in the bucket that match a filter,
+        which changes whenever one of them is added, removed or rewritten
+
+        Args:
+            dataset_name (str): Name of the dataset in the bucket
+            filters (Filters, optional): Row filters, e.g. [("split", "=", "train")]. Defaults to all rows.
+        """
+        return dataset_fingerprint(f"gs://{self.bucket_name}/{dataset_name}", filters)
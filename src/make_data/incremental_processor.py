@@ -0,0 +1,195 @@
+import logging
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from make_data.data_processor import IMPUTED_COLUMNS, IQR_FACTOR, DataProcessor, save_route_stats_table
+from make_data.streaming_processor import RouteAggregate, ValueCountSketch
+from project_config import ProjectConfig
+from utils import outlier_imputer
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Bump when the layout of the saved incremental state changes
+INCREMENTAL_STATE_VERSION = 1
+
+
+class IncrementalState:
+    def __init__(self):
+        """
+        Mergeable aggregates over every month processed so far: the value counts of the imputed columns,
+        for the outlier quartiles, and the per-route sums and counts of trip distance and duration.
+        """
+        self.months: list[str] = []
+        self.sketches = {col: ValueCountSketch() for col in IMPUTED_COLUMNS}
+        self.route_aggregate = RouteAggregate()
+
+    @classmethod
+    def from_aggregates(
+        cls, months: list[str], value_counts: dict[str, pd.Series], route_sums: np.ndarray, route_counts: np.ndarray
+    ) -> "IncrementalState":
+        """
+        State left by a full rebuild, so the next incremental month merges into the aggregates of the rebuilt data
+
+        Args:
+            months (list[str]): Months of the rebuilt raw data, e.g. ["2024-10", "2024-11"]
+            value_counts (dict[str, pd.Series]): Count of each value of the imputed columns, before imputation
+            route_sums (np.ndarray): (N_TAXI_ZONES * N_TAXI_ZONES, 2) sums of trip distance and imputed duration
+            route_counts (np.ndarray): (N_TAXI_ZONES * N_TAXI_ZONES, 2) counts of trip distance and imputed duration
+        """
+        state = cls()
+        state.months = sorted(months)
+        for col, sketch in state.sketches.items():
+            sketch.counts = value_counts[col].astype(np.float64)
+        state.route_aggregate.sums = np.asarray(route_sums, dtype=np.float64)
+        state.route_aggregate.counts = np.asarray(route_counts, dtype=np.float64)
+        return state
+
+    def quantiles(self) -> dict[str, tuple[float, float]]:
+        """(Q1, Q3) of each imputed column over all months processed so far"""
+        return {col: (sketch.quantile(0.25), sketch.quantile(0.75)) for col, sketch in self.sketches.items()}
+
+    def save(self, file_name: str):
+        """
+        Save the state as a .npz file
+
+        Args:
+            file_name (str): Name of the file
+        """
+        arrays = {
+            "version": np.array(INCREMENTAL_STATE_VERSION),
+            "months": np.array(self.months, dtype=str),
+            "route_sums": self.route_aggregate.sums,
+            "route_counts": self.route_aggregate.counts,
+        }
+        for col, sketch in self.sketches.items():
+            arrays[f"{col}_values"] = sketch.counts.index.to_numpy(dtype=np.float64)
+            arrays[f"{col}_counts"] = sketch.counts.to_numpy(dtype=np.float64)
+        with open(file_name, "wb") as f:
+            np.savez(f, **arrays)
+        logger.info(
+            f"Incremental state (v{INCREMENTAL_STATE_VERSION}) for {len(self.months)} months saved to {file_name}"
+        )
+
+    @classmethod
+    def load(cls, file_name: str) -> "IncrementalState":
+        """
+        Load a state saved with save
+
+        Args:
+            file_name (str): Name of the file
+
+        Raises:
+            ValueError: If the file was saved with another state version
+        """
+        with np.load(file_name, allow_pickle=False) as arrays:
+            if int(arrays["version"]) != INCREMENTAL_STATE_VERSION:
+                raise ValueError(
+                    f"Incremental state version {int(arrays['version'])} is not supported, "
+                    f"expected {INCREMENTAL_STATE_VERSION}. Rebuild it from scratch"
+                )
+            state = cls()
+            state.months = arrays["months"].tolist()
+            state.route_aggregate.sums = arrays["route_sums"]
+            state.route_aggregate.counts = arrays["route_counts"]
+            for col, sketch in state.sketches.items():
+                sketch.counts = pd.Series(arrays[f"{col}_counts"], index=arrays[f"{col}_values"])
+        return state
+
+
+class IncrementalDataProcessor:
+    def __init__(
+        self,
+        config: ProjectConfig,
+        state: Optional[IncrementalState] = None,
+        dtype_plan: Optional[dict[str, str]] = None,
+    ):
+        """
+        Class to process one new month of raw taxi data on top of the state left by the previous months,
+        so a monthly run costs one month of work instead of the whole history.
+
+        Each month is cleaned, merged into the global aggregates and then imputed and enriched with the
+        updated global quartiles and route means. Partitions written earlier are not rewritten, so they keep
+        the quartiles and route means as of their own run, and the route sums include those months' durations
+        imputed with their own quartiles. Both drift slowly as months accumulate; a full rebuild resets them
+        and reseeds the state with IncrementalState.from_aggregates.
+
+        Args:
+            config (ProjectConfig): ProjectConfig object
+            state (IncrementalState, optional): State of the months processed so far. Defaults to an empty state.
+            dtype_plan (dict[str, str], optional): Dtypes of the processed columns. Defaults to the computed dtypes.
+        """
+        self.config = config
+        self.state = state if state is not None else IncrementalState()
+        self.dtype_plan = dtype_plan
+        self.route_stats = None
+
+    def process_month(
+        self,
+        df: pd.DataFrame,
+        month: str,
+        test_size: float = 0.2,
+        random_state: int = 42,
+    ) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Process one month into its train and test sets and update the state.
+        The state is only updated once the month has been processed successfully.
+
+        Args:
+            df (pd.DataFrame): Raw trips of the month
+            month (str): Month of the data, e.g. "2024-11"
+            test_size (float, optional): Size of test set. Defaults to 0.2.
+            random_state (int, optional): Random state. Defaults to 42.
+
+        Returns:
+            tuple[pd.DataFrame, pd.DataFrame]: Train and test sets of the month
+
+        Raises:
+            ValueError: If the month has already been processed
+        """
+        if month in self.state.months:
+            raise ValueError(f"Month {month} has already been processed. Rebuild from scratch to reprocess it")
+
+        month_processor = DataProcessor(df, self.config, dtype_plan=self.dtype_plan)
+        month_processor.clean_trips()
+
+        sketches = {}
+        for col, state_sketch in self.state.sketches.items():
+            sketches[col] = ValueCountSketch()
+            sketches[col].merge(state_sketch)
+            sketches[col].update(month_processor.df[col])
+        quantiles = {col: (sketch.quantile(0.25), sketch.quantile(0.75)) for col, sketch in sketches.items()}
+        month_processor.df = outlier_imputer(month_processor.df, IMPUTED_COLUMNS, IQR_FACTOR, quantiles)
+
+        route_aggregate = RouteAggregate()
+        route_aggregate.merge(self.state.route_aggregate)
+        route_aggregate.update(month_processor.df)
+        month_processor.apply_route_means(route_aggregate.means())
+
+        month_processor.add_rush_hour()
+        month_processor.select_features()
+        train_set, test_set = month_processor.split_data(test_size=test_size, random_state=random_state)
+
+        self.state.sketches = sketches
+        self.state.route_aggregate = route_aggregate
+        self.state.months.append(month)
+        self.route_stats = month_processor.route_stats
+        logger.info(f"Processed {month}: {len(train_set)} train rows and {len(test_set)} test rows")
+        return train_set, test_set
+
+    def save_route_stats(self, file_name: str):
+        """
+        Save the route statistics table, updated with the last processed month,
+        in the same layout as DataProcessor.save_route_stats.
+
+        Args:
+            file_name (str): Name of the file
+
+        Raises:
+            ValueError: If no month has been processed yet
+        """
+        if self.route_stats is None:
+            raise ValueError("Route statistics are not available. Run process_month first")
+        save_route_stats_table(file_name, self.route_stats)
@@ -0,0 +1,89 @@
+import logging
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Literal, Optional
+
+import pyarrow.parquet as pq
+
+from make_data.data_loader import NYCTaxiDataFetcher, ParquetDataSaver
+from make_data.gcs_connector import GCSConnector
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+IngestionStatus = Literal["skipped", "uploaded", "failed"]
+
+
+class BatchIngestionRunner:
+    def __init__(
+        self,
+        data_fetcher: NYCTaxiDataFetcher,
+        gcs_connector: GCSConnector,
+        schema: list[dict],
+        max_workers: int = 4,
+        download_dir: Optional[str] = None,
+    ):
+        """
+        Class to ingest many monthly files concurrently: months already in the bucket are skipped
+        before anything is downloaded, missing ones are streamed to disk, validated and uploaded.
+
+        Args:
+            data_fetcher (NYCTaxiDataFetcher): Fetcher used to download the monthly files
+            gcs_connector (GCSConnector): Connector to the raw data bucket
+            schema (list[dict]): Schema the monthly files are validated against
+            max_workers (int, optional): Number of months ingested in parallel. Defaults to 4.
+            download_dir (str, optional): Directory for the downloaded files. Defaults to a temporary directory.
+        """
+        self.data_fetcher = data_fetcher
+        self.gcs_connector = gcs_connector
+        self.schema = schema
+        self.max_workers = max_workers
+        self.download_dir = download_dir
+
+    def run(self, year_months: list[tuple[int, int]]) -> dict[str, IngestionStatus]:
+        """
+        Ingest the given months.
+
+        Args:
+            year_months (list[tuple[int, int]]): (year, month) pairs to ingest
+
+        Returns:
+            dict[str, IngestionStatus]: Status per monthly file name
+        """
+        with tempfile.TemporaryDirectory() as temp_dir:
+            download_dir = self.download_dir or temp_dir
+            statuses = {}
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = {
+                    executor.submit(self._ingest, year, month, download_dir): self.data_fetcher.file_name(year, month)
+                    for year, month in year_months
+                }
+                for future in as_completed(futures):
+                    file_name = futures[future]
+                    try:
+                        statuses[file_name] = future.result()
+                    except Exception as e:
+                        logger.error(f"Ingestion of {file_name} failed: {str(e)}")
+                        statuses[file_name] = "failed"
+
+        counts = {status: list(statuses.values()).count(status) for status in ("uploaded", "skipped", "failed")}
+        logger.info(f"Ingestion finished: {counts}")
+        return statuses
+
+    def _ingest(self, year: int, month: int, download_dir: str) -> IngestionStatus:
+        file_name = self.data_fetcher.file_name(year, month)
+        if self.gcs_connector.check_file_exists(file_name):
+            logger.info(f"File {file_name} already exists in GCS bucket. Skipping")
+            return "skipped"
+
+        local_path = os.path.join(download_dir, file_name)
+        self.data_fetcher.download(year, month, local_path)
+        try:
+            data_checker = ParquetDataSaver(pq.read_table(local_path))
+            data_checker.validate_schema(self.schema)
+            data_checker.save(local_path)
+            self.gcs_connector.upload_file(local_path, file_name)
+        finally:
+            os.remove(local_path)
+        return "uploaded"
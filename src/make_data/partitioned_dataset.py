@@ -0,0 +1,256 @@
+import hashlib
+import logging
+from typing import Iterator, Optional, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow import fs
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Hive partition keys of the processed dataset, e.g. year=2024/month=11/split=train/part-0.parquet
+PARTITIONING = pa.schema([("year", pa.uint16()), ("month", pa.uint8()), ("split", pa.string())])
+# Rows per parquet row group: large enough for efficient scans, small enough for statistics to skip row groups
+ROWS_PER_GROUP = 128 * 1024
+
+# A rebuild writes a complete generation of the dataset under GENERATIONS_DIR, and readers follow the generation
+# named in CURRENT_GENERATION_FILE. Both start with "_", which dataset discovery ignores, so readers of a dataset
+# never published, e.g. base_dir/year=2024/..., do not see the generations either
+GENERATIONS_DIR = "_generations"
+CURRENT_GENERATION_FILE = "_current_generation"
+
+Filters = Union[pc.Expression, list[tuple], list[list[tuple]]]
+
+
+def _resolve(base_dir: str, filesystem: Optional[fs.FileSystem]) -> tuple[fs.FileSystem, str]:
+    if filesystem is not None:
+        return filesystem, base_dir
+    return fs.FileSystem.from_uri(base_dir)
+
+
+def _generation_dir(base_dir: str, generation: str) -> str:
+    return f"{base_dir}/{GENERATIONS_DIR}/{generation}"
+
+
+def current_dataset_dir(base_dir: str, filesystem: Optional[fs.FileSystem] = None) -> tuple[fs.FileSystem, str]:
+    """
+    Directory of the published generation of a dataset, or base_dir itself if no generation was ever published
+
+    Args:
+        base_dir (str): Root of the dataset, e.g. gs://bucket/green_taxi_processed
+        filesystem (fs.FileSystem, optional): Filesystem of base_dir. Defaults to inferring it from base_dir.
+    """
+    filesystem, base_dir = _resolve(base_dir, filesystem)
+    try:
+        with filesystem.open_input_stream(f"{base_dir}/{CURRENT_GENERATION_FILE}") as f:
+            generation = f.read().decode().strip()
+    except FileNotFoundError:
+        return filesystem, base_dir
+    return filesystem, _generation_dir(base_dir, generation)
+
+
+def write_partitioned_dataset(
+    source: Union[pd.DataFrame, str],
+    base_dir: str,
+    split: str,
+    basename_template: str = "part-{i}.parquet",
+    filesystem: Optional[fs.FileSystem] = None,
+    generation: Optional[str] = None,
+):
+    """
+    Write one split of processed trips into a hive-partitioned parquet dataset, partitioned by year, month and split.
+    The data must have year and month columns; they are stored in the directory names rather than in the files.
+    Files are zstd-compressed with column statistics, so readers can skip row groups that do not match a filter.
+    Existing files with the same names are overwritten and other files are left in place.
+
+    Args:
+        source (Union[pd.DataFrame, str]): Dataframe, or path of a local parquet file streamed batch by batch
+        base_dir (str): Root of the dataset, e.g. gs://bucket/green_taxi_processed
+        split (str): Name of the split, e.g. "train" or "test"
+        basename_template (str, optional): Name of the files written in each partition, with {i} as a counter.
+            Defaults to "part-{i}.parquet".
+        filesystem (fs.FileSystem, optional): Filesystem of base_dir. Defaults to inferring it from base_dir.
+        generation (str, optional): New generation to write, invisible to readers until publish_generation.
+            Defaults to adding to the published generation.
+
+    Raises:
+        ValueError: If the data has no year or month column
+    """
+    if generation is not None:
+        filesystem, base_dir = _resolve(base_dir, filesystem)
+        base_dir = _generation_dir(base_dir, generation)
+    else:
+        filesystem, base_dir = current_dataset_dir(base_dir, filesystem)
+    if isinstance(source, pd.DataFrame):
+        source_schema = pa.Schema.from_pandas(source, preserve_index=False)
+        batches = pa.Table.from_pandas(source, preserve_index=False, schema=source_schema).to_batches()
+    else:
+        dataset = ds.dataset(source, format="parquet")
+        source_schema = dataset.schema
+        batches = dataset.to_batches(batch_size=ROWS_PER_GROUP)
+
+    missing_columns = {"year", "month"} - set(source_schema.names)
+    if missing_columns:
+        raise ValueError(f"Partition columns {sorted(missing_columns)} are missing from the data")
+
+    schema = source_schema.append(PARTITIONING.field("split"))
+    for name in ("year", "month"):
+        schema = schema.set(schema.get_field_index(name), PARTITIONING.field(name))
+
+    def with_split(batch: pa.RecordBatch) -> pa.RecordBatch:
+        batch = batch.append_column("split", pa.array([split] * batch.num_rows, pa.string()))
+        return batch.cast(schema)
+
+    ds.write_dataset(
+        (with_split(batch) for batch in batches),
+        base_dir,
+        schema=schema,
+        format="parquet",
+        partitioning=ds.partitioning(PARTITIONING, flavor="hive"),
+        filesystem=filesystem,
+        basename_template=basename_template,
+        existing_data_behavior="overwrite_or_ignore",
+        file_options=ds.ParquetFileFormat().make_write_options(compression="zstd", write_statistics=True),
+        min_rows_per_group=ROWS_PER_GROUP,
+        max_rows_per_group=ROWS_PER_GROUP,
+    )
+    logger.info(f"Wrote the {split} split to the partitioned dataset {base_dir}")
+
+
+def read_partitioned_dataset(
+    base_dir: str,
+    columns: Optional[list[str]] = None,
+    filters: Optional[Filters] = None,
+    filesystem: Optional[fs.FileSystem] = None,
+) -> pd.DataFrame:
+    """
+    Read the rows and columns of a partitioned dataset that match a filter, reading only what they need:
+    partitions outside the filter are never opened and row groups are skipped using their column statistics.
+
+    Args:
+        base_dir (str): Root of the dataset, e.g. gs://bucket/green_taxi_processed
+        columns (list[str], optional): Columns to read, partition keys included. Defaults to all columns.
+        filters (Filters, optional): A pyarrow expression, or filters in the pq.read_table format, e.g.
+            [("split", "=", "train"), ("year", "=", 2024), ("month", "in", [10, 11])]. Defaults to all rows.
+        filesystem (fs.FileSystem, optional): Filesystem of base_dir. Defaults to inferring it from base_dir.
+    """
+    dataset, filters = _open(base_dir, filters, filesystem)
+    return dataset.to_table(columns=columns, filter=filters).to_pandas()
+
+
+def iter_partitioned_dataset(
+    base_dir: str,
+    columns: Optional[list[str]] = None,
+    filters: Optional[Filters] = None,
+    batch_size: int = ROWS_PER_GROUP,
+    filesystem: Optional[fs.FileSystem] = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Read a partitioned dataset like read_partitioned_dataset, but as dataframes of at most batch_size rows,
+    so only one batch is held in memory at a time.
+
+    Args:
+        base_dir (str): Root of the dataset, e.g. gs://bucket/green_taxi_processed
+        columns (list[str], optional): Columns to read, partition keys included. Defaults to all columns.
+        filters (Filters, optional): A pyarrow expression, or filters in the pq.read_table format. Defaults to all rows.
+        batch_size (int, optional): Maximum number of rows per dataframe. Defaults to ROWS_PER_GROUP.
+        filesystem (fs.FileSystem, optional): Filesystem of base_dir. Defaults to inferring it from base_dir.
+    """
+    dataset, filters = _open(base_dir, filters, filesystem)
+    for batch in dataset.to_batches(columns=columns, filter=filters, batch_size=batch_size):
+        if batch.num_rows:
+            yield batch.to_pandas()
+
+
+def dataset_fingerprint(
+    base_dir: str, filters: Optional[Filters] = None, filesystem: Optional[fs.FileSystem] = None
+) -> str:
+    """
+    Fingerprint of the files of a partitioned dataset that match a filter: their paths, sizes and modification
+    times. It changes whenever a matching file is added, removed or rewritten, without reading any data.
+
+    Args:
+        base_dir (str): Root of the dataset, e.g. gs://bucket/green_taxi_processed
+        filters (Filters, optional): A pyarrow expression, or filters in the pq.read_table format. Defaults to all rows.
+        filesystem (fs.FileSystem, optional): Filesystem of base_dir. Defaults to inferring it from base_dir.
+    """
+    dataset, filters = _open(base_dir, filters, filesystem)
+    paths = sorted(fragment.path for fragment in dataset.get_fragments(filter=filters))
+    digest = hashlib.sha256(str(filters).encode())
+    for info in dataset.filesystem.get_file_info(paths):
+        digest.update(f"{info.path}:{info.size}:{info.mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+def _open(
+    base_dir: str, filters: Optional[Filters], filesystem: Optional[fs.FileSystem]
+) -> tuple[ds.Dataset, Optional[pc.Expression]]:
+    filesystem, base_dir = current_dataset_dir(base_dir, filesystem)
+    if filters is not None and not isinstance(filters, pc.Expression):
+        filters = pq.filters_to_expression(filters)
+    dataset = ds.dataset(
+        base_dir, format="parquet", partitioning=ds.partitioning(PARTITIONING, flavor="hive"), filesystem=filesystem
+    )
+    return dataset, filters
+
+
+def publish_generation(base_dir: str, generation: str, filesystem: Optional[fs.FileSystem] = None):
+    """
+    Switch the readers of a dataset to a generation written with write_partitioned_dataset, then delete the
+    previous generations and any files of the dataset from before generations. The switch is a single write of
+    CURRENT_GENERATION_FILE, so readers see either the previous rows or the new ones, never both. A read that
+    resolved the previous generation and is still listing or reading its files may fail once they are deleted.
+
+    Args:
+        base_dir (str): Root of the dataset, e.g. gs://bucket/green_taxi_processed
+        generation (str): Generation to publish
+        filesystem (fs.FileSystem, optional): Filesystem of base_dir. Defaults to inferring it from base_dir.
+
+    Raises:
+        ValueError: If the generation has not been written
+    """
+    filesystem, base_dir = _resolve(base_dir, filesystem)
+    generation_dir = _generation_dir(base_dir, generation)
+    if filesystem.get_file_info(generation_dir).type != fs.FileType.Directory:
+        raise ValueError(f"Generation {generation} of {base_dir} has not been written")
+
+    # Written to a temporary file and moved, so readers never read a partial name
+    current_path = f"{base_dir}/{CURRENT_GENERATION_FILE}"
+    with filesystem.open_output_stream(f"{current_path}.part") as f:
+        f.write(generation.encode())
+    filesystem.move(f"{current_path}.part", current_path)
+    logger.info(f"Published generation {generation} of the partitioned dataset {base_dir}")
+
+    stale = [
+        info
+        for info in filesystem.get_file_info(fs.FileSelector(base_dir))
+        if info.base_name not in (GENERATIONS_DIR, CURRENT_GENERATION_FILE)
+    ]
+    stale += [
+        info
+        for info in filesystem.get_file_info(fs.FileSelector(f"{base_dir}/{GENERATIONS_DIR}"))
+        if info.base_name != generation
+    ]
+    for info in stale:
+        if info.type == fs.FileType.Directory:
+            filesystem.delete_dir(info.path)
+        else:
+            filesystem.delete_file(info.path)
+    logger.info(f"Deleted {len(stale)} previous generations and files of the partitioned dataset {base_dir}")
+
+
+def clear_partitioned_dataset(base_dir: str, filesystem: Optional[fs.FileSystem] = None):
+    """
+    Delete every generation and file of a partitioned dataset
+
+    Args:
+        base_dir (str): Root of the dataset, e.g. gs://bucket/green_taxi_processed
+        filesystem (fs.FileSystem, optional): Filesystem of base_dir. Defaults to inferring it from base_dir.
+    """
+    filesystem, base_dir = _resolve(base_dir, filesystem)
+    filesystem.delete_dir_contents(base_dir, missing_dir_ok=True)
+    logger.info(f"Cleared the partitioned dataset {base_dir}")
@@ -0,0 +1,159 @@
+import logging
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+ARROW_TYPES = {
+    "int": pa.int64(),
+    "float": pa.float64(),
+    "string": pa.string(),
+    "datetime": pa.timestamp("us"),
+}
+
+
+def compile_arrow_schema(schema: list[dict]) -> pa.Schema:
+    """
+    Compile a project schema (list of {"name", "type"}) into a pyarrow Schema.
+
+    Args:
+        schema (list[dict]): List of column definitions from the schema
+
+    Raises:
+        ValueError: If a column has an unsupported type
+    """
+    fields = []
+    for col in schema:
+        if col["type"] not in ARROW_TYPES:
+            logger.warning(f"Unsupported type '{col['type']}' for column '{col['name']}'")
+            raise ValueError(f"Unsupported type {col['type']} for column '{col['name']}'")
+        fields.append(pa.field(col["name"], ARROW_TYPES[col["type"]]))
+    return pa.schema(fields)
+
+
+def coerce_numeric_column(column: pa.ChunkedArray, arrow_type: pa.DataType) -> pa.ChunkedArray:
+    """
+    Convert a column to a numeric type the way pd.to_numeric(errors="coerce") does: values that do not parse,
+    and for integer types values that are fractional or out of range, become nulls.
+
+    Args:
+        column (pa.ChunkedArray): Column that failed a safe cast
+        arrow_type (pa.DataType): Integer or floating point type of the schema
+
+    Returns:
+        pa.ChunkedArray: The converted column
+    """
+    values = pd.to_numeric(column.to_pandas(), errors="coerce").astype(np.float64)
+    if pa.types.is_integer(arrow_type):
+        info = np.iinfo(arrow_type.to_pandas_dtype())
+        values = values.where((values % 1 == 0) & values.between(info.min, info.max))
+    return pa.chunked_array([pa.array(values, type=arrow_type, from_pandas=True)])
+
+
+class ArrowSchemaValidator:
+    def __init__(self, schema: list[dict]):
+        """
+        Validate and cast Arrow tables against a project schema in a single Table.cast,
+        without converting them to pandas.
+
+        Args:
+            schema (list[dict]): List of column definitions from the schema
+        """
+        self.arrow_schema = compile_arrow_schema(schema)
+
+    def validate(self, table: pa.Table) -> pa.Table:
+        """
+        Check the table has exactly the schema's columns and cast it to the schema's types.
+        Nulls stay nulls. As with the pandas validation, int and float values that cannot be converted
+        become nulls, counted in a warning; any other column that fails to cast is an error.
+
+        Args:
+            table (pa.Table): Table to validate, e.g. as read from parquet
+
+        Returns:
+            pa.Table: Table with the schema's column order and types
+
+        Raises:
+            ValueError: If columns are missing or extra, or if a string or datetime column fails to cast
+        """
+        expected_columns = set(self.arrow_schema.names)
+        actual_columns = set(table.column_names)
+
+        missing_columns = expected_columns - actual_columns
+        extra_columns = actual_columns - expected_columns
+
+        if missing_columns:
+            logger.error(f"Missing columns: {missing_columns}")
+            raise ValueError(f"Missing columns: {missing_columns}")
+        if extra_columns:
+            logger.error(f"Extra columns: {extra_columns}")
+            raise ValueError(f"Extra columns: {extra_columns}")
+
+        table = table.select(self.arrow_schema.names)
+        try:
+            table = table.cast(self.arrow_schema)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError) as e:
+            table = self.coerce_failing_columns(table, e)
+
+        logger.info("Schema validated and converted successfully")
+        return table
+
+    def coerce_failing_columns(self, table: pa.Table, cast_error: Exception) -> pa.Table:
+        """
+        Coerce the numeric columns that failed the safe cast and cast the table again.
+
+        Args:
+            table (pa.Table): Table with the schema's columns, in the schema's order
+            cast_error (Exception): Error raised by the safe cast of the whole table
+
+        Raises:
+            ValueError: If a column that is not int or float fails to cast
+        """
+        errors = self.column_errors(table)
+        strict_errors = {
+            col: error
+            for col, error in errors.items()
+            if not pa.types.is_integer(self.arrow_schema.field(col).type)
+            and not pa.types.is_floating(self.arrow_schema.field(col).type)
+        }
+        for col, error in strict_errors.items():
+            logger.warning(f"Conversion failed for column '{col}' due to {error}")
+        if strict_errors or not errors:
+            raise ValueError(f"Conversion failed for columns {sorted(strict_errors or errors)}") from cast_error
+
+        for col in errors:
+            index = self.arrow_schema.get_field_index(col)
+            field = self.arrow_schema.field(index)
+            column = table.column(index)
+            try:
+                coerced = coerce_numeric_column(column, field.type)
+            except (TypeError, ValueError, pa.ArrowException) as e:
+                logger.warning(f"Conversion failed for column '{col}' due to {errors[col]}")
+                raise ValueError(f"Conversion failed for columns {[col]}") from e
+            logger.warning(
+                f"[Schema Validation] {coerced.null_count - column.null_count} values of column '{col}' "
+                f"could not be converted to {field.type} and were set to null"
+            )
+            table = table.set_column(index, field, coerced)
+        return table.cast(self.arrow_schema)
+
+    def column_errors(self, table: pa.Table) -> dict[str, str]:
+        """
+        Cast each column on its own to report which ones fail and why.
+
+        Args:
+            table (pa.Table): Table with the schema's columns
+
+        Returns:
+            dict[str, str]: Error message per failing column
+        """
+        errors = {}
+        for field in self.arrow_schema:
+            try:
+                table.column(field.name).cast(field.type)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError) as e:
+                errors[field.name] = str(e)
+        return errors
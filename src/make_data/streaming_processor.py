@@ -0,0 +1,270 @@
+import logging
+from typing import Callable, Iterable, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from make_data.data_processor import (
+    IMPUTED_COLUMNS,
+    IQR_FACTOR,
+    N_TAXI_ZONES,
+    DataProcessor,
+    route_keys,
+    save_route_stats_table,
+)
+from project_config import ProjectConfig
+from utils import outlier_imputer
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Columns averaged per route, in the order of the route statistics table
+ROUTE_COLUMNS = ("trip_distance", "duration")
+
+
+class ValueCountSketch:
+    def __init__(self):
+        """
+        Mergeable, exact quantile sketch holding the count of each distinct value.
+        Compact for columns with few distinct values, such as fares in cents or durations in whole minutes.
+        """
+        self.counts = pd.Series(dtype=np.float64)
+
+    def update(self, values: pd.Series):
+        """Add the non-null values of a chunk to the sketch"""
+        self.counts = self.counts.add(values.value_counts(dropna=True), fill_value=0)
+
+    def merge(self, other: "ValueCountSketch"):
+        """Add the counts of another sketch to this one"""
+        self.counts = self.counts.add(other.counts, fill_value=0)
+
+    def quantile(self, q: float) -> float:
+        """
+        Quantile of all values added so far, linearly interpolated like pd.Series.quantile.
+
+        Args:
+            q (float): Quantile in [0, 1]
+        """
+        counts = self.counts.sort_index()
+        if counts.empty:
+            return np.nan
+        values = counts.index.to_numpy(dtype=np.float64)
+        cumulative = np.cumsum(counts.to_numpy())
+
+        position = (cumulative[-1] - 1) * q
+        lower_rank = np.floor(position)
+        lower = values[np.searchsorted(cumulative, lower_rank, side="right")]
+        upper = values[np.searchsorted(cumulative, min(lower_rank + 1, cumulative[-1] - 1), side="right")]
+        # Same interpolation formula as numpy, so results match pd.Series.quantile exactly
+        fraction = position - lower_rank
+        if fraction >= 0.5:
+            return float(upper - (upper - lower) * (1 - fraction))
+        return float(lower + (upper - lower) * fraction)
+
+
+class RouteAggregate:
+    def __init__(self):
+        """Mergeable per-route sums and counts of trip distance and duration, indexed by packed route key"""
+        self.sums = np.zeros((N_TAXI_ZONES * N_TAXI_ZONES, 2))
+        self.counts = np.zeros((N_TAXI_ZONES * N_TAXI_ZONES, 2))
+
+    def update(self, df: pd.DataFrame, columns: Sequence[str] = ROUTE_COLUMNS):
+        """
+        Add a chunk of trips with trip_distance and duration columns
+
+        Args:
+            df (pd.DataFrame): Trips with PULocationID, DOLocationID and the given columns
+            columns (Sequence[str], optional): Columns to add, a subset of ROUTE_COLUMNS. Defaults to both.
+        """
+        route_key = route_keys(df)
+        for col in columns:
+            i = ROUTE_COLUMNS.index(col)
+            values = df[col].to_numpy(dtype=np.float64)
+            present = ~np.isnan(values)
+            self.sums[:, i] += np.bincount(route_key[present], weights=values[present], minlength=len(self.sums))
+            self.counts[:, i] += np.bincount(route_key[present], minlength=len(self.counts))
+
+    def merge(self, other: "RouteAggregate"):
+        """Add the sums and counts of another aggregate to this one"""
+        self.sums += other.sums
+        self.counts += other.counts
+
+    def means(self) -> np.ndarray:
+        """(N_TAXI_ZONES * N_TAXI_ZONES, 2) mean distance and duration per route key, NaN for unseen routes"""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.counts > 0, self.sums / self.counts, np.nan)
+
+
+class RouteDurationCounts:
+    # Packed key route_key * DURATION_KEY_RANGE + duration; datetime64[ns] spans far fewer than 2**32 minutes
+    DURATION_KEY_RANGE = 2**32
+
+    def __init__(self):
+        """
+        Mergeable count of trips per route and whole-minute duration, from which the per-route sums of durations
+        clipped at any threshold can be computed after the pass that finds the threshold
+        """
+        self.sketch = ValueCountSketch()
+
+    def update(self, df: pd.DataFrame):
+        """Add a chunk of trips with a non-negative duration column in whole minutes, as after clean_trips"""
+        durations = df["duration"].to_numpy(dtype=np.float64)
+        present = ~np.isnan(durations)
+        keys = route_keys(df)[present].astype(np.int64) * self.DURATION_KEY_RANGE + durations[present].astype(np.int64)
+        self.sketch.update(pd.Series(keys))
+
+    def clipped_sums(self, upper_threshold: float) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Per route key, the sum of the durations clipped at upper_threshold and the number of durations
+
+        Args:
+            upper_threshold (float): Durations above it count as upper_threshold, as imputed by outlier_imputer
+        """
+        keys = self.sketch.counts.index.to_numpy(dtype=np.int64)
+        counts = self.sketch.counts.to_numpy(dtype=np.float64)
+        route_key, durations = np.divmod(keys, self.DURATION_KEY_RANGE)
+        clipped = np.minimum(durations.astype(np.float64), upper_threshold)
+        n_routes = N_TAXI_ZONES * N_TAXI_ZONES
+        return (
+            np.bincount(route_key, weights=counts * clipped, minlength=n_routes),
+            np.bincount(route_key, weights=counts, minlength=n_routes),
+        )
+
+
+class StreamingDataProcessor:
+    def __init__(
+        self,
+        chunks: Callable[[], Iterable[pd.DataFrame]],
+        config: ProjectConfig,
+        dtype_plan: Optional[dict[str, str]] = None,
+    ):
+        """
+        Class to process raw taxi data too large for memory, one chunk (e.g. one month) at a time.
+        Only one chunk plus the compact global aggregates are held in memory at once.
+
+        The raw chunks are read twice. The first pass computes mergeable partial aggregates: the fare and duration
+        quantiles for outlier imputation and the route means of the imputed data. The second pass applies them
+        chunk by chunk and appends the train/test splits to parquet files.
+        Duplicates are dropped within each chunk; the monthly raw files do not overlap.
+
+        Args:
+            chunks (Callable[[], Iterable[pd.DataFrame]]): Returns a fresh iterator over the raw chunks on each call
+            config (ProjectConfig): ProjectConfig object
+            dtype_plan (dict[str, str], optional): Dtypes of the processed columns. Defaults to the computed dtypes.
+        """
+        self.chunks = chunks
+        self.config = config
+        self.dtype_plan = dtype_plan
+        self.sketches: Optional[dict[str, ValueCountSketch]] = None
+        self.quantiles: Optional[dict[str, tuple[float, float]]] = None
+        self.route_aggregate: Optional[RouteAggregate] = None
+        self.route_stats = None
+
+    def _clean_chunks(self) -> Iterable[DataProcessor]:
+        for chunk in self.chunks():
+            chunk_processor = DataProcessor(chunk, self.config, dtype_plan=self.dtype_plan)
+            chunk_processor.clean_trips()
+            yield chunk_processor
+
+    def _impute_outliers(self, chunk_processor: DataProcessor):
+        chunk_processor.df = outlier_imputer(chunk_processor.df, list(self.quantiles), IQR_FACTOR, self.quantiles)
+
+    def compute_route_stats(self) -> RouteAggregate:
+        """
+        First pass: the global (Q1, Q3) of fare_amount and duration used for outlier imputation, and the per-route
+        sums and counts of trip distance and imputed duration, from a single read of the chunks.
+        The duration threshold is only known once every chunk has been read, so the pass counts the trips
+        per route and duration, which is in whole minutes; the route sums of the clipped durations follow
+        from those counts. Trip distance is not imputed and is summed per route directly.
+        """
+        self.sketches = {col: ValueCountSketch() for col in IMPUTED_COLUMNS}
+        route_durations = RouteDurationCounts()
+        self.route_aggregate = RouteAggregate()
+        for chunk_processor in self._clean_chunks():
+            for col, sketch in self.sketches.items():
+                sketch.update(chunk_processor.df[col])
+            self.route_aggregate.update(chunk_processor.df, columns=["trip_distance"])
+            route_durations.update(chunk_processor.df)
+
+        self.quantiles = {col: (sketch.quantile(0.25), sketch.quantile(0.75)) for col, sketch in self.sketches.items()}
+        logger.info(f"Outlier quartiles: {self.quantiles}")
+        q1, q3 = self.quantiles["duration"]
+        duration_sums, duration_counts = route_durations.clipped_sums(q3 + IQR_FACTOR * (q3 - q1))
+        self.route_aggregate.sums[:, 1] = duration_sums
+        self.route_aggregate.counts[:, 1] = duration_counts
+        self.route_stats = self.route_aggregate.means().reshape(N_TAXI_ZONES, N_TAXI_ZONES, 2).astype(np.float32)
+        return self.route_aggregate
+
+    def process(
+        self, train_file_name: str, test_file_name: str, test_size: float = 0.2, random_state: int = 42
+    ) -> tuple[int, int]:
+        """
+        Process all chunks and write the train and test sets incrementally to local parquet files.
+
+        Args:
+            train_file_name (str): Local path of the train set
+            test_file_name (str): Local path of the test set
+            test_size (float, optional): Size of test set within each chunk. Defaults to 0.2.
+            random_state (int, optional): Random state. Defaults to 42.
+
+        Returns:
+            tuple[int, int]: Number of rows written to the train and test sets
+        """
+        if self.route_aggregate is None:
+            self.compute_route_stats()
+        lookup = self.route_aggregate.means()
+
+        writers: dict[str, pq.ParquetWriter] = {}
+        rows = {train_file_name: 0, test_file_name: 0}
+
+        def write(file_name: str, split: pd.DataFrame):
+            table = pa.Table.from_pandas(split, preserve_index=False)
+            if file_name not in writers:
+                writers[file_name] = pq.ParquetWriter(file_name, table.schema)
+            writers[file_name].write_table(table.cast(writers[file_name].schema))
+            rows[file_name] += len(split)
+
+        # Chunks left with fewer than 2 rows cannot be split, so they are carried into the next chunk
+        leftover = None
+        try:
+            for chunk_processor in self._clean_chunks():
+                self._impute_outliers(chunk_processor)
+                chunk_processor.apply_route_means(lookup)
+                chunk_processor.add_rush_hour()
+                chunk_processor.select_features()
+                if leftover is not None:
+                    chunk_processor.df = pd.concat([leftover, chunk_processor.df], ignore_index=True)
+                    leftover = None
+                if len(chunk_processor.df) < 2:
+                    leftover = chunk_processor.df
+                    continue
+
+                train_set, test_set = chunk_processor.split_data(test_size=test_size, random_state=random_state)
+                write(train_file_name, train_set)
+                write(test_file_name, test_set)
+
+            if leftover is not None and len(leftover) > 0:
+                logger.warning(f"Last {len(leftover)} row(s) could not be split and were added to the train set")
+                write(train_file_name, leftover)
+        finally:
+            for writer in writers.values():
+                writer.close()
+
+        logger.info(f"Wrote {rows[train_file_name]} train rows and {rows[test_file_name]} test rows")
+        return rows[train_file_name], rows[test_file_name]
+
+    def save_route_stats(self, file_name: str):
+        """
+        Save the route statistics table in the same layout as DataProcessor.save_route_stats.
+
+        Args:
+            file_name (str): Name of the file
+
+        Raises:
+            ValueError: If the route statistics have not been computed yet
+        """
+        if self.route_stats is None:
+            raise ValueError("Route statistics are not available. Run process first")
+        save_route_stats_table(file_name, self.route_stats)
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from typing import NamedTuple, Optional, Union
+
+import joblib
+import numpy as np
+import scipy.sparse
+import sklearn
+from sklearn.compose import ColumnTransformer
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Bump when the layout of a cache entry changes
+FEATURE_CACHE_VERSION = 1
+MATRIX_NAMES = ("X_train", "y_train", "X_test", "y_test")
+
+Matrix = Union[np.ndarray, scipy.sparse.spmatrix]
+
+
+class DesignMatrices(NamedTuple):
+    """Fitted preprocessor and the train/test design matrices it produces"""
+
+    preprocessor: ColumnTransformer
+    X_train: Matrix
+    y_train: np.ndarray
+    X_test: Matrix
+    y_test: np.ndarray
+
+
+class FeatureCache:
+    def __init__(self, cache_dir: str, max_bytes: int = 4 * 1024**3, max_age_seconds: float = 7 * 24 * 3600):
+        """
+        On-disk cache of fitted preprocessors and the design matrices they produce, so repeated experiments
+        on the same data and features skip preprocessing. Dense matrices are stored as .npy files and loaded
+        memory-mapped, sparse ones as .npz files. Each entry is a directory named after its key.
+
+        Entries not used for max_age_seconds are evicted, then the least recently used ones
+        until the cache fits in max_bytes.
+
+        Args:
+            cache_dir (str): Directory of the cache
+            max_bytes (int, optional): Maximum total size of the cache. Defaults to 4 GiB.
+            max_age_seconds (float, optional): Maximum time since an entry was last used. Defaults to 7 days.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+
+    @staticmethod
+    def key(data_identity: str, **feature_config) -> str:
+        """
+        Cache key of a dataset and feature configuration
+
+        Args:
+            data_identity (str): Identity of the train and test data, e.g. a fingerprint of their files
+            **feature_config: Everything else that determines the matrices, e.g. features, target and preprocessing
+        """
+        payload = json.dumps(
+            {
+                "version": FEATURE_CACHE_VERSION,
+                "sklearn": sklearn.__version__,
+                "data": data_identity,
+                "features": feature_config,
+            },
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def path(self, key: str) -> str:
+        """Directory of the entry with the given key"""
+        return os.path.join(self.cache_dir, key)
+
+    def load(self, key: str) -> Optional[DesignMatrices]:
+        """
+        Load an entry, with its dense matrices memory-mapped, or None on a cache miss
+
+        Args:
+            key (str): Key of the entry
+        """
+        entry_dir = self.path(key)
+        if not os.path.isdir(entry_dir):
+            logger.info(f"Feature cache miss for {key}")
+            return None
+
+        matrices = {}
+        for name in MATRIX_NAMES:
+            dense_path = os.path.join(entry_dir, f"{name}.npy")
+            if os.path.exists(dense_path):
+                matrices[name] = np.load(dense_path, mmap_mode="r")
+            else:
+                matrices[name] = scipy.sparse.load_npz(os.path.join(entry_dir, f"{name}.npz"))
+        preprocessor = joblib.load(os.path.join(entry_dir, "preprocessor.joblib"))
+        # The directory's modification time records when the entry was last used, for eviction
+        os.utime(entry_dir)
+        logger.info(f"Feature cache hit for {key}")
+        return DesignMatrices(preprocessor=preprocessor, **matrices)
+
+    def store(self, key: str, design_matrices: DesignMatrices):
+        """
+        Store an entry, then evict old and least recently used entries.
+        The entry is written to a temporary directory and renamed, so readers never see a partial entry.
+
+        Args:
+            key (str): Key of the entry
+            design_matrices (DesignMatrices): Fitted preprocessor and matrices to store
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        partial_dir = f"{self.path(key)}.{os.getpid()}.part"
+        os.makedirs(partial_dir, exist_ok=True)
+        for name in MATRIX_NAMES:
+            matrix = getattr(design_matrices, name)
+            if scipy.sparse.issparse(matrix):
+                scipy.sparse.save_npz(os.path.join(partial_dir, f"{name}.npz"), matrix, compressed=False)
+            else:
+                np.save(os.path.join(partial_dir, f"{name}.npy"), np.asarray(matrix))
+        joblib.dump(design_matrices.preprocessor, os.path.join(partial_dir, "preprocessor.joblib"))
+
+        try:
+            os.replace(partial_dir, self.path(key))
+        except OSError:
+            # Another process stored the same entry first
+            shutil.rmtree(partial_dir, ignore_errors=True)
+        logger.info(f"Stored feature cache entry {key}")
+        self.evict()
+
+    def _entries(self) -> list[tuple[str, float, int]]:
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            entry_dir = os.path.join(self.cache_dir, name)
+            if not os.path.isdir(entry_dir) or name.endswith(".part"):
+                continue
+            size = sum(entry.stat().st_size for entry in os.scandir(entry_dir) if entry.is_file())
+            entries.append((entry_dir, os.stat(entry_dir).st_mtime, size))
+        return entries
+
+    def evict(self) -> int:
+        """
+        Remove entries unused for more than max_age_seconds, then least recently used entries beyond max_bytes
+
+        Returns:
+            int: Number of entries removed
+        """
+        if not os.path.isdir(self.cache_dir):
+            return 0
+        now = time.time()
+        entries = sorted(self._entries(), key=lambda entry: entry[1], reverse=True)
+
+        kept_bytes = 0
+        removed = 0
+        for entry_dir, last_used, size in entries:
+            if now - last_used > self.max_age_seconds or kept_bytes + size > self.max_bytes:
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                removed += 1
+            else:
+                kept_bytes += size
+        if removed:
+            logger.info(f"Evicted {removed} feature cache entries, {kept_bytes} bytes kept")
+        return removed
@@ -0,0 +1,110 @@
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Any
+
+import numpy as np
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Bump when the layout of the bundle changes, together with the version the API accepts
+MODEL_BUNDLE_VERSION = 1
+
+
+def _to_json(value: Any) -> Any:
+    """Convert a numpy scalar to the matching Python scalar, leaving other values as they are"""
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def build_model_bundle(pipe: Pipeline, model_name: str, model_version: str, run_id: str) -> dict[str, Any]:
+    """
+    Describe a fitted StandardScaler + OneHotEncoder + linear model pipeline, as trained by ModelTrainer,
+    with plain JSON values: the scaler means and scales, the encoder categories, the coefficients and intercept,
+    the input and output signature and the registered model version. Serving it needs neither sklearn nor mlflow.
+
+    Args:
+        pipe (Pipeline): Fitted sklearn pipeline
+        model_name (str): Name of the registered model
+        model_version (str): Version of the registered model
+        run_id (str): MLflow run the model was logged in
+
+    Raises:
+        ValueError: If the pipeline does not have the supported structure
+    """
+    if len(pipe.steps) != 2 or not isinstance(pipe.steps[0][1], ColumnTransformer):
+        raise ValueError("Expected a (ColumnTransformer, linear model) pipeline")
+    preprocessor, model = pipe.steps[0][1], pipe.steps[1][1]
+    if not hasattr(model, "coef_") or not hasattr(model, "intercept_"):
+        raise ValueError(f"Model {type(model).__name__} is not linear")
+    coef = np.asarray(model.coef_, dtype=np.float64)
+    if coef.ndim > 1 and coef.shape[0] != 1:
+        raise ValueError("Only single-target models are supported")
+
+    transformers = []
+    inputs = []
+    for name, transformer, columns in preprocessor.transformers_:
+        if transformer == "drop":
+            continue
+        if isinstance(transformer, StandardScaler):
+            transformers.append(
+                {
+                    "kind": "standard_scaler",
+                    "features": list(columns),
+                    "mean": (transformer.mean_ if transformer.with_mean else np.zeros(len(columns))).tolist(),
+                    "scale": (transformer.scale_ if transformer.with_std else np.ones(len(columns))).tolist(),
+                }
+            )
+            inputs += [{"name": column, "type": "double"} for column in columns]
+        elif isinstance(transformer, OneHotEncoder):
+            if transformer.handle_unknown != "ignore" or transformer.drop is not None:
+                raise ValueError("Only OneHotEncoder(handle_unknown='ignore') without drop is supported")
+            if getattr(transformer, "infrequent_categories_", None) is not None:
+                raise ValueError("OneHotEncoder with infrequent categories is not supported")
+            transformers.append(
+                {
+                    "kind": "one_hot_encoder",
+                    "features": list(columns),
+                    "categories": [
+                        [_to_json(category) for category in categories] for categories in transformer.categories_
+                    ],
+                }
+            )
+            inputs += [{"name": column, "type": "string"} for column in columns]
+        else:
+            raise ValueError(f"Unsupported transformer {name}: {transformer}")
+
+    return {
+        "format_version": MODEL_BUNDLE_VERSION,
+        "model_name": model_name,
+        "model_version": str(model_version),
+        "run_id": run_id,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "signature": {"inputs": inputs, "outputs": [{"name": "prediction", "type": "double"}]},
+        "preprocessing": transformers,
+        "model": {
+            "type": type(model).__name__,
+            "coef": coef.reshape(-1).tolist(),
+            "intercept": float(np.asarray(model.intercept_, dtype=np.float64).reshape(-1)[0]),
+        },
+    }
+
+
+def save_model_bundle(bundle: dict[str, Any], file_name: str):
+    """
+    Save a bundle as a JSON file. It is written to a temporary file and renamed,
+    so an API polling the file never reads a partial bundle.
+
+    Args:
+        bundle (dict[str, Any]): Bundle built with build_model_bundle
+        file_name (str): Name of the file
+    """
+    partial_file_name = f"{file_name}.{os.getpid()}.part"
+    with open(partial_file_name, "w") as f:
+        json.dump(bundle, f)
+    os.replace(partial_file_name, file_name)
+    logger.info(f"Model bundle (v{MODEL_BUNDLE_VERSION}) of version {bundle['model_version']} saved to {file_name}")
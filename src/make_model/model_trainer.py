@@ -1,15 +1,26 @@
 import logging
+import os
+import tempfile
+import time
+from typing import Iterable, Optional
 
 import mlflow
+import numpy as np
 import pandas as pd
+from joblib import Parallel, delayed
 from mlflow.models import infer_signature
 from mlflow.tracking import MlflowClient
+from sklearn.base import clone
 from sklearn.compose import ColumnTransformer
 from sklearn.linear_model import LinearRegression
 from sklearn.metrics import mean_absolute_error, r2_score, root_mean_squared_error
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import OneHotEncoder, StandardScaler
 
+from make_model.feature_cache import DesignMatrices, FeatureCache
+from make_model.model_bundle import build_model_bundle, save_model_bundle
+from make_model.sufficient_statistics import SufficientStatistics
+from make_model.sweep import SweepCandidate, default_sweep_candidates, fit_candidate, save_matrices
 from project_config import ProjectConfig, Tags
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -17,74 +28,315 @@ logger = logging.getLogger(__name__)
 
 
 class ModelTrainer:
-    def __init__(self, train_set: pd.DataFrame, test_set: pd.DataFrame, config: ProjectConfig, tags: Tags):
+    def __init__(
+        self,
+        train_set: Optional[pd.DataFrame],
+        test_set: pd.DataFrame,
+        config: ProjectConfig,
+        tags: Tags,
+        feature_cache: Optional[FeatureCache] = None,
+        data_identity: Optional[str] = None,
+    ):
         self.config = config
         self.tags = tags.dict()
         self.train_set = train_set
         self.test_set = test_set
         self.artifact_path = "linear-reg-pipe"
+        # The fitted preprocessing is cached only when the identity of the train and test data is known
+        self.feature_cache = feature_cache
+        self.data_identity = data_identity
+        self.feature_cache_status = "disabled"
+        self.preprocessing_seconds = 0.0
+        # Pipeline logged by the last training run, exported as a bundle when it is registered
+        self.pipe = None
 
     def feature_engineering(self):
-        self.train_set["vendor_id"] = self.train_set["vendor_id"].astype(str)
-        self.test_set["vendor_id"] = self.test_set["vendor_id"].astype(str)
+        if self.train_set is not None:
+            self.train_set["vendor_id"] = self.train_set["vendor_id"].astype(str)
+            self.X_train = self.train_set[self.config.num_features + self.config.cat_features]
+            self.y_train = self.train_set[self.config.target]
+            logger.info(f"X_train shape: {self.X_train.shape}")
+            logger.info(f"y_train shape: {self.y_train.shape}")
 
-        self.X_train = self.train_set[self.config.num_features + self.config.cat_features]
-        self.y_train = self.train_set[self.config.target]
+        self.test_set["vendor_id"] = self.test_set["vendor_id"].astype(str)
         self.X_test = self.test_set[self.config.num_features + self.config.cat_features]
         self.y_test = self.test_set[self.config.target]
 
-        logger.info(f"X_train shape: {self.X_train.shape}")
-        logger.info(f"y_train shape: {self.y_train.shape}")
         logger.info(f"X_test shape: {self.X_test.shape}")
         logger.info(f"y_test shape: {self.y_test.shape}")
 
         logger.info("Feature Engineering Done")
 
-    def train(self):
-        preprocessor = ColumnTransformer(
+    def _make_preprocessor(self, num_features: list[str], sparse_threshold: float = 0.3) -> ColumnTransformer:
+        return ColumnTransformer(
             transformers=[
-                ("num", StandardScaler(), self.config.num_features),
+                ("num", StandardScaler(), num_features),
                 ("cat", OneHotEncoder(handle_unknown="ignore"), self.config.cat_features),
-            ]
+            ],
+            sparse_threshold=sparse_threshold,
+        )
+
+    def _design_matrices(
+        self, num_features: list[str], sparse_threshold: float = 0.3
+    ) -> tuple[DesignMatrices, Optional[str]]:
+        """
+        Fit the preprocessing and transform the train and test sets, or load them from the feature cache
+
+        Returns:
+            tuple[DesignMatrices, Optional[str]]: Fitted preprocessor and matrices, and their cache directory if cached
+        """
+        key = None
+        if self.feature_cache is not None and self.data_identity is not None:
+            key = self.feature_cache.key(
+                self.data_identity,
+                num_features=num_features,
+                cat_features=self.config.cat_features,
+                target=self.config.target,
+                sparse_threshold=sparse_threshold,
+            )
+            start = time.perf_counter()
+            design_matrices = self.feature_cache.load(key)
+            if design_matrices is not None:
+                self.feature_cache_status = "hit"
+                self.preprocessing_seconds = time.perf_counter() - start
+                return design_matrices, self.feature_cache.path(key)
+
+        start = time.perf_counter()
+        preprocessor = self._make_preprocessor(num_features, sparse_threshold)
+        design_matrices = DesignMatrices(
+            preprocessor=preprocessor,
+            X_train=preprocessor.fit_transform(self.X_train),
+            y_train=self.y_train.to_numpy(dtype=np.float64),
+            X_test=preprocessor.transform(self.X_test),
+            y_test=self.y_test.to_numpy(dtype=np.float64),
         )
-        pipe = Pipeline(steps=[("preprocessor", preprocessor), ("model", LinearRegression())])
+        self.preprocessing_seconds = time.perf_counter() - start
+        if key is None:
+            return design_matrices, None
+
+        self.feature_cache_status = "miss"
+        self.feature_cache.store(key, design_matrices)
+        cache_path = self.feature_cache.path(key)
+        return design_matrices, cache_path if os.path.isdir(cache_path) else None
+
+    def _log_feature_cache(self):
+        mlflow.log_param("feature_cache", self.feature_cache_status)
+        mlflow.log_metric("preprocessing_seconds", self.preprocessing_seconds)
+
+    def train(self):
         logging.info("Starting MLFlow Run")
         mlflow.set_experiment(self.config.experiment_name)
         with mlflow.start_run(tags=self.tags) as run:
             self.run_id = run.info.run_id
+            design_matrices, _ = self._design_matrices(self.config.num_features)
+            self._log_feature_cache()
             logging.info("Fitting the model")
 
-            pipe.fit(self.X_train, self.y_train)
+            model = LinearRegression().fit(design_matrices.X_train, design_matrices.y_train)
+            pipe = Pipeline(steps=[("preprocessor", design_matrices.preprocessor), ("model", model)])
+            self._evaluate_and_log(
+                pipe,
+                "Linear Regression with preprocessing",
+                self.X_train.head(1),
+                y_pred=model.predict(design_matrices.X_test),
+            )
+
+            mlflow_train_set = mlflow.data.from_pandas(self.train_set)
+            mlflow.log_input(
+                mlflow_train_set, context="training", tags={"name_detail": self.config.processed_dataset_name}
+            )
+
+    def sweep(
+        self, candidates: Optional[list[SweepCandidate]] = None, n_jobs: int = -1, validation_size: float = 0.2
+    ) -> dict[str, dict[str, float]]:
+        """
+        Fit several candidate models in parallel and log each as a nested MLflow run.
+        The preprocessing is fitted once, or loaded from the feature cache; the dense design matrices
+        are memory-mapped by the workers from the cache, or from a temporary directory without one.
+        Candidates are fitted on the train set minus its last validation_size rows and compared on those rows.
+        The candidate with the lowest validation RMSE is refitted on the whole train set, evaluated on the test set
+        and logged as a full pipeline, and becomes the model registered by register_model. The test set plays no
+        part in the selection, so the metrics logged for the registered model are not biased by it.
+
+        Args:
+            candidates (list[SweepCandidate], optional): Candidates to evaluate. Defaults to default_sweep_candidates.
+            n_jobs (int, optional): Number of worker processes, -1 for one per CPU. Defaults to -1.
+            validation_size (float, optional): Share of the train rows held out for validation. Defaults to 0.2.
+
+        Returns:
+            dict[str, dict[str, float]]: Validation metrics of each candidate
+
+        Raises:
+            ValueError: If validation_size leaves no rows to fit or to validate on
+        """
+        candidates = candidates or default_sweep_candidates(self.config.num_features)
+        n_validation = int(len(self.X_train) * validation_size)
+        if not 0 < n_validation < len(self.X_train):
+            raise ValueError(f"validation_size {validation_size} leaves no rows to fit or to validate on")
+        design_matrices, matrix_dir = self._design_matrices(self.config.num_features, sparse_threshold=0)
+        n_num = len(self.config.num_features)
+        n_columns = design_matrices.X_train.shape[1]
+        column_indices = [
+            np.array(
+                [self.config.num_features.index(feature) for feature in candidate.num_features]
+                + list(range(n_num, n_columns))
+            )
+            for candidate in candidates
+        ]
+
+        logging.info(f"Sweeping {len(candidates)} candidates")
+        with tempfile.TemporaryDirectory() as temp_dir:
+            if matrix_dir is None:
+                matrix_dir = temp_dir
+                save_matrices(matrix_dir, X_train=design_matrices.X_train, y_train=design_matrices.y_train)
+            results = Parallel(n_jobs=n_jobs)(
+                delayed(fit_candidate)(candidate, candidate_columns, matrix_dir, n_validation)
+                for candidate, candidate_columns in zip(candidates, column_indices, strict=True)
+            )
+
+        metrics = {
+            candidate.name: candidate_metrics
+            for candidate, (_, candidate_metrics) in zip(candidates, results, strict=True)
+        }
+        best = min(range(len(candidates)), key=lambda i: results[i][1]["validation_rmse"])
+        logger.info(
+            f"Best candidate: {candidates[best].name} with validation RMSE {results[best][1]['validation_rmse']}"
+        )
+
+        logging.info("Starting MLFlow Run")
+        mlflow.set_experiment(self.config.experiment_name)
+        with mlflow.start_run(tags=self.tags):
+            mlflow.log_param("n_candidates", len(candidates))
+            mlflow.log_param("best_candidate", candidates[best].name)
+            mlflow.log_param("validation_size", validation_size)
+            self._log_feature_cache()
+            for i, (candidate, (_, candidate_metrics)) in enumerate(zip(candidates, results, strict=True)):
+                with mlflow.start_run(run_name=candidate.name, nested=True, tags=self.tags) as run:
+                    mlflow.log_params(
+                        {f"model__{key}": value for key, value in candidate.estimator.get_params().items()}
+                    )
+                    mlflow.log_param("num_features", ",".join(candidate.num_features))
+                    mlflow.log_metrics(candidate_metrics)
+                    model_type = type(candidate.estimator).__name__
+                    if i != best:
+                        mlflow.log_param("model_type", model_type)
+                        continue
+
+                    self.run_id = run.info.run_id
+                    if candidate.num_features == self.config.num_features:
+                        best_preprocessor = design_matrices.preprocessor
+                    else:
+                        best_preprocessor = self._make_preprocessor(candidate.num_features, sparse_threshold=0)
+                        best_preprocessor.fit(self.X_train)
+                    X_train = design_matrices.X_train
+                    if len(column_indices[i]) != n_columns:
+                        X_train = X_train[:, column_indices[i]]
+                    estimator = clone(candidate.estimator).fit(X_train, design_matrices.y_train.ravel())
+                    pipe = Pipeline(steps=[("preprocessor", best_preprocessor), ("model", estimator)])
+                    self._evaluate_and_log(pipe, model_type, self.X_train.head(1))
+        return metrics
+
+    def train_streaming(
+        self,
+        train_chunks: Iterable[pd.DataFrame],
+        statistics: Optional[SufficientStatistics] = None,
+        months: Optional[list[str]] = None,
+    ) -> SufficientStatistics:
+        """
+        Fit the same pipeline as train from sufficient statistics accumulated chunk by chunk,
+        so the train set is never held in memory. Given the statistics of a previous run,
+        only the new chunks are read and their statistics are merged in (warm start).
+
+        Args:
+            train_chunks (Iterable[pd.DataFrame]): Chunks of the train set, or of its new months when warm starting.
+                Chunks with year and month columns record the months actually read.
+            statistics (SufficientStatistics, optional): Statistics of a previous run. Defaults to None.
+            months (list[str], optional): Months in train_chunks, recorded so they are never merged twice, when the
+                chunks have no year and month columns. Defaults to None.
+
+        Returns:
+            SufficientStatistics: Statistics of every row the model is fitted on
+
+        Raises:
+            ValueError: If months are already included in the previous statistics
+        """
+        chunk_statistics = SufficientStatistics(self.config.num_features, self.config.cat_features, self.config.target)
+        input_example = self.X_test.head(1)
+        months_read = set()
+        for chunk in train_chunks:
+            if {"year", "month"} <= set(chunk.columns):
+                year_months = chunk[["year", "month"]].drop_duplicates().itertuples(index=False)
+                months_read.update(f"{int(year)}-{int(month):02d}" for year, month in year_months)
+            chunk["vendor_id"] = chunk["vendor_id"].astype(str)
+            chunk_statistics.update(chunk)
+        chunk_statistics.months = sorted(months_read) if months_read else list(months or [])
+        warm_start = statistics is not None
+        if warm_start:
+            statistics.merge(chunk_statistics)
+        else:
+            statistics = chunk_statistics
+        logger.info(f"Fitting on the statistics of {statistics.n_samples} rows ({chunk_statistics.n_samples} new)")
+
+        logging.info("Starting MLFlow Run")
+        mlflow.set_experiment(self.config.experiment_name)
+        with mlflow.start_run(tags=self.tags) as run:
+            self.run_id = run.info.run_id
+            pipe = statistics.to_pipeline()
+            mlflow.log_param("n_train_rows", statistics.n_samples)
+            mlflow.log_param("warm_start", warm_start)
+            self._evaluate_and_log(
+                pipe, "Linear Regression with preprocessing, fitted from sufficient statistics", input_example
+            )
+        return statistics
+
+    def _evaluate_and_log(
+        self, pipe: Pipeline, model_type: str, input_example: pd.DataFrame, y_pred: Optional[np.ndarray] = None
+    ):
+        """
+        Evaluate a fitted pipeline on the test set and log its metrics and the model to the active run.
+        Test set predictions already computed from the cached design matrix can be passed as y_pred.
+        """
+        if y_pred is None:
             logging.info("Running predictions")
             y_pred = pipe.predict(self.X_test)
 
-            rmse = root_mean_squared_error(self.y_test, y_pred)
-            mae = mean_absolute_error(self.y_test, y_pred)
-            r2 = r2_score(self.y_test, y_pred)
+        rmse = root_mean_squared_error(self.y_test, y_pred)
+        mae = mean_absolute_error(self.y_test, y_pred)
+        r2 = r2_score(self.y_test, y_pred)
 
-            logger.info(f"Root Mean Squared Error: {rmse}")
-            logger.info(f"Mean Absolute Error: {mae}")
-            logger.info(f"R2 Score: {r2}")
+        logger.info(f"Root Mean Squared Error: {rmse}")
+        logger.info(f"Mean Absolute Error: {mae}")
+        logger.info(f"R2 Score: {r2}")
 
-            mlflow.log_param("model_type", "Linear Regression with preprocessing")
-            mlflow.log_metric("rmse", rmse)
-            mlflow.log_metric("mae", mae)
-            mlflow.log_metric("r2_score", r2)
-            signature = infer_signature(self.X_train, y_pred)
+        mlflow.log_param("model_type", model_type)
+        mlflow.log_metric("rmse", rmse)
+        mlflow.log_metric("mae", mae)
+        mlflow.log_metric("r2_score", r2)
+        signature = infer_signature(input_example, y_pred)
 
-            mlflow_train_set = mlflow.data.from_pandas(self.train_set)
-            mlflow.log_input(mlflow_train_set, context="training", tags={"name_detail": self.config.train_file_name})
-            mlflow.sklearn.log_model(
-                sk_model=pipe,
-                artifact_path=self.artifact_path,
-                input_example=self.X_train.head(1),
-                signature=signature,
-            )
+        mlflow.sklearn.log_model(
+            sk_model=pipe,
+            artifact_path=self.artifact_path,
+            input_example=input_example,
+            signature=signature,
+        )
+        self.pipe = pipe
+
+    def register_model(self, bundle_file_name: Optional[str] = None) -> Optional[str]:
+        """
+        Register the logged model, point the latest-model alias at it and, if bundle_file_name is given,
+        export it as a model bundle the API loads without mlflow. The bundle is also logged to the run.
+
+        Args:
+            bundle_file_name (str, optional): Name of the bundle file. Defaults to no export.
 
-    def register_model(self):
+        Returns:
+            Optional[str]: Name of the bundle file, or None if no bundle was exported
+        """
+        model_name = f"{self.config.experiment_name}.taxi_fare_model"
         registered_model = mlflow.register_model(
             model_uri=f"runs:/{self.run_id}/{self.artifact_path}",
-            name=f"{self.config.experiment_name}.taxi_fare_model",
+            name=model_name,
             tags=self.tags,
         )
 
@@ -96,3 +348,17 @@ class ModelTrainer:
             alias="latest-model",
             version=latest_version,
         )
+
+        if bundle_file_name is None:
+            return None
+        if self.pipe is None:
+            logger.warning("No pipeline was logged by this trainer. Skipping the model bundle export")
+            return None
+        try:
+            bundle = build_model_bundle(self.pipe, model_name, latest_version, self.run_id)
+        except ValueError as e:
+            logger.warning(f"Model version {latest_version} cannot be exported as a bundle: {str(e)}")
+            return None
+        save_model_bundle(bundle, bundle_file_name)
+        client.log_artifact(self.run_id, bundle_file_name, artifact_path="bundle")
+        return bundle_file_name
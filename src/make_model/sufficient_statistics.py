@@ -0,0 +1,258 @@
+import logging
+from typing import Union
+
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.linear_model import LinearRegression
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Bump when the layout of the saved statistics changes
+STATISTICS_VERSION = 1
+# Relative cutoff below which directions of the centered Gram matrix are treated as collinear,
+# e.g. the one-hot columns of a feature, which always sum to one
+COLLINEARITY_RCOND = 1e-10
+
+
+class SufficientStatistics:
+    def __init__(self, num_features: list[str], cat_features: list[str], target: Union[str, list[str]]):
+        """
+        Mergeable sufficient statistics of a StandardScaler + OneHotEncoder + LinearRegression pipeline:
+        the row count, means and centered co-moments of the numerical features, one-hot columns and targets.
+        They are accumulated chunk by chunk, so the pipeline is fitted without holding the train set in memory,
+        and to_pipeline solves the same least squares problem as fitting the pipeline on all chunks at once.
+
+        Categories get a one-hot column in the order they are first seen; columns of categories a chunk
+        does not contain are zero for that chunk.
+
+        Args:
+            num_features (list[str]): Numerical features, standard scaled
+            cat_features (list[str]): Categorical features, one-hot encoded
+            target (Union[str, list[str]]): Target column, or list of target columns
+        """
+        self.num_features = list(num_features)
+        self.cat_features = list(cat_features)
+        self.target = target
+        self.targets = [target] if isinstance(target, str) else list(target)
+        self.categories: dict[str, list[str]] = {feature: [] for feature in self.cat_features}
+        # Feature and category of each one-hot column, after the numerical features and targets
+        self.one_hot_columns: list[tuple[str, str]] = []
+        self.months: list[str] = []
+
+        self.n_samples = 0
+        self.mean = np.zeros(self._n_dense)
+        self.comoment = np.zeros((self._n_dense, self._n_dense))
+
+    @property
+    def _n_dense(self) -> int:
+        return len(self.num_features) + len(self.targets)
+
+    @property
+    def _n_columns(self) -> int:
+        return self._n_dense + len(self.one_hot_columns)
+
+    def _add_categories(self, feature: str, categories):
+        new_categories = [category for category in categories if category not in self.categories[feature]]
+        if not new_categories:
+            return
+        self.categories[feature].extend(new_categories)
+        self.one_hot_columns.extend((feature, category) for category in new_categories)
+        # Rows seen so far have a zero in the new columns: zero mean and zero co-moments
+        n_new = len(new_categories)
+        self.mean = np.pad(self.mean, (0, n_new))
+        self.comoment = np.pad(self.comoment, ((0, n_new), (0, n_new)))
+
+    def _combine(self, n_samples: int, mean: np.ndarray, comoment: np.ndarray):
+        """Pairwise update of the means and co-moments (Chan et al.), stable for large means"""
+        total = self.n_samples + n_samples
+        delta = mean - self.mean
+        self.comoment += comoment + np.outer(delta, delta) * (self.n_samples * n_samples / total)
+        self.mean += delta * (n_samples / total)
+        self.n_samples = total
+
+    def update(self, df: pd.DataFrame):
+        """
+        Add a chunk of rows to the statistics
+
+        Args:
+            df (pd.DataFrame): Chunk with the features and targets
+
+        Raises:
+            ValueError: If the chunk has missing values
+        """
+        if df.empty:
+            return
+        dense_columns = self.num_features + self.targets
+        if df[dense_columns + self.cat_features].isna().any().any():
+            raise ValueError("Cannot fit on rows with missing values")
+
+        cat_values = {feature: df[feature].astype(str).to_numpy() for feature in self.cat_features}
+        for feature, values in cat_values.items():
+            self._add_categories(feature, pd.unique(values))
+
+        rows = np.zeros((len(df), self._n_columns))
+        rows[:, : self._n_dense] = df[dense_columns].to_numpy(dtype=np.float64)
+        for feature, values in cat_values.items():
+            positions = np.array(
+                [
+                    self._n_dense + self.one_hot_columns.index((feature, category))
+                    for category in self.categories[feature]
+                ]
+            )
+            codes = pd.Categorical(values, categories=self.categories[feature]).codes
+            rows[np.arange(len(df)), positions[codes]] = 1.0
+
+        mean = rows.mean(axis=0)
+        centered = rows - mean
+        self._combine(len(df), mean, centered.T @ centered)
+
+    def merge(self, other: "SufficientStatistics"):
+        """
+        Add the statistics of other rows, e.g. a new month, to these ones
+
+        Args:
+            other (SufficientStatistics): Statistics of the same features and targets
+
+        Raises:
+            ValueError: If the features differ, or both statistics include the same month
+        """
+        if (other.num_features, other.cat_features, other.targets) != (
+            self.num_features,
+            self.cat_features,
+            self.targets,
+        ):
+            raise ValueError("Cannot merge statistics of different features or targets")
+        overlap = sorted(set(self.months) & set(other.months))
+        if overlap:
+            raise ValueError(f"Months {overlap} are already included in the statistics")
+
+        for feature in self.cat_features:
+            self._add_categories(feature, other.categories[feature])
+        if other.n_samples:
+            positions = list(range(self._n_dense)) + [
+                self._n_dense + self.one_hot_columns.index(column) for column in other.one_hot_columns
+            ]
+            mean = np.zeros(self._n_columns)
+            comoment = np.zeros((self._n_columns, self._n_columns))
+            mean[positions] = other.mean
+            comoment[np.ix_(positions, positions)] = other.comoment
+            self._combine(other.n_samples, mean, comoment)
+        self.months.extend(other.months)
+
+    def to_pipeline(self) -> Pipeline:
+        """
+        Solve the normal equations and export the fitted sklearn pipeline, with the same structure, scaler
+        statistics and minimum-norm coefficients as fitting ModelTrainer's pipeline on all rows at once.
+
+        Raises:
+            ValueError: If no rows have been added
+        """
+        if self.n_samples == 0:
+            raise ValueError("Cannot fit a pipeline without rows")
+        n_num = len(self.num_features)
+        target_positions = np.arange(n_num, self._n_dense)
+        # Column order of the pipeline's transformed features: scaled numerical, then sorted categories per feature
+        feature_positions = np.arange(n_num).tolist()
+        for feature in self.cat_features:
+            feature_positions += [
+                self._n_dense + self.one_hot_columns.index((feature, category))
+                for category in sorted(self.categories[feature])
+            ]
+
+        num_mean = self.mean[:n_num]
+        num_var = np.diag(self.comoment)[:n_num] / self.n_samples
+        num_scale = np.sqrt(num_var)
+        num_scale[num_scale < 10 * np.finfo(np.float64).eps] = 1.0  # As StandardScaler does for constant features
+
+        scale = np.ones(len(feature_positions))
+        scale[:n_num] = num_scale
+        xx = self.comoment[np.ix_(feature_positions, feature_positions)] / np.outer(scale, scale)
+        xy = self.comoment[np.ix_(feature_positions, target_positions)] / scale[:, None]
+        coef = np.linalg.pinv(xx, rcond=COLLINEARITY_RCOND, hermitian=True) @ xy
+
+        # Scaled numerical features have zero mean, one-hot columns have the category frequencies as mean
+        feature_mean = np.concatenate([np.zeros(n_num), self.mean[feature_positions[n_num:]]])
+        intercept = self.mean[target_positions] - feature_mean @ coef
+
+        preprocessor = ColumnTransformer(
+            transformers=[
+                ("num", StandardScaler(), self.num_features),
+                ("cat", OneHotEncoder(handle_unknown="ignore"), self.cat_features),
+            ]
+        )
+        # Fitted on one row per category so the encoder learns the categories, then given the real scaler statistics
+        n_prototype_rows = max([len(categories) for categories in self.categories.values()] + [1])
+        prototype = pd.DataFrame({feature: np.zeros(n_prototype_rows) for feature in self.num_features})
+        for feature, categories in self.categories.items():
+            prototype[feature] = [categories[min(i, len(categories) - 1)] for i in range(n_prototype_rows)]
+        preprocessor.fit(prototype)
+        scaler = preprocessor.named_transformers_["num"]
+        scaler.mean_, scaler.var_, scaler.scale_ = num_mean.copy(), num_var, num_scale
+        scaler.n_samples_seen_ = self.n_samples
+
+        model = LinearRegression()
+        model.coef_ = coef.T[0] if isinstance(self.target, str) else coef.T
+        model.intercept_ = intercept[0] if isinstance(self.target, str) else intercept
+        model.n_features_in_ = len(feature_positions)
+        return Pipeline(steps=[("preprocessor", preprocessor), ("model", model)])
+
+    def save(self, file_name: str):
+        """
+        Save the statistics as a .npz file
+
+        Args:
+            file_name (str): Name of the file
+        """
+        with open(file_name, "wb") as f:
+            np.savez(
+                f,
+                version=np.array(STATISTICS_VERSION),
+                num_features=np.array(self.num_features, dtype=str),
+                cat_features=np.array(self.cat_features, dtype=str),
+                targets=np.array(self.targets, dtype=str),
+                single_target=np.array(isinstance(self.target, str)),
+                one_hot_features=np.array([feature for feature, _ in self.one_hot_columns], dtype=str),
+                one_hot_categories=np.array([category for _, category in self.one_hot_columns], dtype=str),
+                months=np.array(self.months, dtype=str),
+                n_samples=np.array(self.n_samples),
+                mean=self.mean,
+                comoment=self.comoment,
+            )
+        logger.info(f"Training statistics (v{STATISTICS_VERSION}) of {self.n_samples} rows saved to {file_name}")
+
+    @classmethod
+    def load(cls, file_name: str) -> "SufficientStatistics":
+        """
+        Load statistics saved with save
+
+        Args:
+            file_name (str): Name of the file
+
+        Raises:
+            ValueError: If the file was saved with another statistics version
+        """
+        with np.load(file_name, allow_pickle=False) as arrays:
+            if int(arrays["version"]) != STATISTICS_VERSION:
+                raise ValueError(
+                    f"Training statistics version {int(arrays['version'])} is not supported, "
+                    f"expected {STATISTICS_VERSION}. Retrain from scratch"
+                )
+            targets = arrays["targets"].tolist()
+            statistics = cls(
+                arrays["num_features"].tolist(),
+                arrays["cat_features"].tolist(),
+                targets[0] if bool(arrays["single_target"]) else targets,
+            )
+            for feature, category in zip(
+                arrays["one_hot_features"].tolist(), arrays["one_hot_categories"].tolist(), strict=True
+            ):
+                statistics._add_categories(feature, [category])
+            statistics.months = arrays["months"].tolist()
+            statistics.n_samples = int(arrays["n_samples"])
+            statistics.mean = arrays["mean"]
+            statistics.comoment = arrays["comoment"]
+        return statistics
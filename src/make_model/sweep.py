@@ -0,0 +1,91 @@
+import os
+import time
+from typing import NamedTuple
+
+import numpy as np
+from sklearn.base import RegressorMixin, clone
+from sklearn.ensemble import HistGradientBoostingRegressor
+from sklearn.linear_model import Lasso, LinearRegression, Ridge
+from sklearn.metrics import mean_absolute_error, r2_score, root_mean_squared_error
+
+
+class SweepCandidate(NamedTuple):
+    """A model to evaluate in a sweep, fitted on the given numerical features and all categorical features"""
+
+    name: str
+    estimator: RegressorMixin
+    num_features: list[str]
+
+
+def default_sweep_candidates(num_features: list[str]) -> list[SweepCandidate]:
+    """
+    Candidates of the default sweep: linear regression, Ridge and Lasso over a few alphas and
+    gradient boosted trees on all features, plus linear regression leaving out one numerical feature at a time.
+
+    Args:
+        num_features (list[str]): All numerical features
+    """
+    candidates = [SweepCandidate("linear_regression", LinearRegression(), num_features)]
+    candidates += [SweepCandidate(f"ridge_alpha_{alpha}", Ridge(alpha=alpha), num_features) for alpha in (0.1, 1, 10)]
+    candidates += [
+        SweepCandidate(f"lasso_alpha_{alpha}", Lasso(alpha=alpha), num_features) for alpha in (0.001, 0.01, 0.1)
+    ]
+    candidates.append(
+        SweepCandidate("hist_gradient_boosting", HistGradientBoostingRegressor(random_state=42), num_features)
+    )
+    candidates += [
+        SweepCandidate(
+            f"linear_regression_without_{feature}",
+            LinearRegression(),
+            [other for other in num_features if other != feature],
+        )
+        for feature in num_features
+    ]
+    return candidates
+
+
+def save_matrices(matrix_dir: str, **matrices: np.ndarray):
+    """Save design matrices as .npy files, for the sweep workers to memory-map instead of receiving copies"""
+    for name, matrix in matrices.items():
+        np.save(os.path.join(matrix_dir, f"{name}.npy"), matrix)
+
+
+def fit_candidate(
+    candidate: SweepCandidate, column_indices: np.ndarray, matrix_dir: str, n_validation: int
+) -> tuple[RegressorMixin, dict[str, float]]:
+    """
+    Fit a candidate on the memory-mapped train matrix, holding out its last n_validation rows, and evaluate it
+    on those rows. The test matrix is never read, so choosing a candidate does not bias its test metrics.
+    Runs in a worker process: the matrices are shared through the OS page cache rather than pickled to each worker,
+    and the held-out rows are a slice, so they are not copied either.
+
+    Args:
+        candidate (SweepCandidate): Candidate to fit
+        column_indices (np.ndarray): Columns of the design matrices holding the candidate's features
+        matrix_dir (str): Directory of the matrices saved with save_matrices
+        n_validation (int): Number of rows at the end of the train matrix held out for validation
+
+    Returns:
+        tuple[RegressorMixin, dict[str, float]]: Estimator fitted on the other rows and its validation metrics
+    """
+    X_train = np.load(os.path.join(matrix_dir, "X_train.npy"), mmap_mode="r")
+    y_train = np.load(os.path.join(matrix_dir, "y_train.npy"), mmap_mode="r").ravel()
+    if len(column_indices) != X_train.shape[1]:
+        # A feature subset needs its own copy of the selected columns
+        X_train = X_train[:, column_indices]
+    n_fit = X_train.shape[0] - n_validation
+
+    estimator = clone(candidate.estimator)
+    start = time.perf_counter()
+    estimator.fit(X_train[:n_fit], y_train[:n_fit])
+    fit_seconds = time.perf_counter() - start
+
+    y_pred = estimator.predict(X_train[n_fit:])
+    y_validation = y_train[n_fit:]
+    metrics = {
+        "validation_rmse": root_mean_squared_error(y_validation, y_pred),
+        "validation_mae": mean_absolute_error(y_validation, y_pred),
+        "validation_r2_score": r2_score(y_validation, y_pred),
+        "fit_seconds": fit_seconds,
+    }
+    return estimator, metrics
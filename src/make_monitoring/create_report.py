@@ -21,8 +21,9 @@ ws = CloudWorkspace(token=os.getenv("EVIDENTLY_API_TOKEN"), url="https://app.evi
 
 project = ws.get_project(os.getenv("EVIDENTLY_PROJECT_ID"))
 
-latest_train_data = gcs.read_one_from_gcs(config.train_file_name)
-latest_test_data = gcs.read_one_from_gcs(config.test_file_name)
+columns = config.num_features + config.cat_features + config.target
+latest_train_data = gcs.read_dataset(config.processed_dataset_name, columns=columns, filters=[("split", "=", "train")])
+latest_test_data = gcs.read_dataset(config.processed_dataset_name, columns=columns, filters=[("split", "=", "test")])
 
 schema = DataDefinition(numerical_columns=config.num_features + config.target, categorical_columns=config.cat_features)
 
@@ -11,13 +11,15 @@ class ProjectConfig(BaseModel):
     taxi_data_months: list[int]
     taxi_type: str
     green_taxi_raw_schema: list[dict]
+    green_taxi_dtype_plan: dict[str, dict[str, str]]
     num_features: list[str]
     cat_features: list[str]
     target: list[str]
-    train_file_name_destination: str
-    test_file_name_destination: str
-    train_file_name: str
-    test_file_name: str
+    processed_dataset_name: str
+    route_stats_file_name_destination: str
+    incremental_state_file_name: str
+    training_statistics_file_name: str
+    model_bundle_file_name: str
     experiment_name: str
 
     @classmethod
@@ -1,11 +1,28 @@
+import logging
+from typing import Optional
+
+import numpy as np
 import pandas as pd
+from pandas.api.types import is_float_dtype, is_integer_dtype
+
+logger = logging.getLogger(__name__)
 
 
-def outlier_imputer(df: pd.DataFrame, column_list: list[str], iqr_factor: int) -> pd.DataFrame:
+def outlier_imputer(
+    df: pd.DataFrame,
+    column_list: list[str],
+    iqr_factor: int,
+    quantiles: Optional[dict[str, tuple[float, float]]] = None,
+) -> pd.DataFrame:
     """
     Impute upper-limit values in specified columns based on their interquartile range.
     The IQR is computed for each column in column_list and values exceeding
     the upper threshold for each column are imputed with the upper threshold value.
+    Negative values are set to 0 before the quartiles are computed.
+
+    Numpy-backed columns are clipped in place with np.clip, so no copy of the frame or of a column is made.
+    Nullable (e.g. Int64, Float64) and other extension columns are clipped with pandas, keeping missing values.
+    An integer column only becomes a float column when a value is clipped to a fractional threshold.
 
     Args:
         df (pd.DataFrame): Dataframe to be cleaned
@@ -13,16 +30,40 @@ def outlier_imputer(df: pd.DataFrame, column_list: list[str], iqr_factor: int) -
         iqr_factor (int): A number representing x in the formula:
                     Q3 + (x * IQR). Used to determine maximum threshold,
                     beyond which a point is considered an outlier.
+        quantiles (dict[str, tuple[float, float]], optional): Precomputed (Q1, Q3) per column,
+                    e.g. from a streaming sketch over data too big to hold in memory.
+                    Defaults to computing them from df.
     """
     for col in column_list:
-        df.loc[df[col] < 0, col] = 0
-
-        q1 = df[col].quantile(0.25)
-        q3 = df[col].quantile(0.75)
-        iqr = q3 - q1
-        upper_threshold = q3 + (iqr_factor * iqr)
-
-        df.loc[df[col] > upper_threshold, col] = upper_threshold
+        column = df[col]
+        if isinstance(column.dtype, np.dtype) and column.dtype.kind in "iuf":
+            values = column.to_numpy()
+            # Copy-on-write frames hand out read-only views: the clipped copy is then assigned back
+            copied = not values.flags.writeable
+            if copied:
+                values = values.copy()
+            np.clip(values, 0, None, out=values)
+            q1, q3 = pd.Series(values, copy=False).quantile([0.25, 0.75]) if quantiles is None else quantiles[col]
+            upper_threshold = q3 + (iqr_factor * (q3 - q1))
+            if values.dtype.kind == "f":
+                np.clip(values, None, upper_threshold, out=values)
+            elif (values > upper_threshold).any():
+                if not float(upper_threshold).is_integer():
+                    # Values clipped to a fractional threshold no longer fit the integer dtype
+                    df[col] = np.minimum(values, upper_threshold)
+                    continue
+                np.clip(values, None, values.dtype.type(upper_threshold), out=values)
+            if copied:
+                df[col] = values
+        else:
+            column = column.clip(lower=0)
+            q1, q3 = column.quantile([0.25, 0.75]) if quantiles is None else quantiles[col]
+            upper_threshold = q3 + (iqr_factor * (q3 - q1))
+            exceeds = (column > upper_threshold).fillna(False)
+            if is_integer_dtype(column.dtype) and not float(upper_threshold).is_integer() and exceeds.any():
+                column = column.astype("Float64")
+            column[exceeds] = upper_threshold
+            df[col] = column
 
     return df
 
@@ -40,3 +81,85 @@ def rush_hourizer(row: pd.Series) -> int:
     if 6 <= hour < 10 or 16 <= hour < 20:
         return int(1)
     return int(0)
+
+
+def vectorized_rush_hourizer(hours: pd.Series) -> pd.Series:
+    """
+    Vectorized counterpart of rush_hourizer, operating on a whole column of hours at once.
+
+    Args:
+        hours (pd.Series): Pickup hours (0-23).
+
+    Returns:
+        pd.Series: 1 where the hour is a rush hour, 0 otherwise.
+    """
+    values = hours.to_numpy()
+    is_rush_hour = ((values >= 6) & (values < 10)) | ((values >= 16) & (values < 20))
+    return pd.Series(is_rush_hour.astype(np.int64), index=hours.index, name=hours.name)
+
+
+def apply_dtype_plan(df: pd.DataFrame, dtype_plan: dict[str, str]) -> pd.DataFrame:
+    """
+    Cast the columns of df to the compact dtypes of a dtype plan, e.g. int16, uint8, float32 or category.
+    Columns missing from df are ignored, columns missing from the plan are left as they are.
+
+    Args:
+        df (pd.DataFrame): Dataframe to cast
+        dtype_plan (dict[str, str]): Target dtype per column
+
+    Raises:
+        ValueError: If a column has missing, out of range or fractional values for an integer target dtype,
+            or values that cannot be cast
+    """
+    for col, dtype in dtype_plan.items():
+        if col not in df.columns or df[col].dtype == dtype:
+            continue
+        if dtype != "category" and is_integer_dtype(np.dtype(dtype)) and len(df):
+            limits = np.iinfo(np.dtype(dtype))
+            if df[col].isna().any() or df[col].min() < limits.min or df[col].max() > limits.max:
+                raise ValueError(f"Column '{col}' has missing or out of range values for dtype {dtype}")
+            if is_float_dtype(df[col].dtype) and (df[col] % 1 != 0).any():
+                raise ValueError(f"Column '{col}' has fractional values that dtype {dtype} would truncate")
+        try:
+            df[col] = df[col].astype(dtype)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Cannot cast column '{col}' to {dtype}") from e
+    return df
+
+
+def concat_frames(frames: list[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Concatenate frames, e.g. monthly chunks read with a dtype plan, keeping their category columns as categories.
+    pd.concat turns a category column into object when the frames have different categories,
+    so each frame's column is first set, in place, to the union of the categories of all frames.
+
+    Args:
+        frames (list[pd.DataFrame]): Frames with the same columns
+    """
+    if not frames:
+        return pd.concat(frames, ignore_index=True)
+    for col in frames[0].columns:
+        if not all(isinstance(frame[col].dtype, pd.CategoricalDtype) for frame in frames):
+            continue
+        categories = frames[0][col].cat.categories
+        for frame in frames[1:]:
+            categories = categories.union(frame[col].cat.categories)
+        for frame in frames:
+            frame[col] = frame[col].cat.set_categories(categories)
+    return pd.concat(frames, ignore_index=True)
+
+
+def memory_report(df: pd.DataFrame, stage: str) -> int:
+    """
+    Log the memory used by a dataframe at a given processing stage.
+
+    Args:
+        df (pd.DataFrame): Dataframe to measure
+        stage (str): Name of the stage, used in the log message
+
+    Returns:
+        int: Memory used in bytes
+    """
+    n_bytes = int(df.memory_usage(deep=True).sum())
+    logger.info(f"[Memory] {stage}: {n_bytes / 1024**2:.1f} MiB for {len(df)} rows x {len(df.columns)} columns")
+    return n_bytes
@@ -1 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.compose import ColumnTransformer
+from sklearn.linear_model import LinearRegression
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
 pytest_plugins = ["pytest_mock"]
+
+
+@pytest.fixture
+def stand_in_pipeline():
+    """A small pipeline with the same shape as the one ModelTrainer registers"""
+    num_features = [
+        "passenger_count",
+        "trip_type",
+        "congestion_surcharge",
+        "mean_distance",
+        "mean_duration",
+        "rush_hour",
+    ]
+    rng = np.random.default_rng(0)
+    train_set = pd.DataFrame(
+        {
+            "passenger_count": rng.integers(1, 4, 50),
+            "trip_type": rng.integers(1, 3, 50),
+            "congestion_surcharge": rng.choice([0.0, 2.75], 50),
+            "mean_distance": rng.uniform(0.5, 10, 50),
+            "mean_duration": rng.uniform(2, 40, 50),
+            "rush_hour": rng.integers(0, 2, 50),
+            "vendor_id": rng.choice(["1", "2"], 50),
+        }
+    )
+    target = 3 + 2.5 * train_set["mean_distance"] + 0.2 * train_set["mean_duration"] + (train_set["vendor_id"] == "2")
+    preprocessor = ColumnTransformer(
+        transformers=[
+            ("num", StandardScaler(), num_features),
+            ("cat", OneHotEncoder(handle_unknown="ignore"), ["vendor_id"]),
+        ]
+    )
+    pipe = Pipeline(steps=[("preprocessor", preprocessor), ("model", LinearRegression())])
+    pipe.fit(train_set, target.to_frame("fare_amount"))
+    return pipe
+
+
+@pytest.fixture
+def raw_months():
+    """Three months of raw trips with outliers, negative values and repeated routes"""
+    rng = np.random.default_rng(7)
+    months = []
+    for month in (1, 2, 3):
+        n_rows = 400
+        pickup = pd.Timestamp(f"2024-{month:02d}-01") + pd.to_timedelta(rng.integers(0, 27 * 24 * 60, n_rows), "min")
+        months.append(
+            pd.DataFrame(
+                {
+                    "VendorID": rng.choice([1, 2], n_rows),
+                    "lpep_pickup_datetime": pickup,
+                    "lpep_dropoff_datetime": pickup + pd.to_timedelta(rng.integers(-5, 200, n_rows), "min"),
+                    "PULocationID": rng.integers(1, 6, n_rows),
+                    "DOLocationID": rng.integers(1, 6, n_rows),
+                    "passenger_count": rng.choice([1.0, 2.0, np.nan], n_rows, p=[0.7, 0.25, 0.05]),
+                    "trip_distance": rng.gamma(1.5, 2.0, n_rows).round(2),
+                    "fare_amount": np.where(rng.random(n_rows) < 0.02, 900.0, rng.normal(15, 8, n_rows).round(2)),
+                }
+            )
+        )
+    yield months
@@ -1,10 +1,38 @@
+import http.client
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import numpy as np
+import pandas as pd
 import pytest
 from fastapi.testclient import TestClient
 
-from make_api.app.main import app
+from make_api.app.main import app, create_model_refresher, load_serving_state, ml_models, prediction_cache
+from make_api.app.route_stats import SUPPORTED_ROUTE_STATS_VERSIONS, RouteStatsLookup
+from make_api.app.serving_model import ServingModel
+from make_data.data_processor import save_route_stats_table
+from make_model.model_bundle import build_model_bundle, save_model_bundle
 
 client = TestClient(app)
 
+SRC_DIR = Path(__file__).resolve().parents[1] / "src"
+# Generous bound for a slow CI machine; loading the bundle itself takes milliseconds
+MAX_COLD_START_SECONDS = 5.0
+
+
+@pytest.fixture(autouse=True)
+def empty_prediction_cache():
+    prediction_cache.clear()
+    yield
+    prediction_cache.clear()
+
 
 @pytest.fixture
 def sample_input():
@@ -19,6 +47,52 @@ def sample_input():
     }
 
 
+@pytest.fixture
+def stand_in_model(stand_in_pipeline):
+    ml_models["latest_model"] = ServingModel.from_pipeline(stand_in_pipeline, "1", source="test", compile=False)
+    yield stand_in_pipeline
+    ml_models.clear()
+
+
+@pytest.fixture
+def compiled_stand_in_model(stand_in_model):
+    ml_models["latest_model"] = ServingModel.from_pipeline(stand_in_model, "1", source="test")
+    yield ml_models["latest_model"].compiled_model
+
+
+@pytest.fixture
+def model_bundle_path(stand_in_pipeline, tmp_path):
+    path = str(tmp_path / "model_bundle.json")
+    save_model_bundle(build_model_bundle(stand_in_pipeline, "taxi_fare_model", 7, "run"), path)
+    yield path
+    ml_models.clear()
+
+
+@pytest.fixture
+def route_stats(tmp_path):
+    table = np.full((266, 266, 2), np.nan, dtype=np.float32)
+    table[1, 3] = [3.2, 7.5]
+    path = tmp_path / "route_stats.npz"
+    save_route_stats_table(str(path), table)
+
+    ml_models["route_stats"] = RouteStatsLookup(str(path))
+    yield ml_models["route_stats"]
+    ml_models.pop("route_stats", None)
+
+
+@pytest.fixture
+def sample_route_input():
+    return {
+        "passenger_count": 2,
+        "trip_type": 1,
+        "congestion_surcharge": 2.5,
+        "PULocationID": 1,
+        "DOLocationID": 3,
+        "rush_hour": 1,
+        "vendor_id": "1",
+    }
+
+
 def test_predict_one(sample_input):
     """Test the predict_one endpoint works"""
 
@@ -47,3 +121,415 @@ def test_predict_missing_input():
     response = client.post("/predict", json=incomplete_input)
 
     assert response.status_code == 422
+
+
+def test_predict_route(stand_in_model, route_stats, sample_route_input):
+    """Test the predict_route endpoint resolves route means from the route statistics table"""
+    response = client.post("/predict/route", json=sample_route_input)
+
+    assert response.status_code == 200
+    json_response = response.json()
+    assert json_response["status"] == "success"
+    assert json_response["prediction_input"]["mean_distance"] == pytest.approx(3.2)
+    assert json_response["prediction_input"]["mean_duration"] == pytest.approx(7.5)
+
+    expected = stand_in_model.predict(pd.DataFrame([json_response["prediction_input"]]))[0]
+    assert json_response["prediction"] == pytest.approx(expected)
+
+
+def test_predict_route_unknown_route(stand_in_model, route_stats, sample_route_input):
+    """Test the predict_route endpoint fails for routes missing from the route statistics table"""
+    sample_route_input["DOLocationID"] = 4
+
+    response = client.post("/predict/route", json=sample_route_input)
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "failure"
+    assert "Unknown route 1 -> 4" in response.json()["message"]
+
+
+def test_route_stats_lookup_out_of_range(route_stats):
+    """Test RouteStatsLookup returns None for zone ids outside the table"""
+    assert route_stats.lookup(1, 3) == pytest.approx((3.2, 7.5))
+    assert route_stats.lookup(1, 266) is None
+    assert route_stats.lookup(-1, 3) is None
+
+
+def test_route_stats_lookup_rejects_other_versions(tmp_path):
+    """Test RouteStatsLookup refuses tables saved with another layout version, or without one"""
+    table = np.zeros((266, 266, 2), dtype=np.float32)
+    other_version = tmp_path / "route_stats_other.npz"
+    with open(other_version, "wb") as f:
+        np.savez(f, version=np.int64(max(SUPPORTED_ROUTE_STATS_VERSIONS) + 1), table=table)
+    unversioned = tmp_path / "route_stats.npy"
+    np.save(unversioned, table)
+
+    with pytest.raises(ValueError, match="is not supported"):
+        RouteStatsLookup(str(other_version))
+    with pytest.raises(ValueError, match="unversioned"):
+        RouteStatsLookup(str(unversioned))
+
+
+def test_route_stats_lookup_memory_maps_the_table(route_stats, tmp_path):
+    """Test the table is memory-mapped from the saved archive, and compressed archives are refused"""
+    assert isinstance(route_stats.table, np.memmap)
+    with np.load(tmp_path / "route_stats.npz") as archive:
+        np.testing.assert_array_equal(route_stats.table, archive["table"])
+
+    compressed = tmp_path / "route_stats_compressed.npz"
+    with open(compressed, "wb") as f:
+        np.savez_compressed(f, version=np.int64(SUPPORTED_ROUTE_STATS_VERSIONS[0]), table=np.asarray(route_stats.table))
+    with pytest.raises(ValueError, match="cannot be memory-mapped"):
+        RouteStatsLookup(str(compressed))
+
+
+def test_predict_batch(stand_in_model, sample_input):
+    """Test the predict_batch endpoint scores every input with one model call"""
+    negative_input = {**sample_input, "mean_distance": -100.0, "mean_duration": -100.0}
+
+    response = client.post("/predict/batch", json=[sample_input, negative_input, sample_input])
+
+    assert response.status_code == 200
+    json_response = response.json()
+    assert [item["status"] for item in json_response] == ["success", "warning", "success"]
+    assert json_response[1]["prediction"] == 0.0
+
+    expected = stand_in_model.predict(pd.DataFrame([sample_input]))[0]
+    assert json_response[0]["prediction"] == pytest.approx(expected)
+    assert json_response[2]["prediction"] == pytest.approx(expected)
+
+
+def test_predict_batch_without_model(sample_input):
+    """Test the predict_batch endpoint reports failure per input when prediction fails"""
+    response = client.post("/predict/batch", json=[sample_input, sample_input])
+
+    assert response.status_code == 200
+    assert [item["status"] for item in response.json()] == ["failure", "failure"]
+
+
+def test_predict_batch_empty():
+    """Test the predict_batch endpoint accepts an empty batch"""
+    response = client.post("/predict/batch", json=[])
+
+    assert response.status_code == 200
+    assert response.json() == []
+
+
+def test_predict_one_compiled(compiled_stand_in_model, stand_in_model, sample_input):
+    """Test the predict_one endpoint serves the compiled model with the pipeline's predictions"""
+    sample_input["vendor_id"] = "2"
+
+    response = client.post("/predict", json=sample_input)
+
+    assert response.json()["status"] == "success"
+    expected = stand_in_model.predict(pd.DataFrame([sample_input]))[0][0]
+    assert response.json()["prediction"] == pytest.approx(expected)
+
+
+def test_predict_batch_compiled(compiled_stand_in_model, stand_in_model, sample_input):
+    """Test the predict_batch endpoint serves the compiled model with the pipeline's predictions"""
+    other_input = {**sample_input, "vendor_id": "1", "mean_distance": 8.0}
+
+    response = client.post("/predict/batch", json=[sample_input, other_input])
+
+    expected = stand_in_model.predict(pd.DataFrame([sample_input, other_input])).ravel()
+    assert [item["prediction"] for item in response.json()] == pytest.approx(expected)
+
+
+def test_stats():
+    """Test the stats endpoint reports the micro-batcher metrics"""
+    response = client.get("/stats")
+
+    assert response.status_code == 200
+    assert response.json()["micro_batcher"]["queue_depth"] == 0
+
+
+def test_load_model_from_bundle(model_bundle_path, sample_input, stand_in_pipeline):
+    """Test the model is served from the bundle, matching the pipeline it was exported from"""
+    create_model_refresher(model_bundle_path).refresh()
+
+    assert ml_models["latest_model"].version == "7"
+    assert ml_models["latest_model"].source == "bundle"
+    response = client.post("/predict", json=sample_input)
+    expected = stand_in_pipeline.predict(pd.DataFrame([sample_input])).ravel()[0]
+    assert response.json()["prediction"] == pytest.approx(expected)
+
+
+def test_load_model_falls_back_to_registry(stand_in_pipeline, tmp_path, mocker):
+    """Test the registry is only used when the bundle is missing"""
+    mock_mlflow = MagicMock()
+    mock_mlflow.MlflowClient.return_value.get_model_version_by_alias.return_value.version = "4"
+    mock_mlflow.sklearn.load_model.return_value = stand_in_pipeline
+    mocker.patch.dict(sys.modules, {"mlflow": mock_mlflow})
+
+    create_model_refresher(str(tmp_path / "missing.json")).refresh()
+
+    mock_mlflow.sklearn.load_model.assert_called_once_with("models:/taxi_fare_prediction.taxi_fare_model/4")
+    assert ml_models["latest_model"].version == "4"
+    assert ml_models["latest_model"].compiled_model is not None
+    ml_models.clear()
+
+
+def test_admin_pin_and_unpin(model_bundle_path, stand_in_pipeline, mocker, monkeypatch):
+    """Test the admin endpoints pin a registry version and go back to the bundle, behind the admin token"""
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    mock_mlflow = MagicMock()
+    mock_mlflow.sklearn.load_model.return_value = stand_in_pipeline
+    mocker.patch.dict(sys.modules, {"mlflow": mock_mlflow})
+    model_refresher = create_model_refresher(model_bundle_path)
+    model_refresher.refresh()
+    ml_models["model_refresher"] = model_refresher
+
+    assert client.post("/admin/model/pin", json={"version": "5"}).status_code == 403
+
+    response = client.post("/admin/model/pin", json={"version": "5"}, headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert response.json()["version"] == "5"
+    assert response.json()["pinned_version"] == "5"
+    mock_mlflow.sklearn.load_model.assert_called_once_with("models:/taxi_fare_prediction.taxi_fare_model/5")
+
+    response = client.post("/admin/model/unpin", headers={"X-Admin-Token": "secret"})
+    assert response.json()["version"] == "7"
+    assert response.json()["source"] == "bundle"
+    assert response.json()["pinned_version"] is None
+
+
+def test_cold_start_from_bundle(model_bundle_path):
+    """Test a fresh interpreter starts the API from the bundle quickly, without importing mlflow or sklearn"""
+    script = """
+import asyncio, json, sys, time
+start = time.perf_counter()
+from make_api.app.main import app, lifespan, ml_models
+
+async def start_app():
+    async with lifespan(app):
+        assert ml_models["latest_model"].compiled_model is not None
+
+asyncio.run(start_app())
+print(json.dumps({
+    "seconds": time.perf_counter() - start,
+    "heavy_modules": sorted(name for name in ("mlflow", "sklearn", "pandas") if name in sys.modules),
+}))
+"""
+    env = {
+        **os.environ,
+        "PYTHONPATH": str(SRC_DIR),
+        "MODEL_BUNDLE_PATH": model_bundle_path,
+        "MODEL_REFRESH_INTERVAL_SECONDS": "0",
+    }
+    env.pop("ROUTE_STATS_PATH", None)
+    result = subprocess.run([sys.executable, "-c", script], env=env, capture_output=True, text=True, check=True)
+    cold_start = json.loads(result.stdout.strip().splitlines()[-1])
+
+    assert cold_start["heavy_modules"] == []
+    assert cold_start["seconds"] < MAX_COLD_START_SECONDS
+
+
+def test_predict_one_cached(compiled_stand_in_model, sample_input, mocker):
+    """Test repeated inputs are served from the prediction cache without calling the model"""
+    first = client.post("/predict", json=sample_input).json()
+    spy = mocker.spy(compiled_stand_in_model, "predict_record")
+
+    second = client.post("/predict", json={**sample_input, "passenger_count": 2.0}).json()
+
+    assert second["prediction"] == first["prediction"]
+    spy.assert_not_called()
+    cache_metrics = client.get("/stats").json()["prediction_cache"]
+    assert cache_metrics["hits"] == 1
+    assert cache_metrics["size"] == 1
+
+
+def test_predict_batch_cached(stand_in_model, sample_input, mocker):
+    """Test a batch only sends the inputs missing from the prediction cache to the model"""
+    other_input = {**sample_input, "mean_distance": 8.0}
+    client.post("/predict/batch", json=[sample_input])
+    spy = mocker.spy(ml_models["latest_model"].pipeline, "predict")
+
+    response = client.post("/predict/batch", json=[sample_input, other_input, sample_input])
+
+    assert spy.call_count == 1
+    assert len(spy.call_args.args[0]) == 1
+    expected = stand_in_model.predict(pd.DataFrame([sample_input, other_input, sample_input])).ravel()
+    assert [item["prediction"] for item in response.json()] == pytest.approx(expected)
+
+
+def test_load_serving_state_reuses_preloaded_model(model_bundle_path, monkeypatch):
+    """Test a worker forked from a preloaded master keeps the master's model instead of loading its own"""
+    monkeypatch.setenv("MODEL_BUNDLE_PATH", model_bundle_path)
+    preloaded = load_serving_state()
+    served = ml_models["latest_model"]
+
+    assert load_serving_state() is preloaded
+    assert ml_models["latest_model"] is served
+    assert preloaded.status()["reloads"] == 1
+
+
+class GunicornServer:
+    def __init__(self, model_bundle_path: str, **env: str):
+        """The production server on a free port, with two workers recycled after every 5 requests"""
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+        self.env = {
+            **os.environ,
+            "PYTHONPATH": str(SRC_DIR / "make_api"),
+            "MODEL_BUNDLE_PATH": model_bundle_path,
+            "MODEL_REFRESH_INTERVAL_SECONDS": "0",
+            "WEB_CONCURRENCY": "2",
+            "GUNICORN_BIND": f"127.0.0.1:{self.port}",
+            "GUNICORN_MAX_REQUESTS": "5",
+            "GUNICORN_MAX_REQUESTS_JITTER": "0",
+            **env,
+        }
+        self.stderr = ""
+
+    def __enter__(self) -> "GunicornServer":
+        self.server = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py"],
+            cwd=SRC_DIR / "make_api",
+            env=self.env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.terminate()
+        _, self.stderr = self.server.communicate(timeout=30)
+
+    def request(self, method: str, path: str, body: str = "") -> str:
+        """
+        Response body of a request on a new connection, retried while the server or a new worker starts,
+        and when a recycled worker closes a connection it accepted but had not started reading
+        """
+        deadline = time.monotonic() + 30
+        while True:
+            connection = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+            try:
+                connection.request(method, path, body, {"Content-Type": "application/json"})
+                return connection.getresponse().read().decode()
+            except (ConnectionRefusedError, ConnectionResetError):
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.2)
+            finally:
+                connection.close()
+
+
+GUNICORN_PREDICT_BODY = json.dumps(
+    {
+        "passenger_count": 1,
+        "trip_type": 1,
+        "congestion_surcharge": 2.75,
+        "mean_distance": 3.0,
+        "mean_duration": 15.0,
+        "rush_hour": 0,
+        "vendor_id": "2",
+    }
+)
+
+
+def test_gunicorn_workers_recycle_gracefully(model_bundle_path):
+    """Test the production server preloads the model, serves from several workers and recycles them without errors"""
+    pytest.importorskip("gunicorn")
+    with GunicornServer(model_bundle_path) as server:
+        statuses = []
+        for _ in range(30):
+            statuses.append(json.loads(server.request("POST", "/predict", GUNICORN_PREDICT_BODY))["status"])
+            # uvicorn checks the request limit every 0.1s
+            time.sleep(0.05)
+
+    assert statuses == ["success"] * 30
+    assert "Model loaded in the master" in server.stderr
+    # Workers exiting after max_requests are replaced by new ones forked from the preloaded master
+    assert server.stderr.count("Booting worker") > 2
+
+
+def test_gunicorn_workers_share_the_pin(model_bundle_path, stand_in_pipeline):
+    """Test a version pinned through one worker is served by every worker, including recycled ones"""
+    pytest.importorskip("gunicorn")
+    with GunicornServer(model_bundle_path, MODEL_REFRESH_INTERVAL_SECONDS="0.1") as server:
+        pin = json.loads(server.request("POST", "/admin/model/pin", json.dumps({"version": "7"})))
+        assert pin["pinned_version"] == "7"
+        # Without the shared pin, the workers that did not serve the pin call would switch to this version
+        save_model_bundle(build_model_bundle(stand_in_pipeline, "taxi_fare_model", 8, "run"), model_bundle_path)
+        time.sleep(0.5)
+
+        statuses = []
+        for _ in range(20):
+            statuses.append(json.loads(server.request("GET", "/admin/model")))
+            time.sleep(0.15)
+
+    assert {(status["version"], status["pinned_version"]) for status in statuses} == {("7", "7")}
+    assert len({status["pid"] for status in statuses}) > 2
+    assert server.stderr.count("Booting worker") > 2
+
+
+def test_gunicorn_metrics_add_up_every_worker(model_bundle_path):
+    """Test successive scrapes, answered by different and recycled workers, count every prediction and never drop"""
+    pytest.importorskip("gunicorn")
+    with GunicornServer(model_bundle_path, METRICS_FLUSH_INTERVAL_SECONDS="0.05") as server:
+        counts = []
+        for _ in range(12):
+            for _ in range(2):
+                server.request("POST", "/predict", GUNICORN_PREDICT_BODY)
+            time.sleep(0.15)
+            metrics = server.request("GET", "/metrics").splitlines()
+            samples = [line for line in metrics if line.startswith('predictions_total{status="success"}')]
+            counts.append(float(samples[0].split()[-1]) if samples else 0.0)
+
+    assert counts == sorted(counts)
+    assert counts[-1] == 24
+    assert server.stderr.count("Booting worker") > 2
+
+
+def test_predict_one_logs_sampled_successes(stand_in_model, sample_input, monkeypatch, caplog):
+    """Test successful predictions are only logged with their inputs for the sampled fraction"""
+    monkeypatch.setattr("make_api.app.main.LOG_SAMPLE_RATE", 0.0)
+    with caplog.at_level(logging.INFO, logger="make_api.app.main"):
+        client.post("/predict", json=sample_input)
+    assert not [record for record in caplog.records if "[Prediction" in record.getMessage()]
+
+    monkeypatch.setattr("make_api.app.main.LOG_SAMPLE_RATE", 1.0)
+    with caplog.at_level(logging.INFO, logger="make_api.app.main"):
+        client.post("/predict", json={**sample_input, "mean_distance": 4.0})
+    (record,) = [record for record in caplog.records if "[Prediction Output]" in record.getMessage()]
+    assert record.fields["model_version"] == "1"
+    assert record.fields["latency_ms"] >= 0
+    assert record.fields["inputs"][0]["mean_distance"] == 4.0
+
+
+def test_predict_failures_log_inputs(sample_input, monkeypatch, caplog):
+    """Test failed predictions are always logged with their inputs, whatever the sampling rate"""
+    monkeypatch.setattr("make_api.app.main.LOG_SAMPLE_RATE", 0.0)
+    ml_models.clear()
+    with caplog.at_level(logging.INFO, logger="make_api.app.main"):
+        client.post("/predict", json=sample_input)
+        client.post("/predict/batch", json=[sample_input, sample_input])
+
+    records = [record for record in caplog.records if record.levelno == logging.ERROR]
+    assert len(records) == 2
+    assert records[0].fields["inputs"] == [sample_input]
+    assert records[1].fields["batch_size"] == 2
+    assert len(records[1].fields["inputs"]) == 2
+
+
+def test_metrics(compiled_stand_in_model, sample_input):
+    """Test /metrics reports stage latencies, predictions by status and the served model version"""
+    client.post("/predict", json=sample_input)
+    client.post("/predict", json={**sample_input, "mean_duration": "slow"})
+
+    lines = client.get("/metrics").text.splitlines()
+
+    for stage in ("parse", "feature_assembly", "model_predict", "serialization"):
+        assert any(
+            line.startswith(f'prediction_stage_duration_seconds_count{{route="/predict",stage="{stage}"}}')
+            for line in lines
+        )
+    assert any(line.startswith('predictions_total{status="success"}') for line in lines)
+    assert any(
+        line.startswith('http_request_duration_seconds_count{method="POST",route="/predict",code="422"}')
+        for line in lines
+    )
+    assert 'model_info{version="1",source="test"} 1' in lines
@@ -0,0 +1,118 @@
+import asyncio
+import threading
+
+import pytest
+
+from make_api.app.batcher import MicroBatcher
+
+
+def test_micro_batcher_batches_concurrent_requests():
+    """Test concurrent submissions are scored together and each caller gets its own prediction"""
+    batch_sizes = []
+    threads = set()
+
+    def predict_fn(items):
+        batch_sizes.append(len(items))
+        threads.add(threading.current_thread().name)
+        return [item * 2.0 for item in items]
+
+    async def run():
+        batcher = MicroBatcher(predict_fn, max_batch_size=8, max_wait_ms=50)
+        await batcher.start()
+        predictions = await asyncio.gather(*(batcher.submit(i) for i in range(20)))
+        metrics = batcher.metrics()
+        await batcher.stop()
+        return predictions, metrics
+
+    predictions, metrics = asyncio.run(run())
+
+    assert predictions == [i * 2.0 for i in range(20)]
+    assert batch_sizes == [8, 8, 4]
+    assert all(name.startswith("micro-batcher") for name in threads)
+    assert metrics["batches"] == 3
+    assert metrics["items"] == 20
+    assert metrics["max_batch_size_seen"] == 8
+    assert metrics["queue_depth"] == 0
+
+
+def test_micro_batcher_propagates_errors():
+    """Test a failing batch raises in every caller and the batcher keeps serving"""
+    calls = []
+
+    def predict_fn(items):
+        calls.append(items)
+        if len(calls) == 1:
+            raise ValueError("model exploded")
+        return [1.0] * len(items)
+
+    async def run():
+        batcher = MicroBatcher(predict_fn, max_batch_size=4, max_wait_ms=10)
+        await batcher.start()
+        results = await asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+        after_failure = await batcher.submit(3)
+        await batcher.stop()
+        return results, after_failure
+
+    results, after_failure = asyncio.run(run())
+
+    assert all(isinstance(result, ValueError) for result in results)
+    assert after_failure == 1.0
+
+
+def test_micro_batcher_not_running():
+    """Test submitting to a batcher that was never started fails"""
+    batcher = MicroBatcher(lambda items: items)
+
+    with pytest.raises(RuntimeError, match="not running"):
+        asyncio.run(batcher.submit(1))
+
+
+def test_micro_batcher_fails_wrong_prediction_count():
+    """Test a predict_fn returning too few predictions fails its callers and the batcher keeps serving"""
+    calls = []
+
+    def predict_fn(items):
+        calls.append(items)
+        return [1.0] * (len(items) - 1 if len(calls) == 1 else len(items))
+
+    async def run():
+        batcher = MicroBatcher(predict_fn, max_batch_size=4, max_wait_ms=10)
+        await batcher.start()
+        results = await asyncio.wait_for(
+            asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True), timeout=5
+        )
+        after_failure = await asyncio.wait_for(batcher.submit(3), timeout=5)
+        await batcher.stop()
+        return results, after_failure
+
+    results, after_failure = asyncio.run(run())
+
+    assert all(isinstance(result, ValueError) for result in results)
+    assert after_failure == 1.0
+
+
+def test_micro_batcher_stop_fails_in_flight_batch():
+    """Test stopping while a batch is being scored fails its callers instead of leaving them waiting"""
+    started = threading.Event()
+    release = threading.Event()
+
+    def predict_fn(items):
+        started.set()
+        release.wait(5)
+        return [1.0] * len(items)
+
+    async def run():
+        batcher = MicroBatcher(predict_fn, max_batch_size=4, max_wait_ms=1)
+        await batcher.start()
+        in_flight = asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+        await asyncio.to_thread(started.wait, 5)
+        stopping = asyncio.create_task(batcher.stop())
+        results = await asyncio.wait_for(in_flight, timeout=5)
+        release.set()
+        await stopping
+        return results
+
+    results = asyncio.run(run())
+
+    assert len(results) == 2
+    assert all(isinstance(result, RuntimeError) for result in results)
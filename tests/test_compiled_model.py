@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import MinMaxScaler
+
+from make_api.app.compiled_model import CompiledLinearModel
+
+
+@pytest.fixture
+def sample_inputs():
+    return pd.DataFrame(
+        {
+            "passenger_count": [1, 2, 5],
+            "trip_type": [1, 2, 1],
+            "congestion_surcharge": [0.0, 2.75, 2.75],
+            "mean_distance": [1.2, 7.5, 20.0],
+            "mean_duration": [5.0, 25.0, 60.0],
+            "rush_hour": [0, 1, 1],
+            "vendor_id": ["1", "2", "unknown"],
+        }
+    )
+
+
+def test_compiled_model_matches_pipeline(stand_in_pipeline, sample_inputs):
+    """Test the compiled model predicts the same as the pipeline for frames, records and single records"""
+    compiled = CompiledLinearModel.from_pipeline(stand_in_pipeline)
+    expected = stand_in_pipeline.predict(sample_inputs).ravel()
+
+    records = [SimpleNamespace(**row) for row in sample_inputs.to_dict(orient="records")]
+
+    np.testing.assert_allclose(compiled.predict(sample_inputs), expected)
+    np.testing.assert_allclose(compiled.predict_records(records), expected)
+    np.testing.assert_allclose([compiled.predict_record(record) for record in records], expected)
+
+
+def test_compiled_model_check_parity(stand_in_pipeline):
+    """Test the parity check passes for a faithful compilation and fails for a wrong one"""
+    compiled = CompiledLinearModel.from_pipeline(stand_in_pipeline)
+    compiled.check_parity(stand_in_pipeline)
+
+    compiled.intercept += 1.0
+    with pytest.raises(ValueError, match="deviates from the pipeline"):
+        compiled.check_parity(stand_in_pipeline)
+
+
+def test_compiled_model_unsupported_pipeline(stand_in_pipeline):
+    """Test compiling a pipeline with an unsupported transformer fails"""
+    pipe = Pipeline(
+        steps=[
+            ("preprocessor", ColumnTransformer(transformers=[("num", MinMaxScaler(), ["mean_distance"])])),
+            ("model", stand_in_pipeline.named_steps["model"]),
+        ]
+    )
+    pipe.named_steps["preprocessor"].fit(pd.DataFrame({"mean_distance": [1.0, 2.0]}))
+
+    with pytest.raises(ValueError, match="Unsupported transformer"):
+        CompiledLinearModel.from_pipeline(pipe)
@@ -2,7 +2,9 @@ import os
 from io import BytesIO
 
 import pandas as pd
+import pyarrow as pa
 import pytest
+import requests
 import requests_mock
 
 from make_data.data_loader import NYCTaxiDataFetcher, ParquetDataSaver
@@ -121,3 +123,75 @@ def test_parquet_data_saver_cleanup(sample_data):
 
     saver.cleanup(file_name)
     assert not os.path.exists(file_name)
+
+
+def test_nyc_taxi_data_fetcher_download_streams_to_disk(requests_mock_fixture, sample_data, tmp_path):
+    """Test the monthly file is streamed to the destination path."""
+    fetcher = NYCTaxiDataFetcher("green")
+    buffer = BytesIO()
+    sample_data.to_parquet(buffer, index=False)
+    requests_mock_fixture.get(fetcher._construct_url(2023, 1), content=buffer.getvalue())
+
+    destination = str(tmp_path / "green.parquet")
+    assert fetcher.download(2023, 1, destination, chunk_size=64) == destination
+    assert pd.read_parquet(destination).equals(sample_data)
+
+
+def test_nyc_taxi_data_fetcher_download_retries(requests_mock_fixture, sample_data, tmp_path):
+    """Test transient server errors are retried until the download succeeds."""
+    fetcher = NYCTaxiDataFetcher("green")
+    buffer = BytesIO()
+    sample_data.to_parquet(buffer, index=False)
+    requests_mock_fixture.get(
+        fetcher._construct_url(2023, 1),
+        [{"status_code": 503}, {"status_code": 502}, {"content": buffer.getvalue()}],
+    )
+
+    destination = str(tmp_path / "green.parquet")
+    fetcher.download(2023, 1, destination, backoff_seconds=0)
+    assert requests_mock_fixture.call_count == 3
+    assert pd.read_parquet(destination).equals(sample_data)
+
+
+def test_nyc_taxi_data_fetcher_download_not_found(requests_mock_fixture, tmp_path):
+    """Test a missing file is not retried and leaves nothing on disk."""
+    fetcher = NYCTaxiDataFetcher("green")
+    requests_mock_fixture.get(fetcher._construct_url(2023, 1), status_code=404)
+
+    with pytest.raises(requests.exceptions.HTTPError):
+        fetcher.download(2023, 1, str(tmp_path / "green.parquet"), backoff_seconds=0)
+    assert requests_mock_fixture.call_count == 1
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_nyc_taxi_data_fetcher_download_os_error(requests_mock_fixture, sample_data, tmp_path, mocker):
+    """Test a local write failure removes the partial file."""
+    fetcher = NYCTaxiDataFetcher("green")
+    buffer = BytesIO()
+    sample_data.to_parquet(buffer, index=False)
+    requests_mock_fixture.get(fetcher._construct_url(2023, 1), content=buffer.getvalue())
+    mocker.patch("make_data.data_loader.os.replace", side_effect=OSError("No space left on device"))
+
+    with pytest.raises(OSError, match="No space left"):
+        fetcher.download(2023, 1, str(tmp_path / "green.parquet"), backoff_seconds=0)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_parquet_data_saver_arrow_table(valid_schema, sample_data, tmp_path):
+    """Test an Arrow table is validated and saved without converting it to pandas."""
+    table = pa.Table.from_pandas(sample_data.astype({"id": "int32", "age": "int16"}), preserve_index=False)
+    saver = ParquetDataSaver(table)
+
+    saver.validate_schema(valid_schema)
+    assert isinstance(saver.data, pa.Table)
+    assert saver.data.schema.field("id").type == pa.int64()
+
+    file_name = str(tmp_path / "test.parquet")
+    saver.save(file_name)
+    assert pd.read_parquet(file_name).equals(sample_data)
+
+
+def test_nyc_taxi_data_fetcher_file_month():
+    assert NYCTaxiDataFetcher.file_month("raw/green_tripdata_2024-11.parquet") == "2024-11"
+    with pytest.raises(ValueError, match="No YYYY-MM month"):
+        NYCTaxiDataFetcher.file_month("green_tripdata.parquet")
@@ -1,9 +1,10 @@
 from unittest.mock import MagicMock
 
+import numpy as np
 import pandas as pd
 import pytest
 
-from make_data.data_processor import DataProcessor
+from make_data.data_processor import N_TAXI_ZONES, ROUTE_STATS_VERSION, DataProcessor
 
 
 @pytest.fixture
@@ -42,6 +43,81 @@ def test_process_data(sample_dataframe, mock_config):
     assert processor.df["duration"].min() >= 0
 
 
+def test_process_data_rush_hour(mock_config):
+    """Test rush_hour is only set on weekday rush hours"""
+    df = pd.DataFrame(
+        {
+            "lpep_pickup_datetime": ["2024-02-08 07:00:00", "2024-02-08 12:00:00", "2024-02-10 07:00:00"],
+            "lpep_dropoff_datetime": ["2024-02-08 07:20:00", "2024-02-08 12:20:00", "2024-02-10 07:20:00"],
+            "fare_amount": [10, 12, 14],
+            "PULocationID": [1, 2, 3],
+            "DOLocationID": [3, 4, 5],
+            "trip_distance": [2.5, 3.5, 4.5],
+            "VendorID": [1, 2, 1],
+        }
+    )
+    mock_config.num_features = ["rush_hour"]
+
+    processor = DataProcessor(df, mock_config)
+    processor.process_data()
+
+    assert processor.df["rush_hour"].tolist() == [1, 0, 0]  # Thursday 7am, Thursday noon, Saturday 7am
+
+
+def test_process_data_route_means(mock_config):
+    """Test mean_distance and mean_duration are averaged per pickup/dropoff route"""
+    df = pd.DataFrame(
+        {
+            "lpep_pickup_datetime": ["2024-02-08 10:00:00"] * 3,
+            "lpep_dropoff_datetime": ["2024-02-08 10:10:00", "2024-02-08 10:20:00", "2024-02-08 10:30:00"],
+            "fare_amount": [10, 12, 14],
+            "PULocationID": [1, 1, 2],
+            "DOLocationID": [3, 3, 3],
+            "trip_distance": [2.0, 4.0, 5.0],
+            "VendorID": [1, 2, 1],
+        }
+    )
+    mock_config.num_features = ["mean_distance", "mean_duration"]
+
+    processor = DataProcessor(df, mock_config)
+    processor.process_data()
+
+    assert processor.df["mean_distance"].tolist() == [3.0, 3.0, 5.0]
+    assert processor.df["mean_duration"].tolist() == [15.0, 15.0, 30.0]
+
+
+def test_save_route_stats(sample_dataframe, mock_config, tmp_path):
+    """Test the route statistics table is saved with the mean distance and duration per route"""
+    processor = DataProcessor(sample_dataframe, mock_config)
+    processor.process_data()
+    file_name = str(tmp_path / "route_stats.npz")
+    processor.save_route_stats(file_name)
+
+    with np.load(file_name) as archive:
+        assert int(archive["version"]) == ROUTE_STATS_VERSION
+        table = archive["table"]
+    assert table.shape == (N_TAXI_ZONES, N_TAXI_ZONES, 2)
+    assert table.dtype == np.float32
+    assert table[1, 3].tolist() == [2.5, 15.0]
+    assert np.isnan(table[3, 1]).all()
+
+
+def test_save_route_stats_before_processing(sample_dataframe, mock_config, tmp_path):
+    """Test saving route statistics fails before process_data is run"""
+    processor = DataProcessor(sample_dataframe, mock_config)
+    with pytest.raises(ValueError, match="Run process_data first"):
+        processor.save_route_stats(str(tmp_path / "route_stats.npz"))
+
+
+def test_process_data_invalid_location_id(sample_dataframe, mock_config):
+    """Test process_data fails on location ids outside the taxi zone range"""
+    sample_dataframe.loc[0, "PULocationID"] = 1000
+
+    processor = DataProcessor(sample_dataframe, mock_config)
+    with pytest.raises(ValueError, match="Location ids must be within"):
+        processor.process_data()
+
+
 def test_split_data(sample_dataframe, mock_config):
     """Test the split_data method"""
 
@@ -52,3 +128,15 @@ def test_split_data(sample_dataframe, mock_config):
     assert len(train) > 0
     assert len(test) > 0
     assert len(train) + len(test) == len(processor.df)
+
+
+def test_process_data_dtype_plan(sample_dataframe, mock_config):
+    """Test process_data casts the processed columns to the dtype plan"""
+    processor = DataProcessor(
+        sample_dataframe, mock_config, dtype_plan={"fare_amount": "float32", "vendor_id": "uint8"}
+    )
+    processor.process_data()
+
+    assert processor.df["fare_amount"].dtype == "float32"
+    assert processor.df["vendor_id"].dtype == "uint8"
+    assert processor.df["trip_distance"].dtype == "float64"
@@ -0,0 +1,59 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import scipy.sparse
+from sklearn.preprocessing import StandardScaler
+
+from make_model.feature_cache import DesignMatrices, FeatureCache
+
+
+def make_design_matrices(n_rows: int = 10, sparse: bool = False) -> DesignMatrices:
+    X = np.arange(n_rows * 2, dtype=np.float64).reshape(n_rows, 2)
+    preprocessor = StandardScaler().fit(pd.DataFrame(X, columns=["a", "b"]))
+    X_train = scipy.sparse.csr_matrix(X) if sparse else X
+    return DesignMatrices(preprocessor, X_train, np.ones((n_rows, 1)), X[:2], np.ones((2, 1)))
+
+
+def test_key_depends_on_data_and_features():
+    """Test the cache key changes with the data identity and every part of the feature config"""
+    key = FeatureCache.key("data", num_features=["a"], cat_features=["c"])
+
+    assert key == FeatureCache.key("data", cat_features=["c"], num_features=["a"])
+    assert key != FeatureCache.key("other data", num_features=["a"], cat_features=["c"])
+    assert key != FeatureCache.key("data", num_features=["a", "b"], cat_features=["c"])
+
+
+def test_store_and_load(tmp_path):
+    """Test a stored entry loads back with memory-mapped dense matrices and sparse matrices as they were"""
+    cache = FeatureCache(str(tmp_path))
+    assert cache.load("dense") is None
+
+    cache.store("dense", make_design_matrices())
+    cache.store("sparse", make_design_matrices(sparse=True))
+    dense, sparse = cache.load("dense"), cache.load("sparse")
+
+    assert isinstance(dense.X_train, np.memmap)
+    np.testing.assert_array_equal(dense.X_train, make_design_matrices().X_train)
+    assert scipy.sparse.issparse(sparse.X_train)
+    np.testing.assert_array_equal(sparse.X_train.toarray(), make_design_matrices().X_train)
+    np.testing.assert_array_equal(dense.preprocessor.mean_, make_design_matrices().preprocessor.mean_)
+
+
+def test_evict_by_age_and_size(tmp_path):
+    """Test entries unused for too long are evicted, then the least recently used beyond the size limit"""
+    cache = FeatureCache(str(tmp_path), max_age_seconds=3600)
+    for key in ("old", "used", "recent"):
+        cache.store(key, make_design_matrices(n_rows=1000))
+    entry_size = sum(entry.stat().st_size for entry in os.scandir(cache.path("recent")))
+    now = time.time()
+    os.utime(cache.path("old"), (now - 7200, now - 7200))
+    os.utime(cache.path("used"), (now - 60, now - 60))
+    os.utime(cache.path("recent"), (now - 30, now - 30))
+    cache.load("used")
+
+    cache.max_bytes = int(entry_size * 1.5)
+    assert cache.evict() == 2
+
+    assert sorted(os.listdir(tmp_path)) == ["used"]
@@ -1,4 +1,6 @@
 import logging
+import os
+from pathlib import Path
 from unittest.mock import MagicMock, patch
 
 import pandas as pd
@@ -40,6 +42,65 @@ def test_gcs_connector_check_file_exists(mocker):
     mock_blob.exists.assert_called_once()
 
 
+def test_gcs_connector_upload_file(mocker):
+    """Test the upload_file method of the GCSConnector class."""
+    mock_client = mocker.patch("google.cloud.storage.Client")
+    mock_blob = mock_client.return_value.bucket.return_value.blob.return_value
+
+    uploader = GCSConnector("test-bucket")
+    uploader.upload_file("local/route_stats.npy", "route_stats.npy")
+
+    mock_client.return_value.bucket.return_value.blob.assert_called_once_with("route_stats.npy")
+    mock_blob.upload_from_filename.assert_called_once_with("local/route_stats.npy")
+
+
+def test_gcs_connector_download_file(mocker):
+    """Test the download_file method of the GCSConnector class."""
+    mock_client = mocker.patch("google.cloud.storage.Client")
+    mock_blob = mock_client.return_value.bucket.return_value.blob.return_value
+
+    connector = GCSConnector("test-bucket")
+    connector.download_file("state.npz", "local/state.npz")
+
+    mock_client.return_value.bucket.return_value.blob.assert_called_once_with("state.npz")
+    mock_blob.download_to_filename.assert_called_once_with("local/state.npz")
+
+
+def test_gcs_connector_delete_file(mocker):
+    """Test the delete_file method of the GCSConnector class only deletes existing files."""
+    mock_client = mocker.patch("google.cloud.storage.Client")
+    mock_blob = mock_client.return_value.bucket.return_value.blob.return_value
+
+    connector = GCSConnector("test-bucket")
+    mock_blob.exists.return_value = False
+    connector.delete_file("bundle.json")
+    mock_blob.delete.assert_not_called()
+
+    mock_blob.exists.return_value = True
+    connector.delete_file("bundle.json")
+    mock_blob.delete.assert_called_once()
+
+
+def test_gcs_connector_datasets(mocker):
+    """Test the dataset methods of the GCSConnector class point to the dataset in the bucket."""
+    mocker.patch("google.cloud.storage.Client")
+    mock_write = mocker.patch("make_data.gcs_connector.write_partitioned_dataset")
+    mock_read = mocker.patch("make_data.gcs_connector.read_partitioned_dataset", return_value=pd.DataFrame())
+    mock_publish = mocker.patch("make_data.gcs_connector.publish_generation")
+    df = pd.DataFrame({"year": [2024], "month": [11]})
+
+    connector = GCSConnector("test-bucket")
+    connector.upload_dataset(df, "processed", "train", generation="rebuild-1")
+    connector.publish_dataset("processed", "rebuild-1")
+    connector.read_dataset("processed", columns=["year"], filters=[("split", "=", "train")])
+
+    mock_write.assert_called_once_with(
+        df, "gs://test-bucket/processed", "train", "part-{i}.parquet", generation="rebuild-1"
+    )
+    mock_publish.assert_called_once_with("gs://test-bucket/processed", "rebuild-1")
+    mock_read.assert_called_once_with("gs://test-bucket/processed", ["year"], [("split", "=", "train")])
+
+
 @patch("make_data.gcs_connector.storage.Client")
 def test_read_many_from_gcs(mock_storage_client):
     """Test the read_many_from_gcs method of the GCSConnector class."""
@@ -60,3 +121,106 @@ def test_read_many_from_gcs(mock_storage_client):
 
     expected_df = pd.DataFrame({"col1": [1, 2, 3, 4]})
     pd.testing.assert_frame_equal(df, expected_df)
+
+
+@patch("make_data.gcs_connector.storage.Client")
+def test_iter_many_from_gcs(mock_storage_client):
+    """Test the iter_many_from_gcs method yields one dataframe per matching blob."""
+    mock_bucket = mock_storage_client.return_value.bucket.return_value
+    mock_blob1 = MagicMock()
+    mock_blob1.name = "green_taxi_data_1.parquet"
+    mock_blob1.download_as_bytes.return_value = pd.DataFrame({"col1": [1, 2]}).to_parquet()
+    mock_blob2 = MagicMock()
+    mock_blob2.name = "yellow_taxi_data_1.parquet"
+
+    mock_bucket.list_blobs.return_value = [mock_blob1, mock_blob2]
+
+    instance = GCSConnector("test-bucket")
+    chunks = list(instance.iter_many_from_gcs(taxi_type="green"))
+
+    assert len(chunks) == 1
+    pd.testing.assert_frame_equal(chunks[0], pd.DataFrame({"col1": [1, 2]}))
+    mock_blob2.download_as_bytes.assert_not_called()
+
+
+class FakeBlob:
+    """Local-filesystem stand-in for a GCS blob"""
+
+    def __init__(self, name: str, df: pd.DataFrame, generation: int = 1):
+        self.name = name
+        self.generation = generation
+        self.md5_hash = f"md5-{name}-{generation}"
+        self.content = df.to_parquet()
+        self.downloads = 0
+
+    def download_to_filename(self, file_name: str):
+        self.downloads += 1
+        with open(file_name, "wb") as f:
+            f.write(self.content)
+
+
+@patch("make_data.gcs_connector.storage.Client")
+def test_read_many_from_gcs_with_cache(mock_storage_client, tmp_path):
+    """Test blobs are downloaded to the cache once and served from it afterwards."""
+    blobs = [FakeBlob(f"green_tripdata_2024-{month:02d}.parquet", pd.DataFrame({"col1": [month]})) for month in (1, 2)]
+    mock_storage_client.return_value.bucket.return_value.list_blobs.side_effect = lambda: list(blobs)
+
+    instance = GCSConnector("test-bucket", cache_dir=str(tmp_path))
+    first = instance.read_many_from_gcs(taxi_type="green")
+    second = instance.read_many_from_gcs(taxi_type="green")
+
+    expected_df = pd.DataFrame({"col1": [1, 2]})
+    pd.testing.assert_frame_equal(first, expected_df)
+    pd.testing.assert_frame_equal(second, expected_df)
+    assert [blob.downloads for blob in blobs] == [1, 1]
+    assert len(list(tmp_path.glob("*.parquet"))) == 2
+
+    blobs[0] = FakeBlob("green_tripdata_2024-01.parquet", pd.DataFrame({"col1": [10]}), generation=2)
+    third = instance.read_many_from_gcs(taxi_type="green")
+    pd.testing.assert_frame_equal(third, pd.DataFrame({"col1": [10, 2]}))
+    assert blobs[0].downloads == 1
+
+
+@patch("make_data.gcs_connector.storage.Client")
+def test_iter_many_from_gcs_with_cache(mock_storage_client, tmp_path):
+    """Test iterating with a cache reads every blob from the cache."""
+    blobs = [FakeBlob(f"green_tripdata_2024-{month:02d}.parquet", pd.DataFrame({"col1": [month]})) for month in (1, 2)]
+    mock_storage_client.return_value.bucket.return_value.list_blobs.side_effect = lambda: list(blobs)
+
+    instance = GCSConnector("test-bucket", cache_dir=str(tmp_path))
+    chunks = list(instance.iter_many_from_gcs(taxi_type="green"))
+    chunks_again = list(instance.iter_many_from_gcs(taxi_type="green"))
+
+    assert [chunk["col1"].tolist() for chunk in chunks] == [[1], [2]]
+    assert [chunk["col1"].tolist() for chunk in chunks_again] == [[1], [2]]
+    assert [blob.downloads for blob in blobs] == [1, 1]
+
+
+@patch("make_data.gcs_connector.storage.Client")
+def test_cache_evicts_old_generations_and_stale_files(mock_storage_client, tmp_path):
+    """Test rewritten blobs do not accumulate in the cache and unused files age out, sparing the ones being read."""
+    blobs = [FakeBlob(f"green_tripdata_2024-{month:02d}.parquet", pd.DataFrame({"col1": [month]})) for month in (1, 2)]
+    mock_storage_client.return_value.bucket.return_value.list_blobs.side_effect = lambda: list(blobs)
+    blob_size = len(blobs[0].content)
+
+    instance = GCSConnector("test-bucket", cache_dir=str(tmp_path), cache_max_bytes=2 * blob_size + 100)
+    instance.read_many_from_gcs(taxi_type="green")
+    first_generation = instance._cache_path(blobs[0])
+    os.utime(first_generation, (0, 0))
+
+    blobs[0] = FakeBlob("green_tripdata_2024-01.parquet", pd.DataFrame({"col1": [10]}), generation=2)
+    df = instance.read_many_from_gcs(taxi_type="green")
+
+    pd.testing.assert_frame_equal(df, pd.DataFrame({"col1": [10, 2]}))
+    assert not os.path.exists(first_generation)
+    assert sorted(tmp_path.iterdir()) == sorted(Path(instance._cache_path(blob)) for blob in blobs)
+
+    stale_part = tmp_path / "interrupted.parquet.123.part"
+    stale_part.write_bytes(b"partial")
+    os.utime(stale_part, (0, 0))
+    instance.cache_max_age_seconds = 3600
+    for blob in blobs:
+        os.utime(instance._cache_path(blob), (0, 0))
+
+    assert instance.evict_cache(keep={instance._cache_path(blobs[1])}) == 2
+    assert list(tmp_path.iterdir()) == [Path(instance._cache_path(blobs[1]))]
@@ -0,0 +1,129 @@
+from unittest.mock import MagicMock
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from make_data.data_processor import PARTITION_COLUMNS, DataProcessor
+from make_data.incremental_processor import IncrementalDataProcessor, IncrementalState
+from make_data.streaming_processor import StreamingDataProcessor
+
+
+@pytest.fixture
+def config():
+    config = MagicMock()
+    config.num_features = ["passenger_count", "mean_distance", "mean_duration", "rush_hour"]
+    config.cat_features = ["vendor_id"]
+    config.target = ["fare_amount"]
+    return config
+
+
+def process_months(processor, months):
+    for i, month in enumerate(months, start=1):
+        processor.process_month(month.copy(), f"2024-{i:02d}")
+
+
+def test_first_month_matches_in_memory_processing(raw_months, config):
+    """Test the first incremental month produces the same rows and route statistics as processing it at once"""
+    in_memory = DataProcessor(raw_months[0].copy(), config)
+    in_memory.process_data()
+
+    incremental = IncrementalDataProcessor(config)
+    train_set, test_set = incremental.process_month(raw_months[0].copy(), "2024-01")
+
+    columns = config.num_features + config.cat_features + config.target + PARTITION_COLUMNS
+    processed = pd.concat([train_set, test_set])
+    pd.testing.assert_frame_equal(
+        processed.sort_values(columns).reset_index(drop=True),
+        in_memory.df.sort_values(columns).reset_index(drop=True),
+        check_dtype=False,
+    )
+    np.testing.assert_allclose(incremental.route_stats, in_memory.route_stats, equal_nan=True)
+
+
+def test_state_accumulates_months(raw_months, config):
+    """Test the state quartiles and route counts after every month match those of a full rebuild"""
+    incremental = IncrementalDataProcessor(config)
+    process_months(incremental, raw_months)
+
+    streaming = StreamingDataProcessor(chunks=lambda: (month.copy() for month in raw_months), config=config)
+    streaming.compute_route_stats()
+
+    assert incremental.state.months == ["2024-01", "2024-02", "2024-03"]
+    assert incremental.state.quantiles() == streaming.quantiles
+    np.testing.assert_array_equal(incremental.state.route_aggregate.counts, streaming.route_aggregate.counts)
+
+
+def test_month_already_processed(raw_months, config):
+    """Test reprocessing a month fails and leaves the state untouched"""
+    incremental = IncrementalDataProcessor(config)
+    process_months(incremental, raw_months[:1])
+    counts = incremental.state.route_aggregate.counts.copy()
+
+    with pytest.raises(ValueError, match="already been processed"):
+        process_months(incremental, raw_months[:1])
+    assert incremental.state.months == ["2024-01"]
+    np.testing.assert_array_equal(incremental.state.route_aggregate.counts, counts)
+
+
+def test_state_save_and_load(raw_months, config, tmp_path):
+    """Test a saved state resumes exactly where it left off"""
+    first = IncrementalDataProcessor(config)
+    process_months(first, raw_months[:2])
+    first.state.save(str(tmp_path / "state.npz"))
+
+    resumed = IncrementalDataProcessor(config, state=IncrementalState.load(str(tmp_path / "state.npz")))
+    assert resumed.state.months == first.state.months
+    assert resumed.state.quantiles() == first.state.quantiles()
+
+    first_train_set, _ = first.process_month(raw_months[2].copy(), "2024-03")
+    resumed_train_set, _ = resumed.process_month(raw_months[2].copy(), "2024-03")
+    pd.testing.assert_frame_equal(first_train_set, resumed_train_set)
+    np.testing.assert_array_equal(resumed.route_stats, first.route_stats)
+
+
+def test_save_route_stats_before_processing(config, tmp_path):
+    """Test saving route statistics fails before a month is processed"""
+    with pytest.raises(ValueError, match="Run process_month first"):
+        IncrementalDataProcessor(config).save_route_stats(str(tmp_path / "route_stats.npz"))
+
+
+def test_state_from_in_memory_rebuild(raw_months, config):
+    """Test a state seeded from a full in-memory rebuild matches the state of processing the months one by one"""
+    incremental = IncrementalDataProcessor(config)
+    process_months(incremental, raw_months)
+
+    in_memory = DataProcessor(pd.concat(raw_months, ignore_index=True), config)
+    in_memory.process_data()
+    state = IncrementalState.from_aggregates(
+        ["2024-03", "2024-01", "2024-02"], in_memory.value_counts, in_memory.route_sums, in_memory.route_counts
+    )
+
+    assert state.months == incremental.state.months
+    assert state.quantiles() == incremental.state.quantiles()
+    np.testing.assert_array_equal(state.route_aggregate.counts, incremental.state.route_aggregate.counts)
+    np.testing.assert_allclose(
+        state.route_aggregate.means().reshape(in_memory.route_stats.shape), in_memory.route_stats, equal_nan=True
+    )
+
+
+def test_state_from_streaming_rebuild_resumes(raw_months, config):
+    """Test the next month after a streaming rebuild merges into the rebuilt aggregates"""
+    streaming = StreamingDataProcessor(chunks=lambda: (month.copy() for month in raw_months[:2]), config=config)
+    streaming.compute_route_stats()
+    state = IncrementalState.from_aggregates(
+        ["2024-01", "2024-02"],
+        {col: sketch.counts for col, sketch in streaming.sketches.items()},
+        streaming.route_aggregate.sums,
+        streaming.route_aggregate.counts,
+    )
+    resumed = IncrementalDataProcessor(config, state=state)
+    with pytest.raises(ValueError, match="already been processed"):
+        resumed.process_month(raw_months[1].copy(), "2024-02")
+    resumed.process_month(raw_months[2].copy(), "2024-03")
+
+    incremental = IncrementalDataProcessor(config)
+    process_months(incremental, raw_months)
+    assert resumed.state.months == incremental.state.months
+    assert resumed.state.quantiles() == incremental.state.quantiles()
+    np.testing.assert_array_equal(resumed.state.route_aggregate.counts, incremental.state.route_aggregate.counts)
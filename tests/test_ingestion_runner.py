@@ -0,0 +1,73 @@
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock
+
+import pandas as pd
+import pytest
+
+from make_data.data_loader import NYCTaxiDataFetcher
+from make_data.ingestion_runner import BatchIngestionRunner
+
+
+@pytest.fixture
+def schema():
+    yield [{"name": "id", "type": "int"}, {"name": "fare", "type": "float"}]
+
+
+@pytest.fixture
+def local_cdn(tmp_path):
+    """A local HTTP server standing in for the NYC taxi data CDN"""
+    served_dir = tmp_path / "served"
+    served_dir.mkdir()
+    for month in (1, 2, 3):
+        pd.DataFrame({"id": [month, month + 10], "fare": [10.0, 20.0]}).to_parquet(
+            served_dir / f"green_tripdata_2024-{month:02d}.parquet", index=False
+        )
+
+    handler = partial(SimpleHTTPRequestHandler, directory=str(served_dir))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+    server.server_close()
+
+
+def test_runner_skips_existing_and_uploads_missing(local_cdn, schema, tmp_path):
+    """Test existing months are never downloaded and missing months are uploaded"""
+    fetcher = NYCTaxiDataFetcher("green", base_url=local_cdn)
+    fetcher.download = MagicMock(wraps=fetcher.download)
+    gcs_connector = MagicMock()
+    gcs_connector.check_file_exists.side_effect = lambda file_name: file_name.endswith("2024-02.parquet")
+    uploaded = {}
+    gcs_connector.upload_file.side_effect = lambda local_path, file_name: uploaded.update(
+        {file_name: pd.read_parquet(local_path)}
+    )
+
+    runner = BatchIngestionRunner(fetcher, gcs_connector, schema, max_workers=3, download_dir=str(tmp_path))
+    statuses = runner.run([(2024, 1), (2024, 2), (2024, 3)])
+
+    assert statuses == {
+        "green_tripdata_2024-01.parquet": "uploaded",
+        "green_tripdata_2024-02.parquet": "skipped",
+        "green_tripdata_2024-03.parquet": "uploaded",
+    }
+    assert sorted(call.args[:2] for call in fetcher.download.call_args_list) == [(2024, 1), (2024, 3)]
+    assert sorted(uploaded) == ["green_tripdata_2024-01.parquet", "green_tripdata_2024-03.parquet"]
+    assert uploaded["green_tripdata_2024-03.parquet"]["id"].tolist() == [3, 13]
+    assert uploaded["green_tripdata_2024-03.parquet"]["fare"].dtype == "float64"
+    assert list(tmp_path.glob("*.parquet")) == []
+
+
+def test_runner_reports_failed_months(local_cdn, schema):
+    """Test a month missing from the server is reported as failed without stopping the others"""
+    fetcher = NYCTaxiDataFetcher("green", base_url=local_cdn)
+    gcs_connector = MagicMock()
+    gcs_connector.check_file_exists.return_value = False
+
+    runner = BatchIngestionRunner(fetcher, gcs_connector, schema, max_workers=2)
+    statuses = runner.run([(2024, 1), (2024, 4)])
+
+    assert statuses == {"green_tripdata_2024-01.parquet": "uploaded", "green_tripdata_2024-04.parquet": "failed"}
+    gcs_connector.upload_file.assert_called_once()
@@ -0,0 +1,131 @@
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from make_api.app.metrics import MetricsRegistry, RequestTimer
+
+
+def test_histogram_renders_cumulative_buckets():
+    """Test a histogram counts each observation in the first bucket whose bound is at least its value"""
+    registry = MetricsRegistry()
+    histogram = registry.histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 5.0):
+        histogram.observe(value, "/predict")
+
+    lines = registry.render().splitlines()
+
+    assert "# TYPE latency_seconds histogram" in lines
+    assert 'latency_seconds_bucket{route="/predict",le="0.1"} 2' in lines
+    assert 'latency_seconds_bucket{route="/predict",le="1.0"} 3' in lines
+    assert 'latency_seconds_bucket{route="/predict",le="+Inf"} 4' in lines
+    assert 'latency_seconds_count{route="/predict"} 4' in lines
+    assert 'latency_seconds_sum{route="/predict"} 5.65' in lines
+
+
+def test_counter_and_gauge():
+    """Test counters add up per label value, gauges keep the last value and label values are escaped"""
+    registry = MetricsRegistry()
+    counter = registry.counter("predictions_total", "Predictions", ("status",))
+    gauge = registry.gauge("model_info", "Model", ("version",))
+    counter.inc("success")
+    counter.inc("success", amount=2)
+    gauge.set(1, 'v"1')
+
+    lines = registry.render().splitlines()
+
+    assert 'predictions_total{status="success"} 3.0' in lines
+    assert 'model_info{version="v\\"1"} 1' in lines
+    with pytest.raises(ValueError):
+        counter.inc("success", "extra")
+    with pytest.raises(ValueError):
+        registry.counter("predictions_total", "Predictions")
+
+
+def test_request_timer_accumulates_stages():
+    """Test a stage marked twice in one request adds up both durations"""
+    timer = RequestTimer("/predict/route")
+    timer.mark("parse")
+    timer.mark("feature_assembly")
+    timer.mark("feature_assembly")
+
+    assert set(timer.stages) == {"parse", "feature_assembly"}
+    assert timer.last - timer.start == pytest.approx(sum(timer.stages.values()))
+
+
+def worker_registry(metrics_dir):
+    """Registry of one gunicorn worker, with the metrics every worker declares"""
+    registry = MetricsRegistry(multiprocess_dir=str(metrics_dir))
+    counter = registry.counter("predictions_total", "Predictions", ("status",))
+    histogram = registry.histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+    gauge = registry.gauge("model_info", "Model", ("version",))
+    return registry, counter, histogram, gauge
+
+
+def sample(rendered: str, name: str) -> float:
+    return next(float(line.split()[-1]) for line in rendered.splitlines() if line.startswith(name))
+
+
+def test_scrapes_add_up_every_worker(tmp_path):
+    """Test scrapes answered by alternating workers report the sum of all workers and never go backwards"""
+    first, first_counter, first_histogram, first_gauge = worker_registry(tmp_path)
+    second, second_counter, second_histogram, second_gauge = worker_registry(tmp_path)
+    first_counter.inc("success", amount=3)
+    first_histogram.observe(0.05, "/predict")
+    first_gauge.set(1, "7")
+    second_counter.inc("success", amount=5)
+    second_histogram.observe(0.5, "/predict")
+    second.write_snapshot()
+
+    first_scrape = first.render()
+    assert sample(first_scrape, 'predictions_total{status="success"}') == 8
+    assert sample(first_scrape, 'latency_seconds_count{route="/predict"}') == 2
+    assert sample(first_scrape, 'latency_seconds_bucket{route="/predict",le="0.1"}') == 1
+    assert sample(first_scrape, 'model_info{version="7"}') == 1
+
+    # The first worker serves more requests after its last snapshot, then the second worker is scraped
+    first_counter.inc("success", amount=10)
+    second_counter.inc("success")
+    second_scrape = second.render()
+    assert sample(second_scrape, 'predictions_total{status="success"}') == 9
+    first.write_snapshot()
+    assert sample(second.render(), 'predictions_total{status="success"}') == 19
+
+
+def test_exited_workers_are_archived(tmp_path):
+    """Test the counts of an exited worker are kept in the archive, and its gauges are dropped"""
+    scraped, counter, _, _ = worker_registry(tmp_path)
+    counter.inc("success")
+
+    def exiting_worker():
+        registry, worker_counter, _, worker_gauge = worker_registry(tmp_path)
+        worker_counter.inc("success", amount=4)
+        worker_gauge.set(1, "6")
+        registry.write_snapshot()
+
+    process = multiprocessing.get_context("fork").Process(target=exiting_worker)
+    process.start()
+    process.join()
+
+    for _ in range(2):
+        rendered = scraped.render()
+        assert sample(rendered, 'predictions_total{status="success"}') == 5
+        assert 'model_info{version="6"}' not in rendered
+    assert sorted(path.name for path in tmp_path.glob("*.json")) == ["archive.json", scraped._file_name]
+
+
+def test_concurrent_snapshots_never_go_backwards(tmp_path):
+    """Test periodic and scrape snapshots written from several threads leave the latest counts readable"""
+    registry, counter, _, _ = worker_registry(tmp_path)
+    reader, _, _, _ = worker_registry(tmp_path)
+
+    def serve_and_snapshot(_):
+        counter.inc("success")
+        registry.write_snapshot()
+        return sample(reader.render(), 'predictions_total{status="success"}')
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        scraped = list(executor.map(serve_and_snapshot, range(200)))
+
+    assert min(scraped) >= 1
+    assert sample(reader.render(), 'predictions_total{status="success"}') == 200
@@ -0,0 +1,54 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import HistGradientBoostingRegressor
+from sklearn.pipeline import Pipeline
+
+from make_api.app.compiled_model import CompiledLinearModel, load_model_bundle
+from make_model.model_bundle import MODEL_BUNDLE_VERSION, build_model_bundle, save_model_bundle
+
+
+@pytest.fixture
+def sample_inputs():
+    return pd.DataFrame(
+        {
+            "passenger_count": [1, 2, 5],
+            "trip_type": [1, 2, 1],
+            "congestion_surcharge": [0.0, 2.75, 2.75],
+            "mean_distance": [1.2, 7.5, 20.0],
+            "mean_duration": [5.0, 25.0, 60.0],
+            "rush_hour": [0, 1, 1],
+            "vendor_id": ["1", "2", "unknown"],
+        }
+    )
+
+
+def test_model_bundle_round_trip(stand_in_pipeline, sample_inputs, tmp_path):
+    """Test a saved bundle compiles to the same predictions as the pipeline and describes its inputs"""
+    bundle_path = str(tmp_path / "bundle.json")
+    save_model_bundle(build_model_bundle(stand_in_pipeline, "taxi_fare_model", 3, "run"), bundle_path)
+
+    bundle = load_model_bundle(bundle_path)
+    compiled = CompiledLinearModel.from_bundle(bundle)
+
+    assert bundle["format_version"] == MODEL_BUNDLE_VERSION
+    assert bundle["model_version"] == "3"
+    assert [item["name"] for item in bundle["signature"]["inputs"]] == list(sample_inputs.columns)
+    np.testing.assert_allclose(compiled.predict(sample_inputs), stand_in_pipeline.predict(sample_inputs).ravel())
+    assert list(tmp_path.iterdir()) == [tmp_path / "bundle.json"]
+
+
+def test_model_bundle_rejects_unsupported(stand_in_pipeline, sample_inputs, tmp_path):
+    """Test non-linear models are not bundled and unknown bundle versions are not loaded"""
+    preprocessor = stand_in_pipeline.steps[0][1]
+    trees = Pipeline([("preprocessor", preprocessor), ("model", HistGradientBoostingRegressor(max_iter=5))])
+    trees.fit(sample_inputs, [10.0, 20.0, 30.0])
+    with pytest.raises(ValueError, match="not linear"):
+        build_model_bundle(trees, "taxi_fare_model", 1, "run")
+
+    bundle_path = tmp_path / "bundle.json"
+    bundle_path.write_text(json.dumps({"format_version": MODEL_BUNDLE_VERSION + 1}))
+    with pytest.raises(ValueError, match="not supported"):
+        load_model_bundle(str(bundle_path))
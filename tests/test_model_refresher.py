@@ -0,0 +1,155 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from make_api.app.model_refresher import ModelRefresher
+from make_api.app.serving_model import BundleSource
+from make_model.model_bundle import build_model_bundle, save_model_bundle
+
+FIELDS = [
+    "passenger_count",
+    "trip_type",
+    "congestion_surcharge",
+    "mean_distance",
+    "mean_duration",
+    "rush_hour",
+    "vendor_id",
+]
+PROBE = SimpleNamespace(
+    passenger_count=1,
+    trip_type=1,
+    congestion_surcharge=2.75,
+    mean_distance=3.0,
+    mean_duration=15.0,
+    rush_hour=0,
+    vendor_id="2",
+)
+
+
+@pytest.fixture
+def export_bundle(stand_in_pipeline, tmp_path):
+    path = str(tmp_path / "model_bundle.json")
+
+    def export(version, intercept_shift=0.0):
+        bundle = build_model_bundle(stand_in_pipeline, "taxi_fare_model", version, "run")
+        bundle["model"]["intercept"] += intercept_shift
+        save_model_bundle(bundle, path)
+        return path
+
+    return export
+
+
+def test_refresh_swaps_new_versions(export_bundle):
+    """Test a new bundle version is swapped in while references to the previous model stay intact"""
+    store = {}
+    refresher = ModelRefresher(store, [BundleSource(export_bundle(1), FIELDS)], PROBE, FIELDS)
+
+    assert refresher.refresh()
+    in_flight = store["latest_model"]
+    assert not refresher.refresh()
+
+    export_bundle(2, intercept_shift=1.0)
+    assert refresher.refresh()
+
+    assert store["latest_model"].version == "2"
+    assert in_flight.version == "1"
+    new_prediction = store["latest_model"].compiled_model.predict_record(PROBE)
+    assert new_prediction == pytest.approx(in_flight.compiled_model.predict_record(PROBE) + 1.0)
+
+
+def test_refresh_keeps_serving_on_invalid_model(export_bundle):
+    """Test a model failing validation in the background is never served and the error is reported"""
+    store = {}
+    refresher = ModelRefresher(store, [BundleSource(export_bundle(1), FIELDS)], PROBE, FIELDS, interval_seconds=0.01)
+    refresher.refresh()
+    export_bundle(2, intercept_shift=float("nan"))
+
+    async def run():
+        await refresher.start()
+        while refresher.status()["failures"] == 0:
+            await asyncio.sleep(0.01)
+        await refresher.stop()
+
+    asyncio.run(asyncio.wait_for(run(), timeout=5))
+
+    assert store["latest_model"].version == "1"
+    assert "validation probe" in refresher.status()["last_error"]
+
+
+def test_pin_stops_following(export_bundle):
+    """Test a pinned version is kept when new versions appear, and unavailable versions cannot be pinned"""
+    store = {}
+    refresher = ModelRefresher(store, [BundleSource(export_bundle(1), FIELDS)], PROBE, FIELDS)
+    refresher.refresh()
+
+    refresher.pin("1")
+    export_bundle(2)
+    assert not refresher.refresh()
+    assert store["latest_model"].version == "1"
+
+    with pytest.raises(ValueError, match="could not be loaded"):
+        refresher.pin("3")
+
+    assert refresher.unpin()
+    assert store["latest_model"].version == "2"
+    assert refresher.status()["pinned_version"] is None
+
+
+def test_pin_is_shared_through_the_pin_file(export_bundle, tmp_path):
+    """Test a pin made in one process is served by the others, including ones started later, until unpinned"""
+    pin_path = str(tmp_path / "model_pin.json")
+    bundle_path = export_bundle(1)
+    pinning, other = (
+        ModelRefresher({}, [BundleSource(bundle_path, FIELDS)], PROBE, FIELDS, pin_path=pin_path) for _ in range(2)
+    )
+    pinning.refresh()
+    other.refresh()
+
+    pinning.pin("1")
+    export_bundle(2)
+    assert not other.refresh()
+    assert other.current.version == "1"
+    assert other.status()["pinned_version"] == "1"
+
+    # A worker replacing a recycled one starts from the preloaded model and keeps the pin
+    replacement_store = {"latest_model": other.current}
+    replacement = ModelRefresher(
+        replacement_store, [BundleSource(bundle_path, FIELDS)], PROBE, FIELDS, pin_path=pin_path
+    )
+    assert not replacement.refresh()
+    assert replacement.current.version == "1"
+
+    assert pinning.unpin()
+    assert other.refresh()
+    assert other.current.version == "2"
+    assert other.status()["pinned_version"] is None
+
+
+def test_corrupt_pin_file_keeps_polling(export_bundle, tmp_path):
+    """Test an unreadable pin file keeps the last pin read and neither stops polling nor fails status"""
+    pin_path = tmp_path / "model_pin.json"
+    store = {}
+    refresher = ModelRefresher(
+        store, [BundleSource(export_bundle(1), FIELDS)], PROBE, FIELDS, interval_seconds=0.01, pin_path=str(pin_path)
+    )
+    refresher.pin("1")
+    pin_path.write_text("{")
+    export_bundle(2)
+
+    async def run():
+        await refresher.start()
+        first_checked = refresher.status()["last_checked"]
+        while refresher.status()["last_checked"] in (None, first_checked):
+            await asyncio.sleep(0.01)
+        assert refresher.running
+        await refresher.stop()
+
+    asyncio.run(asyncio.wait_for(run(), timeout=5))
+
+    assert store["latest_model"].version == "1"
+    assert refresher.status()["pinned_version"] == "1"
+    assert refresher.status()["last_error"] is None
+
+    assert refresher.unpin()
+    assert store["latest_model"].version == "2"
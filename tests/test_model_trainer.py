@@ -1,10 +1,16 @@
 from unittest.mock import MagicMock, patch
 
+import numpy as np
 import pandas as pd
 import pytest
 from mlflow.tracking import MlflowClient
+from sklearn.linear_model import LinearRegression, Ridge
+from sklearn.pipeline import Pipeline
 
+from make_api.app.compiled_model import CompiledLinearModel, load_model_bundle
+from make_model.feature_cache import FeatureCache
 from make_model.model_trainer import ModelTrainer
+from make_model.sweep import SweepCandidate, default_sweep_candidates
 
 
 def create_dummy_data():
@@ -59,3 +65,153 @@ def test_register_model(setup_trainer):
 
         mock_register.assert_called_once()
         mock_alias.assert_called_once()
+
+
+def test_register_model_exports_bundle(sweep_trainer, mocker, tmp_path):
+    """Test registering a trained model exports a bundle that predicts like the logged pipeline"""
+    mock_mlflow = mocker.patch("make_model.model_trainer.mlflow")
+    mock_mlflow.register_model.return_value.version = 2
+    mock_client = mocker.patch("make_model.model_trainer.MlflowClient")
+    trainer = sweep_trainer
+    trainer.train()
+    trainer.run_id = "test_run_id"
+
+    bundle_file_name = trainer.register_model(bundle_file_name=str(tmp_path / "bundle.json"))
+
+    bundle = load_model_bundle(bundle_file_name)
+    assert bundle["model_version"] == "2"
+    assert bundle["run_id"] == "test_run_id"
+    mock_client.return_value.log_artifact.assert_called_once_with(
+        "test_run_id", bundle_file_name, artifact_path="bundle"
+    )
+    np.testing.assert_allclose(
+        CompiledLinearModel.from_bundle(bundle).predict(trainer.X_test), trainer.pipe.predict(trainer.X_test).ravel()
+    )
+
+
+def test_train_streaming(setup_trainer, mocker):
+    """Test streaming training fits on every chunk and merges into previous statistics"""
+    mocker.patch("make_model.model_trainer.mlflow")
+    trainer = setup_trainer
+    trainer.feature_engineering()
+    train_set = trainer.train_set
+
+    statistics = trainer.train_streaming([train_set.iloc[:2].copy()], months=["2024-10"])
+    statistics = trainer.train_streaming([train_set.iloc[2:].copy()], statistics=statistics, months=["2024-11"])
+
+    assert statistics.n_samples == 3
+    assert statistics.months == ["2024-10", "2024-11"]
+    with pytest.raises(ValueError, match="already included"):
+        trainer.train_streaming([train_set.iloc[2:].copy()], statistics=statistics, months=["2024-11"])
+
+
+def test_train_streaming_records_months_read(setup_trainer, mocker):
+    """Test streaming training records the months of the chunks it read when no months are given"""
+    mocker.patch("make_model.model_trainer.mlflow")
+    trainer = setup_trainer
+    trainer.feature_engineering()
+    train_set = trainer.train_set.assign(year=2024, month=[11, 10, 11])
+
+    statistics = trainer.train_streaming([train_set.iloc[:1].copy(), train_set.iloc[1:].copy()])
+
+    assert statistics.months == ["2024-10", "2024-11"]
+
+
+@pytest.fixture
+def sweep_trainer():
+    rng = np.random.default_rng(5)
+    n_rows = 300
+    df = pd.DataFrame(
+        {
+            "vendor_id": rng.choice([1, 2], n_rows),
+            "feature1": rng.normal(10, 3, n_rows),
+            "feature2": rng.normal(0, 1, n_rows),
+        }
+    )
+    df["fare_amount"] = 2 * df["feature1"] + 0.5 * (df["vendor_id"] == 2) + rng.normal(0, 0.1, n_rows)
+    config = MagicMock()
+    config.experiment_name = "test_experiment"
+    config.num_features = ["feature1", "feature2"]
+    config.cat_features = ["vendor_id"]
+    config.target = ["fare_amount"]
+    trainer = ModelTrainer(df.iloc[:240].copy(), df.iloc[240:].copy(), config, MagicMock())
+    trainer.feature_engineering()
+    return trainer
+
+
+def test_sweep(sweep_trainer, mocker):
+    """Test the sweep evaluates every candidate in parallel and logs the best one as a pipeline"""
+    mock_mlflow = mocker.patch("make_model.model_trainer.mlflow")
+    trainer = sweep_trainer
+
+    metrics = trainer.sweep(
+        candidates=[
+            SweepCandidate("linear_regression", LinearRegression(), ["feature1", "feature2"]),
+            SweepCandidate("ridge_alpha_1000", Ridge(alpha=1000), ["feature1", "feature2"]),
+            SweepCandidate("linear_regression_without_feature1", LinearRegression(), ["feature2"]),
+        ],
+        n_jobs=2,
+    )
+
+    assert set(metrics) == {"linear_regression", "ridge_alpha_1000", "linear_regression_without_feature1"}
+    assert min(metrics, key=lambda name: metrics[name]["validation_rmse"]) == "linear_regression"
+    assert (
+        metrics["linear_regression"]["validation_rmse"]
+        < metrics["linear_regression_without_feature1"]["validation_rmse"]
+    )
+    assert mock_mlflow.start_run.call_count == 4
+    assert mock_mlflow.sklearn.log_model.call_count == 1
+
+    best_pipe = mock_mlflow.sklearn.log_model.call_args.kwargs["sk_model"]
+    expected = Pipeline(
+        [("preprocessor", trainer._make_preprocessor(["feature1", "feature2"])), ("model", LinearRegression())]
+    ).fit(trainer.X_train, trainer.y_train)
+    np.testing.assert_allclose(best_pipe.predict(trainer.X_test).ravel(), expected.predict(trainer.X_test).ravel())
+
+
+def test_sweep_selects_without_the_test_set(sweep_trainer, mocker):
+    """Test the candidates are compared on validation rows of the train set, whatever the test set holds"""
+    mocker.patch("make_model.model_trainer.mlflow")
+    trainer = sweep_trainer
+    candidates = [
+        SweepCandidate("linear_regression", LinearRegression(), ["feature1", "feature2"]),
+        SweepCandidate("linear_regression_without_feature1", LinearRegression(), ["feature2"]),
+    ]
+    metrics = trainer.sweep(candidates=candidates, n_jobs=1)
+
+    trainer.y_test = trainer.y_test.sample(frac=1, random_state=0).set_axis(trainer.y_test.index) * -1
+    shuffled_metrics = trainer.sweep(candidates=candidates, n_jobs=1)
+    for name in metrics:
+        for key in ("validation_rmse", "validation_mae", "validation_r2_score"):
+            assert shuffled_metrics[name][key] == metrics[name][key]
+
+    with pytest.raises(ValueError, match="no rows"):
+        trainer.sweep(candidates=candidates, n_jobs=1, validation_size=0)
+
+
+def test_default_sweep_candidates():
+    """Test the default sweep covers regularized, tree and feature subset candidates"""
+    candidates = default_sweep_candidates(["feature1", "feature2"])
+    names = [candidate.name for candidate in candidates]
+
+    assert len(names) == len(set(names))
+    assert "hist_gradient_boosting" in names
+    assert [c.num_features for c in candidates if c.name == "linear_regression_without_feature1"] == [["feature2"]]
+
+
+def test_train_with_feature_cache(sweep_trainer, mocker, tmp_path):
+    """Test a second run on the same data loads the preprocessing from the cache and fits the same model"""
+    mock_mlflow = mocker.patch("make_model.model_trainer.mlflow")
+    trainer = sweep_trainer
+    trainer.feature_cache = FeatureCache(str(tmp_path))
+    trainer.data_identity = "train-and-test-files"
+
+    trainer.train()
+    first_pipe = mock_mlflow.sklearn.log_model.call_args.kwargs["sk_model"]
+    assert trainer.feature_cache_status == "miss"
+
+    trainer.train()
+    second_pipe = mock_mlflow.sklearn.log_model.call_args.kwargs["sk_model"]
+    assert trainer.feature_cache_status == "hit"
+    mock_mlflow.log_param.assert_any_call("feature_cache", "hit")
+    np.testing.assert_array_equal(first_pipe.predict(trainer.X_test), second_pipe.predict(trainer.X_test))
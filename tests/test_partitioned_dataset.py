@@ -0,0 +1,145 @@
+import os
+
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from make_data.partitioned_dataset import (
+    clear_partitioned_dataset,
+    dataset_fingerprint,
+    iter_partitioned_dataset,
+    publish_generation,
+    read_partitioned_dataset,
+    write_partitioned_dataset,
+)
+
+
+@pytest.fixture
+def processed_trips():
+    return pd.DataFrame(
+        {
+            "vendor_id": [1, 2, 1, 2, 2, 1],
+            "fare_amount": [10.0, 12.5, 7.0, 30.0, 18.0, 9.5],
+            "year": [2024, 2024, 2024, 2024, 2024, 2025],
+            "month": [10, 10, 11, 11, 12, 1],
+        }
+    )
+
+
+def test_write_and_read_partitioned_dataset(processed_trips, tmp_path):
+    """Test splits are written as year/month/split partitions and read back with their partition keys"""
+    base_dir = str(tmp_path / "processed")
+    write_partitioned_dataset(processed_trips.iloc[:4], base_dir, "train")
+    write_partitioned_dataset(processed_trips.iloc[4:], base_dir, "test")
+
+    assert os.path.exists(tmp_path / "processed" / "year=2024" / "month=10" / "split=train" / "part-0.parquet")
+    metadata = pq.ParquetFile(tmp_path / "processed" / "year=2024" / "month=11" / "split=train" / "part-0.parquet")
+    assert metadata.schema_arrow.names == ["vendor_id", "fare_amount"]
+    assert metadata.metadata.row_group(0).column(1).statistics.max == 30.0
+
+    df = read_partitioned_dataset(base_dir).sort_values("fare_amount").reset_index(drop=True)
+    assert len(df) == len(processed_trips)
+    assert df["split"].tolist() == ["train", "test", "train", "train", "test", "train"]
+    assert (df["year"].dtype, df["month"].dtype) == ("uint16", "uint8")
+
+
+def test_read_partitioned_dataset_with_columns_and_filters(processed_trips, tmp_path):
+    """Test only the requested columns and the rows matching partition and column filters are read"""
+    base_dir = str(tmp_path / "processed")
+    write_partitioned_dataset(processed_trips, base_dir, "train")
+
+    df = read_partitioned_dataset(
+        base_dir,
+        columns=["fare_amount"],
+        filters=[("year", "=", 2024), ("month", "in", [10, 11]), ("vendor_id", "=", 2)],
+    )
+
+    assert list(df.columns) == ["fare_amount"]
+    assert sorted(df["fare_amount"]) == [12.5, 30.0]
+
+
+def test_iter_partitioned_dataset(processed_trips, tmp_path):
+    """Test iterating a dataset yields batches of at most batch_size matching rows"""
+    base_dir = str(tmp_path / "processed")
+    write_partitioned_dataset(processed_trips, base_dir, "train")
+
+    batches = list(
+        iter_partitioned_dataset(base_dir, columns=["fare_amount"], filters=[("year", "=", 2024)], batch_size=1)
+    )
+
+    assert all(len(batch) == 1 for batch in batches)
+    assert sorted(pd.concat(batches)["fare_amount"]) == [7.0, 10.0, 12.5, 18.0, 30.0]
+
+
+def test_write_partitioned_dataset_from_parquet_file(processed_trips, tmp_path):
+    """Test a local parquet file is streamed into the dataset"""
+    processed_trips.to_parquet(tmp_path / "train.parquet", index=False)
+    base_dir = str(tmp_path / "processed")
+
+    write_partitioned_dataset(str(tmp_path / "train.parquet"), base_dir, "train")
+
+    df = read_partitioned_dataset(base_dir, filters=[("split", "=", "train")])
+    assert sorted(df["fare_amount"]) == sorted(processed_trips["fare_amount"])
+
+
+def test_rewrite_and_clear_partitioned_dataset(processed_trips, tmp_path):
+    """Test rewriting files with the same names replaces them, and clearing removes every file"""
+    base_dir = str(tmp_path / "processed")
+    write_partitioned_dataset(processed_trips, base_dir, "train", basename_template="2024-10-{i}.parquet")
+    write_partitioned_dataset(processed_trips, base_dir, "train", basename_template="2024-10-{i}.parquet")
+    assert len(read_partitioned_dataset(base_dir)) == len(processed_trips)
+
+    write_partitioned_dataset(processed_trips, base_dir, "train", basename_template="2024-11-{i}.parquet")
+    assert len(read_partitioned_dataset(base_dir)) == 2 * len(processed_trips)
+
+    clear_partitioned_dataset(base_dir)
+    assert os.listdir(base_dir) == []
+
+
+def test_publish_generation_switches_readers_at_once(processed_trips, tmp_path):
+    """Test a rebuild is invisible until published, then replaces every old row, and later writes add to it"""
+    base_dir = str(tmp_path / "processed")
+    write_partitioned_dataset(processed_trips, base_dir, "train")
+    write_partitioned_dataset(processed_trips.iloc[:4], base_dir, "test", basename_template="2024-10-{i}.parquet")
+    old_rows = len(processed_trips) + 4
+
+    write_partitioned_dataset(processed_trips, base_dir, "train", generation="rebuild-1")
+    assert len(read_partitioned_dataset(base_dir)) == old_rows
+    write_partitioned_dataset(processed_trips.iloc[:2], base_dir, "test", generation="rebuild-1")
+    assert len(read_partitioned_dataset(base_dir)) == old_rows
+
+    publish_generation(base_dir, "rebuild-1")
+    df = read_partitioned_dataset(base_dir)
+    assert len(df) == len(processed_trips) + 2
+    assert set(df["split"]) == {"train", "test"}
+    assert sorted(os.listdir(base_dir)) == ["_current_generation", "_generations"]
+
+    write_partitioned_dataset(processed_trips, base_dir, "test", basename_template="2024-11-{i}.parquet")
+    assert len(read_partitioned_dataset(base_dir)) == 2 * len(processed_trips) + 2
+
+    write_partitioned_dataset(processed_trips.iloc[:1], base_dir, "train", generation="rebuild-2")
+    publish_generation(base_dir, "rebuild-2")
+    assert len(read_partitioned_dataset(base_dir)) == 1
+    assert os.listdir(os.path.join(base_dir, "_generations")) == ["rebuild-2"]
+    with pytest.raises(ValueError, match="has not been written"):
+        publish_generation(base_dir, "rebuild-3")
+
+
+def test_dataset_fingerprint(processed_trips, tmp_path):
+    """Test the fingerprint only changes when files matching the filter change"""
+    base_dir = str(tmp_path / "processed")
+    write_partitioned_dataset(processed_trips, base_dir, "train")
+    train_fingerprint = dataset_fingerprint(base_dir, [("split", "=", "train")])
+
+    write_partitioned_dataset(processed_trips, base_dir, "test")
+    assert dataset_fingerprint(base_dir, [("split", "=", "train")]) == train_fingerprint
+    assert dataset_fingerprint(base_dir) != train_fingerprint
+
+    write_partitioned_dataset(processed_trips, base_dir, "train", basename_template="2025-01-{i}.parquet")
+    assert dataset_fingerprint(base_dir, [("split", "=", "train")]) != train_fingerprint
+
+
+def test_write_partitioned_dataset_without_partition_columns(processed_trips, tmp_path):
+    """Test writing data without year and month fails"""
+    with pytest.raises(ValueError, match="missing"):
+        write_partitioned_dataset(processed_trips.drop(columns="month"), str(tmp_path / "processed"), "train")
@@ -0,0 +1,59 @@
+from types import SimpleNamespace
+
+from make_api.app.prediction_cache import PredictionCache, canonical_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_canonical_key_normalizes_numbers():
+    """Test inputs the model sees as equal share a key"""
+    fields = ["passenger_count", "mean_distance", "vendor_id"]
+
+    key = canonical_key(SimpleNamespace(passenger_count=2, mean_distance=0.0, vendor_id="1"), fields)
+
+    assert key == canonical_key(SimpleNamespace(passenger_count=2.0, mean_distance=-0.0, vendor_id="1"), fields)
+    assert key != canonical_key(SimpleNamespace(passenger_count=2, mean_distance=0.0, vendor_id="2"), fields)
+
+
+def test_prediction_cache_lru_and_ttl():
+    """Test least recently used entries are evicted and entries expire after the time to live"""
+    clock = FakeClock()
+    cache = PredictionCache(max_size=2, ttl_seconds=10, clock=clock)
+    cache.put("1", "a", 1.0)
+    cache.put("1", "b", 2.0)
+    assert cache.get("1", "a") == 1.0
+
+    cache.put("1", "c", 3.0)
+    assert cache.get("1", "b") is None
+    assert cache.get("1", "a") == 1.0
+
+    clock.now = 10.0
+    assert cache.get("1", "c") is None
+
+    metrics = cache.metrics()
+    assert metrics["hits"] == 2
+    assert metrics["misses"] == 2
+    assert metrics["hit_rate"] == 0.5
+    assert metrics["evictions"] == 1
+    assert metrics["expirations"] == 1
+    assert metrics["size"] == 1
+
+
+def test_prediction_cache_invalidated_by_new_version():
+    """Test a new model version never gets predictions of the previous one, and a zero size disables caching"""
+    cache = PredictionCache()
+    cache.put("1", "a", 1.0)
+
+    assert cache.get("2", "a") is None
+    assert cache.metrics()["invalidations"] == 1
+    assert cache.metrics()["size"] == 0
+
+    disabled = PredictionCache(max_size=0)
+    disabled.put("1", "a", 1.0)
+    assert disabled.get("1", "a") is None
@@ -17,16 +17,22 @@ def valid_yaml_config():
     green_taxi_raw_schema:
       - name: "VendorId"
         type: "int"
+    green_taxi_dtype_plan:
+      raw:
+        VendorId: "uint8"
+      processed:
+        vendor_id: "uint8"
     num_features:
       - col1
       - col2
     cat_features: [vendor_id]
     target:
       - fare_amount
-    train_file_name_destination: "train/"
-    test_file_name_destination: "test/"
-    train_file_name: "train.csv"
-    test_file_name: "test.csv"
+    processed_dataset_name: "processed"
+    route_stats_file_name_destination: "route_stats/"
+    incremental_state_file_name: "incremental_state.npz"
+    training_statistics_file_name: "training_statistics.npz"
+    model_bundle_file_name: "model_bundle.json"
     experiment_name: "my-experiment"
     """
 
@@ -63,11 +69,15 @@ def test_project_config_from_valid_yaml(valid_yaml_config):
     assert config.taxi_data_months == [1, 2, 3]
     assert config.taxi_type == "yellow"
     assert config.green_taxi_raw_schema == [{"name": "VendorId", "type": "int"}]
+    assert config.green_taxi_dtype_plan == {"raw": {"VendorId": "uint8"}, "processed": {"vendor_id": "uint8"}}
     assert config.num_features == ["col1", "col2"]
     assert config.cat_features == ["vendor_id"]
     assert config.target == ["fare_amount"]
-    assert config.train_file_name == "train.csv"
-    assert config.test_file_name == "test.csv"
+    assert config.route_stats_file_name_destination == "route_stats/"
+    assert config.incremental_state_file_name == "incremental_state.npz"
+    assert config.training_statistics_file_name == "training_statistics.npz"
+    assert config.model_bundle_file_name == "model_bundle.json"
+    assert config.processed_dataset_name == "processed"
     assert config.experiment_name == "my-experiment"
 
 
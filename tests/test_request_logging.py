@@ -0,0 +1,43 @@
+import io
+import json
+import logging
+
+from make_api.app.request_logging import JsonFormatter, sampled, start_queue_logging, stop_queue_logging
+
+
+def test_json_formatter_includes_fields():
+    """Test a record is formatted as one JSON object with its structured fields"""
+    record = logging.LogRecord("make_api", logging.ERROR, __file__, 1, "Prediction failed: %s", ("boom",), None)
+    record.fields = {"model_version": "3", "latency_ms": 1.5}
+
+    entry = json.loads(JsonFormatter().format(record))
+
+    assert entry["severity"] == "ERROR"
+    assert entry["message"] == "Prediction failed: boom"
+    assert entry["model_version"] == "3"
+    assert entry["latency_ms"] == 1.5
+
+
+def test_queue_logging_writes_json_records():
+    """Test records logged through the queue are written out as JSON once the listener is stopped"""
+    root = logging.getLogger()
+    previous_handlers, previous_level = root.handlers[:], root.level
+    stream = io.StringIO()
+    try:
+        listener = start_queue_logging("INFO", stream=stream)
+        logging.getLogger("make_api").info("Predicted", extra={"fields": {"model_version": "1"}})
+        logging.getLogger("make_api").debug("Not written")
+        stop_queue_logging(listener)
+    finally:
+        root.handlers, root.level = previous_handlers, previous_level
+
+    entries = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [entry["message"] for entry in entries] == ["Predicted"]
+    assert entries[0]["model_version"] == "1"
+
+
+def test_sampled():
+    """Test sampling keeps no record at rate 0, every record at rate 1 and a fraction in between"""
+    assert not any(sampled(0.0) for _ in range(1000))
+    assert all(sampled(1.0) for _ in range(1000))
+    assert 0 < sum(sampled(0.5) for _ in range(1000)) < 1000
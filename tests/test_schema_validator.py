@@ -0,0 +1,90 @@
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from make_data.schema_validator import ArrowSchemaValidator, compile_arrow_schema
+
+
+@pytest.fixture
+def schema():
+    yield [
+        {"name": "id", "type": "int"},
+        {"name": "flag", "type": "string"},
+        {"name": "fare", "type": "float"},
+        {"name": "pickup", "type": "datetime"},
+    ]
+
+
+@pytest.fixture
+def sample_table():
+    yield pa.table(
+        {
+            "fare": pa.array([10.5, None, 7.0], pa.float32()),
+            "id": pa.array([1, 2, 3], pa.int32()),
+            "flag": pa.array(["N", None, "Y"]),
+            "pickup": pa.array(pd.to_datetime(["2024-01-01 10:00", "2024-01-02 11:00", None])),
+        }
+    )
+
+
+def test_compile_arrow_schema(schema):
+    """Test the project schema compiles to the matching pyarrow types"""
+    arrow_schema = compile_arrow_schema(schema)
+
+    assert arrow_schema.names == ["id", "flag", "fare", "pickup"]
+    assert arrow_schema.types == [pa.int64(), pa.string(), pa.float64(), pa.timestamp("us")]
+
+
+def test_compile_arrow_schema_unsupported_type():
+    """Test compiling a schema with an unsupported type fails"""
+    with pytest.raises(ValueError, match="Unsupported type boolean for column 'paid'"):
+        compile_arrow_schema([{"name": "paid", "type": "boolean"}])
+
+
+def test_validate_casts_table(schema, sample_table):
+    """Test the table is reordered and cast in one pass, keeping nulls as nulls"""
+    table = ArrowSchemaValidator(schema).validate(sample_table)
+
+    assert table.schema == compile_arrow_schema(schema)
+    assert table.column("flag").to_pylist() == ["N", None, "Y"]
+    assert table.column("fare").null_count == 1
+    assert table.column("id").to_pylist() == [1, 2, 3]
+
+
+def test_validate_missing_and_extra_columns(schema, sample_table):
+    """Test missing and extra columns are rejected"""
+    validator = ArrowSchemaValidator(schema)
+
+    with pytest.raises(ValueError, match="Missing columns: {'id'}"):
+        validator.validate(sample_table.drop_columns(["id"]))
+    with pytest.raises(ValueError, match="Extra columns: {'extra'}"):
+        validator.validate(sample_table.append_column("extra", pa.array([1, 2, 3])))
+
+
+def test_validate_coerces_numeric_columns(schema, sample_table, caplog):
+    """Test int and float values that cannot be converted become nulls, as pd.to_numeric(errors="coerce") does"""
+    table = sample_table.set_column(1, "id", pa.array(["1", "two", "3.5"]))
+    table = table.set_column(0, "fare", pa.array(["1.5", "2.5", "n/a"]))
+    validator = ArrowSchemaValidator(schema)
+
+    assert sorted(validator.column_errors(table)) == ["fare", "id"]
+    with caplog.at_level("WARNING"):
+        validated = validator.validate(table)
+
+    assert validated.schema == compile_arrow_schema(schema)
+    assert validated.column("id").to_pylist() == [1, None, None]
+    assert validated.column("fare").to_pylist() == [1.5, 2.5, None]
+    expected = pd.to_numeric(pd.Series(["1.5", "2.5", "n/a"]), errors="coerce")
+    assert validated.column("fare").to_pandas().equals(expected)
+    assert "2 values of column 'id'" in caplog.text
+    assert "1 values of column 'fare'" in caplog.text
+
+
+def test_validate_reports_failing_columns(schema, sample_table):
+    """Test datetime values that cannot be cast are reported per column and rejected"""
+    table = sample_table.set_column(3, "pickup", pa.array(["2024-01-01 10:00:00", "yesterday", None]))
+    validator = ArrowSchemaValidator(schema)
+
+    assert sorted(validator.column_errors(table)) == ["pickup"]
+    with pytest.raises(ValueError, match=r"Conversion failed for columns \['pickup'\]"):
+        validator.validate(table)
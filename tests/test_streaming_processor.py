@@ -0,0 +1,114 @@
+from unittest.mock import MagicMock
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from make_data.data_processor import PARTITION_COLUMNS, DataProcessor
+from make_data.streaming_processor import RouteAggregate, StreamingDataProcessor, ValueCountSketch
+
+
+@pytest.fixture
+def config():
+    config = MagicMock()
+    config.num_features = ["passenger_count", "mean_distance", "mean_duration", "rush_hour"]
+    config.cat_features = ["vendor_id"]
+    config.target = ["fare_amount"]
+    return config
+
+
+def test_value_count_sketch_matches_pandas_quantile():
+    """Test quantiles from merged sketches match pd.Series.quantile over all values"""
+    rng = np.random.default_rng(0)
+    parts = [pd.Series(rng.integers(0, 50, 101).astype(float)) for _ in range(3)]
+    parts[1].iloc[5] = np.nan
+
+    sketch, other = ValueCountSketch(), ValueCountSketch()
+    sketch.update(parts[0])
+    other.update(parts[1])
+    other.update(parts[2])
+    sketch.merge(other)
+
+    all_values = pd.concat(parts)
+    for q in (0.0, 0.1, 0.25, 0.5, 0.75, 0.99, 1.0):
+        assert sketch.quantile(q) == all_values.quantile(q)
+
+
+def test_route_aggregate_means():
+    """Test merged route aggregates give the mean per route, NaN for unseen routes"""
+    first, second = RouteAggregate(), RouteAggregate()
+    first.update(
+        pd.DataFrame(
+            {"PULocationID": [1, 1], "DOLocationID": [2, 2], "trip_distance": [1.0, 3.0], "duration": [4.0, np.nan]}
+        )
+    )
+    second.update(pd.DataFrame({"PULocationID": [1], "DOLocationID": [2], "trip_distance": [5.0], "duration": [8.0]}))
+    first.merge(second)
+
+    means = first.means().reshape(266, 266, 2)
+    assert means[1, 2].tolist() == [3.0, 6.0]
+    assert np.isnan(means[2, 1]).all()
+
+
+def test_streaming_matches_in_memory_processing(raw_months, config, tmp_path):
+    """Test streaming processing produces the same rows and route statistics as processing everything at once"""
+    in_memory = DataProcessor(pd.concat(raw_months, ignore_index=True), config)
+    in_memory.process_data()
+
+    streaming = StreamingDataProcessor(chunks=lambda: (month.copy() for month in raw_months), config=config)
+    train_file_name, test_file_name = str(tmp_path / "train.parquet"), str(tmp_path / "test.parquet")
+    n_train, n_test = streaming.process(train_file_name, test_file_name)
+
+    train_set, test_set = pd.read_parquet(train_file_name), pd.read_parquet(test_file_name)
+    assert (len(train_set), len(test_set)) == (n_train, n_test)
+    assert n_test == pytest.approx(0.2 * (n_train + n_test), abs=3)
+
+    columns = config.num_features + config.cat_features + config.target + PARTITION_COLUMNS
+    streamed = pd.concat([train_set, test_set]).sort_values(columns).reset_index(drop=True)
+    expected = in_memory.df.sort_values(columns).reset_index(drop=True)
+    pd.testing.assert_frame_equal(streamed, expected, check_dtype=False, atol=1e-9)
+    np.testing.assert_allclose(streaming.route_stats, in_memory.route_stats, equal_nan=True)
+
+
+def test_streaming_reads_raw_chunks_twice(raw_months, config, tmp_path):
+    """Test the quantiles and route statistics come from one pass, so processing reads the raw data twice"""
+    reads = []
+
+    def chunks():
+        reads.append(1)
+        return (month.copy() for month in raw_months)
+
+    streaming = StreamingDataProcessor(chunks=chunks, config=config)
+    streaming.process(str(tmp_path / "train.parquet"), str(tmp_path / "test.parquet"))
+
+    assert len(reads) == 2
+
+
+def test_streaming_save_route_stats_before_processing(config, tmp_path):
+    """Test saving route statistics fails before they are computed"""
+    streaming = StreamingDataProcessor(chunks=lambda: iter([]), config=config)
+    with pytest.raises(ValueError, match="Run process first"):
+        streaming.save_route_stats(str(tmp_path / "route_stats.npz"))
+
+
+def test_streaming_keeps_rows_of_single_row_chunks(raw_months, config, tmp_path):
+    """Test a chunk too small to split is carried into the next one, and a trailing one goes to the train set"""
+    first, second, third = raw_months
+    # Trips with a passenger count and a fare below the outlier threshold, which processing keeps as they are
+    kept = third.index[third["passenger_count"].notna() & third["fare_amount"].between(0, 30)][:2]
+    carried, trailing = third.loc[[kept[0]]], third.loc[[kept[1]]]
+    chunks = [first, carried, second, third.drop(index=kept), trailing]
+    in_memory = DataProcessor(pd.concat(raw_months, ignore_index=True), config)
+    in_memory.process_data()
+
+    streaming = StreamingDataProcessor(chunks=lambda: (chunk.copy() for chunk in chunks), config=config)
+    train_file_name, test_file_name = str(tmp_path / "train.parquet"), str(tmp_path / "test.parquet")
+    n_train, n_test = streaming.process(train_file_name, test_file_name)
+
+    assert n_train + n_test == len(in_memory.df)
+    columns = config.num_features + config.cat_features + config.target + PARTITION_COLUMNS
+    train_set = pd.read_parquet(train_file_name)
+    streamed = pd.concat([train_set, pd.read_parquet(test_file_name)]).sort_values(columns).reset_index(drop=True)
+    expected = in_memory.df.sort_values(columns).reset_index(drop=True)
+    pd.testing.assert_frame_equal(streamed, expected, check_dtype=False, atol=1e-9)
+    assert train_set.iloc[-1]["fare_amount"] == pytest.approx(trailing["fare_amount"].iloc[0])
@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.compose import ColumnTransformer
+from sklearn.linear_model import LinearRegression
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+from make_model.sufficient_statistics import SufficientStatistics
+
+NUM_FEATURES = ["passenger_count", "mean_distance", "congestion_surcharge"]
+CAT_FEATURES = ["vendor_id"]
+TARGET = ["fare_amount"]
+
+
+@pytest.fixture
+def train_set():
+    """Trips with a large-mean feature, a constant feature and a category only present in the last rows"""
+    rng = np.random.default_rng(3)
+    n_rows = 3000
+    df = pd.DataFrame(
+        {
+            "passenger_count": rng.integers(1, 5, n_rows).astype(float),
+            "mean_distance": rng.normal(1000.0, 2.0, n_rows),
+            "congestion_surcharge": np.full(n_rows, 2.75),
+            "vendor_id": np.where(np.arange(n_rows) < 2500, rng.choice(["2", "1"], n_rows), "6"),
+        }
+    )
+    df["fare_amount"] = 3 * df["mean_distance"] + df["passenger_count"] + (df["vendor_id"] == "6") * 4
+    df["fare_amount"] += rng.normal(0, 1, n_rows)
+    return df
+
+
+def fit_pipeline(df: pd.DataFrame) -> Pipeline:
+    preprocessor = ColumnTransformer(
+        transformers=[
+            ("num", StandardScaler(), NUM_FEATURES),
+            ("cat", OneHotEncoder(handle_unknown="ignore"), CAT_FEATURES),
+        ]
+    )
+    return Pipeline(steps=[("preprocessor", preprocessor), ("model", LinearRegression())]).fit(
+        df[NUM_FEATURES + CAT_FEATURES], df[TARGET]
+    )
+
+
+def assert_equivalent(pipe: Pipeline, expected: Pipeline, df: pd.DataFrame):
+    np.testing.assert_allclose(pipe.predict(df), expected.predict(df), rtol=1e-9)
+    np.testing.assert_allclose(pipe[-1].coef_, expected[-1].coef_, atol=1e-8)
+    np.testing.assert_allclose(pipe[-1].intercept_, expected[-1].intercept_, rtol=1e-9)
+    for name in ("mean_", "var_", "scale_"):
+        np.testing.assert_allclose(
+            getattr(pipe[0].named_transformers_["num"], name),
+            getattr(expected[0].named_transformers_["num"], name),
+            rtol=1e-9,
+        )
+    assert [c.tolist() for c in pipe[0].named_transformers_["cat"].categories_] == [["1", "2", "6"]]
+
+
+def test_chunked_statistics_match_full_fit(train_set):
+    """Test the pipeline exported from chunked statistics matches fitting the pipeline on all rows"""
+    statistics = SufficientStatistics(NUM_FEATURES, CAT_FEATURES, TARGET)
+    for rows in np.array_split(np.arange(len(train_set)), 7):
+        statistics.update(train_set.iloc[rows])
+
+    assert statistics.n_samples == len(train_set)
+    assert_equivalent(statistics.to_pipeline(), fit_pipeline(train_set), train_set)
+
+
+def test_merged_statistics_match_full_fit(train_set):
+    """Test merging the statistics of a new month matches fitting on both months, even with new categories"""
+    previous = SufficientStatistics(NUM_FEATURES, CAT_FEATURES, TARGET)
+    previous.update(train_set.iloc[:2000])
+    previous.months = ["2024-10"]
+    new_month = SufficientStatistics(NUM_FEATURES, CAT_FEATURES, TARGET)
+    new_month.update(train_set.iloc[2000:])
+    new_month.months = ["2024-11"]
+
+    previous.merge(new_month)
+
+    assert previous.months == ["2024-10", "2024-11"]
+    assert_equivalent(previous.to_pipeline(), fit_pipeline(train_set), train_set)
+    with pytest.raises(ValueError, match="already included"):
+        previous.merge(new_month)
+
+
+def test_save_and_load(train_set, tmp_path):
+    """Test saved statistics load back to the same pipeline"""
+    statistics = SufficientStatistics(NUM_FEATURES, CAT_FEATURES, "fare_amount")
+    statistics.update(train_set)
+    statistics.months = ["2024-10"]
+    statistics.save(str(tmp_path / "statistics.npz"))
+
+    loaded = SufficientStatistics.load(str(tmp_path / "statistics.npz"))
+
+    assert loaded.months == ["2024-10"]
+    assert loaded.categories == statistics.categories
+    np.testing.assert_array_equal(loaded.to_pipeline().predict(train_set), statistics.to_pipeline().predict(train_set))
+    assert loaded.to_pipeline()[-1].coef_.ndim == 1
+
+
+def test_update_with_missing_values(train_set):
+    """Test rows with missing values are refused, as LinearRegression would"""
+    train_set.loc[0, "mean_distance"] = np.nan
+    with pytest.raises(ValueError, match="missing values"):
+        SufficientStatistics(NUM_FEATURES, CAT_FEATURES, TARGET).update(train_set)
+
+
+def test_to_pipeline_without_rows():
+    """Test exporting a pipeline before any row is added fails"""
+    with pytest.raises(ValueError, match="without rows"):
+        SufficientStatistics(NUM_FEATURES, CAT_FEATURES, TARGET).to_pipeline()
@@ -1,6 +1,15 @@
+import numpy as np
 import pandas as pd
+import pytest
 
-from utils import outlier_imputer, rush_hourizer
+from utils import (
+    apply_dtype_plan,
+    concat_frames,
+    memory_report,
+    outlier_imputer,
+    rush_hourizer,
+    vectorized_rush_hourizer,
+)
 
 
 def test_outlier_imputer_with_positive_outliers():
@@ -71,3 +80,133 @@ def test_rush_hourizer_for_non_rush_hour():
     assert rush_hourizer(df.iloc[1]) == 0
     assert rush_hourizer(df.iloc[2]) == 0
     assert rush_hourizer(df.iloc[3]) == 0
+
+
+def test_vectorized_rush_hourizer_matches_rush_hourizer():
+    """Test vectorized_rush_hourizer agrees with rush_hourizer for every hour of the day"""
+    df = pd.DataFrame({"rush_hour": range(24)})
+
+    expected = df.apply(rush_hourizer, axis=1)
+    result = vectorized_rush_hourizer(df["rush_hour"])
+
+    assert result.tolist() == expected.tolist()
+    assert result.dtype == "int64"
+
+
+def test_outlier_imputer_with_precomputed_quantiles():
+    """Test outlier_imputer uses precomputed quartiles instead of the frame's own"""
+    df = pd.DataFrame({"column1": [1.0, 5.0, 7.0, 100.0, -3.0]})
+
+    df_imputed = outlier_imputer(df, ["column1"], 1, quantiles={"column1": (2.0, 4.0)})
+
+    assert df_imputed["column1"].tolist() == [1.0, 5.0, 6.0, 6.0, 0.0]  # upper threshold 4 + 1 * (4 - 2)
+
+
+def column_by_column_outlier_imputer(df: pd.DataFrame, column_list: list[str], iqr_factor: int) -> pd.DataFrame:
+    """outlier_imputer as it was before the columns were clipped in place, the reference for its outputs"""
+    for col in column_list:
+        df.loc[df[col] < 0, col] = 0
+
+        q1 = df[col].quantile(0.25)
+        q3 = df[col].quantile(0.75)
+        iqr = q3 - q1
+        upper_threshold = q3 + (iqr_factor * iqr)
+
+        df.loc[df[col] > upper_threshold, col] = upper_threshold
+
+    return df
+
+
+@pytest.mark.filterwarnings("ignore:Setting an item of incompatible dtype:FutureWarning")
+def test_outlier_imputer_matches_column_by_column():
+    """Test outlier_imputer gives the same values and dtypes as the previous implementation, NaNs and NAs included"""
+    df = pd.DataFrame(
+        {
+            "fare": [1.5, -2.0, 7.0, None, 300.0, 4.0],
+            "duration": [3, 9, -1, 4, 1000, 5],
+            "distance": pd.Series([0.5, 2.0, 90.0, 1.0, 1.5, 2.5], dtype="float32"),
+            "passengers": pd.Series([1, 2, 1, 1, 9, 1], dtype="uint8"),
+            "zones": pd.array([1, -5, None, 7, 100, 3], dtype="Int64"),
+            "tip": pd.array([1.5, None, -1.0, 2.0, 50.0, 3.0], dtype="Float64"),
+        }
+    )
+
+    expected = column_by_column_outlier_imputer(df.copy(), list(df.columns), 2)
+    result = outlier_imputer(df.copy(), list(df.columns), 2)
+
+    pd.testing.assert_frame_equal(result, expected)
+    assert result["distance"].dtype == "float32"
+    assert result["zones"].dtype == "Int64"
+    assert pd.isna(result["fare"][3]) and pd.isna(result["zones"][2]) and pd.isna(result["tip"][1])
+
+
+def test_outlier_imputer_clips_in_place():
+    """Test numpy-backed columns are clipped in their existing buffers rather than copied"""
+    df = pd.DataFrame({"fare": [1.5, -2.0, 7.0, 4.0, 300.0], "duration": [3.0, 9.0, -1.0, 4.0, 1000.0]})
+    buffer = df["fare"].to_numpy()
+
+    outlier_imputer(df, ["fare", "duration"], 1)
+
+    assert np.shares_memory(df["fare"].to_numpy(), buffer)
+    assert buffer.tolist() == [1.5, 0.0, 7.0, 4.0, 12.5]
+
+
+def test_outlier_imputer_fractional_threshold_on_nullable_integers():
+    """Test a nullable integer column clipped to a fractional threshold becomes a nullable float column"""
+    df = pd.DataFrame({"zones": pd.array([1, 2, None, 3, 4, 100], dtype="Int64")})
+
+    result = outlier_imputer(df, ["zones"], 1, quantiles={"zones": (1.5, 3.5)})
+
+    assert result["zones"].dtype == "Float64"
+    assert result["zones"].tolist()[:2] == [1.0, 2.0]
+    assert pd.isna(result["zones"][2])
+    assert result["zones"][5] == 5.5
+
+
+def test_apply_dtype_plan():
+    """Test apply_dtype_plan downcasts planned columns and leaves the rest alone"""
+    df = pd.DataFrame({"zone": [1, 265], "flag": ["N", "Y"], "fare": [1.5, 2.5], "other": [1, 2]})
+
+    df = apply_dtype_plan(df, {"zone": "int16", "flag": "category", "fare": "float32", "missing": "uint8"})
+
+    assert df["zone"].dtype == "int16"
+    assert df["flag"].dtype == "category"
+    assert df["fare"].dtype == "float32"
+    assert df["other"].dtype == "int64"
+
+
+def test_apply_dtype_plan_out_of_range():
+    """Test apply_dtype_plan refuses to wrap values around or cast missing values to integers"""
+    with pytest.raises(ValueError, match="out of range"):
+        apply_dtype_plan(pd.DataFrame({"zone": [1, 300]}), {"zone": "uint8"})
+    with pytest.raises(ValueError, match="missing"):
+        apply_dtype_plan(pd.DataFrame({"count": [1.0, None]}), {"count": "uint8"})
+    with pytest.raises(ValueError, match="fractional"):
+        apply_dtype_plan(pd.DataFrame({"count": [1.0, 2.5]}), {"count": "uint8"})
+
+    df = apply_dtype_plan(pd.DataFrame({"count": [1.0, 2.0]}), {"count": "uint8"})
+    assert df["count"].tolist() == [1, 2]
+
+
+def test_concat_frames_keeps_categories():
+    """Test chunks read with a category dtype plan stay categorical after concatenation"""
+
+    def chunks():
+        return [
+            apply_dtype_plan(pd.DataFrame({"flag": ["N", "N"], "fare": [1.0, 2.0]}), {"flag": "category"}),
+            apply_dtype_plan(pd.DataFrame({"flag": ["Y", "N"], "fare": [3.0, 4.0]}), {"flag": "category"}),
+        ]
+
+    df = concat_frames(chunks())
+
+    assert pd.concat(chunks(), ignore_index=True)["flag"].dtype == "object"
+    assert df["flag"].dtype == "category"
+    assert list(df["flag"].cat.categories) == ["N", "Y"]
+    assert df["flag"].tolist() == ["N", "N", "Y", "N"]
+
+
+def test_memory_report():
+    """Test memory_report returns the deep memory usage of the dataframe"""
+    df = pd.DataFrame({"a": [1, 2, 3]})
+
+    assert memory_report(df, "test") == df.memory_usage(deep=True).sum()